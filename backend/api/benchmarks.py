@@ -0,0 +1,215 @@
+"""
+Cenários de requisição para cada rota de api/urls.py e chat/urls.py,
+compartilhados pelo benchmark (manage.py benchmark_api) e pelo teste de
+orçamento de queries (api/test_query_budgets.py).
+"""
+
+import io
+import statistics
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from PIL import Image
+
+from api import urls as api_urls
+from chat import urls as chat_urls
+from chat.models import Conversation, Message
+
+from .models import Favorite, Item, ItemPhoto, UserProfile
+
+# Chamadas ao Supabase (Auth e Storage), com o retorno simulado: fora do
+# que medimos
+STUBBED_SERVICES = {
+    "api.photo_uploads.upload_item_photo": "https://cdn/upload.jpg",
+    "api.photo_uploads.upload_item_photo_variants": {},
+    "api.photo_uploads.delete_item_photo_service": None,
+    "api.views.presign_item_photo_upload": {
+        "url": "https://storage/presigned", "fields": {}
+    },
+    "api.views.head_item_photo": {
+        "url": "https://cdn/direct.png", "size": 1024, "content_type": "image/png"
+    },
+    "api.services.delete_item_photo_service": None,
+    "api.signals.delete_supabase_user": None,
+}
+
+
+def stub_services():
+    stack = ExitStack()
+    for target, return_value in STUBBED_SERVICES.items():
+        stack.enter_context(patch(target, return_value=return_value))
+    return stack
+
+
+def routes():
+    for pattern in api_urls.urlpatterns:
+        yield str(pattern.pattern)
+    for pattern in chat_urls.urlpatterns:
+        yield f"chat/{pattern.pattern}"
+
+
+# Rotas cujo corpo é JSON aninhado (o multipart padrão do cliente não serve)
+JSON_ROUTES = frozenset({
+    "items/<uuid:item_id>/photos/presign/",
+    "items/<uuid:item_id>/photos/complete/",
+})
+
+
+def send_request(client, route, rows):
+    """Faz com client a requisição de endpoint_requests para route."""
+    method, url, data = endpoint_requests(rows)[route]
+    format = "json" if route in JSON_ROUTES else None
+    return getattr(client, method)(url, data, format=format)
+
+
+def photo_file(name):
+    # PNG de verdade: a requisição confere o cabeçalho das fotos
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "white").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+def endpoint_requests(rows):
+    """
+    rota -> (método, url, dados) de uma requisição válida, a partir de
+    linhas de exemplo (ver sample_rows). Rotas cujas linhas faltam ficam
+    de fora.
+    """
+    item, conversation = rows.get("item"), rows.get("conversation")
+    requests = {
+        "users/": ("get", "/users/", None),
+        "users/profile/": ("get", "/users/profile/", None),
+        "users/profile/update/": (
+            "patch", "/users/profile/update/", {"first_name": "Beatriz"}
+        ),
+        "items/": ("get", "/items/", None),
+        "items/my-items/": ("get", "/items/my-items/", None),
+        "items/cards/": ("get", "/items/cards/", None),
+        "items/autocomplete/": ("get", "/items/autocomplete/", {"q": "bicicleta"}),
+        "categories/": ("get", "/categories/", None),
+        "categories/create/": (
+            "post", "/categories/create/", {"name": "Nova", "slug": "nova"}
+        ),
+        "cities/": ("get", "/cities/", None),
+        "search-items/": ("get", "/search-items/", {"search": "bicicleta"}),
+        "favorites/": ("get", "/favorites/", None),
+        "chat/conversations/": ("get", "/chat/conversations/", None),
+    }
+    if rows.get("peer"):
+        requests["users/delete/<int:pk>/"] = (
+            "delete", f"/users/delete/{rows['peer'].pk}/", None
+        )
+    if rows.get("stranger"):
+        requests["chat/conversations/create/"] = (
+            "post", "/chat/conversations/create/",
+            {"peer_supabase_user_id": str(rows["stranger"])},
+        )
+    if rows.get("spare_item"):
+        requests["favorites/add/"] = (
+            "post", "/favorites/add/", {"item_id": str(rows["spare_item"].pk)}
+        )
+    if rows.get("photo"):
+        requests["items/photos/<uuid:photo_id>/"] = (
+            "delete", f"/items/photos/{rows['photo'].pk}/", None
+        )
+    if item:
+        requests.update({
+            "items/create/": ("post", "/items/create/", {
+                "title": "Patins", "category": str(item.category_id), "status": "new",
+                "city_name": "Santos", "city_state": "SP",
+                "photos": [photo_file("a.png"), photo_file("b.png")],
+            }),
+            "items/<uuid:pk>/": ("get", f"/items/{item.pk}/", None),
+            "items/update/<uuid:pk>/": (
+                "patch", f"/items/update/{item.pk}/", {"title": "Bicicleta revisada"}
+            ),
+            "items/delete/<uuid:pk>/": ("delete", f"/items/delete/{item.pk}/", None),
+            "items/<uuid:item_id>/photos/": (
+                "post", f"/items/{item.pk}/photos/", {"photos": [photo_file("c.png")]}
+            ),
+            "items/<uuid:item_id>/photos/presign/": (
+                "post", f"/items/{item.pk}/photos/presign/",
+                {"files": [{"content_type": "image/png", "size": 1024}]},
+            ),
+            "items/<uuid:item_id>/photos/complete/": (
+                "post", f"/items/{item.pk}/photos/complete/",
+                {"keys": [f"items/{item.pk}/{'0' * 32}.png"]},
+            ),
+            "items/<uuid:item_id>/photos/status/": (
+                "get", f"/items/{item.pk}/photos/status/", None
+            ),
+            "favorites/remove/<uuid:item_id>/": (
+                "delete", f"/favorites/remove/{item.pk}/", None
+            ),
+            "favorites/check/<uuid:item_id>/": (
+                "get", f"/favorites/check/{item.pk}/", None
+            ),
+        })
+    if conversation:
+        requests.update({
+            "chat/conversations/<uuid:conversation_id>/messages/send/": (
+                "post", f"/chat/conversations/{conversation.pk}/messages/send/",
+                {"body": "Oi!"},
+            ),
+            "chat/conversations/<uuid:conversation_id>/messages/": (
+                "get", f"/chat/conversations/{conversation.pk}/messages/", None
+            ),
+            "chat/conversations/<uuid:conversation_id>/read/": (
+                "post", f"/chat/conversations/{conversation.pk}/read/", None
+            ),
+        })
+    return requests
+
+
+def chat_tables_exist():
+    existing = connection.introspection.table_names()
+    return all(model._meta.db_table in existing for model in (Conversation, Message))
+
+
+def sample_rows(user):
+    """Linhas de exemplo do banco atual para endpoint_requests."""
+    rows = {}
+    photo = (
+        ItemPhoto.objects.filter(item__user=user).select_related("item").first()
+    )
+    if photo:
+        rows["photo"], rows["item"] = photo, photo.item
+    else:
+        rows["item"] = Item.objects.filter(user=user).first()
+    rows["spare_item"] = (
+        Item.objects.exclude(
+            pk__in=Favorite.objects.filter(user=user).values("item_id")
+        ).first()
+    )
+    peer = (
+        UserProfile.objects.exclude(user=user)
+        .exclude(supabase_user_id=None)
+        .select_related("user")
+        .first()
+    )
+    if peer:
+        rows["peer"], rows["stranger"] = peer.user, peer.supabase_user_id
+
+    me = getattr(getattr(user, "userprofile", None), "supabase_user_id", None)
+    if me and chat_tables_exist():
+        rows["conversation"] = (
+            Conversation.objects.filter(user_a_id=me).first()
+            or Conversation.objects.filter(user_b_id=me).first()
+        )
+    return {key: value for key, value in rows.items() if value is not None}
+
+
+def latency_summary(samples):
+    """p50/p95/p99/média em milissegundos de uma lista de segundos."""
+    millis = sorted(sample * 1000 for sample in samples)
+    if len(millis) == 1:
+        millis = millis * 2
+    cuts = statistics.quantiles(millis, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49], 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "mean_ms": round(statistics.fmean(millis), 3),
+    }
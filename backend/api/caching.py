@@ -0,0 +1,106 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+CACHE_ITEMS = "public, max-age=0, must-revalidate"
+CACHE_PRIVATE = "private, no-cache"
+CACHE_REFERENCE_DATA = "public, max-age=300, stale-while-revalidate=86400"
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(
+        "|".join(str(part) for part in parts).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag / Last-Modified / 304) para views DRF. Os
+    validadores são calculados antes do serializer; se o cliente já tem a
+    versão atual, responde 304 sem serializar nada.
+    """
+
+    cache_control = CACHE_ITEMS
+    vary_on_authorization = False
+
+    def get_conditional_validators(self, request, *args, **kwargs):
+        """Retorna (etag, last_modified). None desliga o validador."""
+        return None, None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators(request, *args, **kwargs)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if etag:
+                response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+
+        response["Cache-Control"] = self.cache_control
+        if self.vary_on_authorization:
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+
+class QuerysetValidatorsMixin(ConditionalGetMixin):
+    """
+    Validadores de listagem paginada: busca só (pk, updated_at) das linhas
+    da página pedida, pela mesma consulta indexada da paginação, e combina
+    com a URL (filtros e cursor). O ETag muda quando alguma linha da página
+    muda, entra ou sai.
+    """
+
+    def get_conditional_validators(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = ["pk", "created_at", "updated_at", *queryset.query.annotations]
+        rows = self.paginate_queryset(queryset.values(*fields))
+        if rows is None:
+            rows = queryset.values(*fields)
+        rows = [(row["pk"], row["updated_at"]) for row in rows]
+        extra = self.get_extra_validator_parts(request, queryset)
+
+        timestamps = [updated_at for _, updated_at in rows]
+        timestamps += [part for part in extra if hasattr(part, "timestamp")]
+        etag = make_etag(
+            request.get_full_path(),
+            request.user.pk if self.vary_on_authorization else "",
+            *rows,
+            *extra,
+        )
+        return etag, max(timestamps, default=None)
+
+    def get_extra_validator_parts(self, request, queryset):
+        """Partes extras do ETag para dados fora da página (ex.: facetas)."""
+        return ()
+
+    @staticmethod
+    def aggregate_validator_parts(queryset):
+        """max(updated_at) e contagem do queryset filtrado inteiro."""
+        stats = queryset.order_by().aggregate(
+            last_modified=Max("updated_at"), count=Count("pk")
+        )
+        return stats["last_modified"], stats["count"]
+
+
+class TableHashValidatorsMixin(ConditionalGetMixin):
+    """
+    Validador para tabelas de referência pequenas e sem updated_at
+    (categorias, cidades): hash das colunas expostas, sem serializer.
+    """
+
+    cache_control = CACHE_REFERENCE_DATA
+    validator_fields = ()
+
+    def get_conditional_validators(self, request, *args, **kwargs):
+        rows = self.get_queryset().order_by("pk").values_list(*self.validator_fields)
+        return make_etag(request.get_full_path(), *rows), None
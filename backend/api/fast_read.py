@@ -0,0 +1,194 @@
+"""
+Caminho rápido das listagens de leitura: monta as respostas direto de
+.values(), sem a maquinaria de campos do ModelSerializer, e renderiza com
+orjson quando instalado. A saída é a mesma dos serializers, byte a byte
+(FastReadPathTests compara os dois caminhos).
+"""
+
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef
+from django.utils import timezone
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.response import Response
+
+from .images import srcset
+from .models import ItemPhoto
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+ITEM_COLUMNS = [
+    "id",
+    "title",
+    "user__first_name",
+    "user__userprofile__supabase_user_id",
+    "description",
+    "category_id",
+    "category__name",
+    "city_id",
+    "city__name",
+    "city__state",
+    "city__latitude",
+    "city__longitude",
+    "status",
+    "listing_state",
+    "created_at",
+    "updated_at",
+    "type",
+    "price",
+    "trade_interest",
+]
+
+
+def format_uuid(value):
+    return None if value is None else str(value)
+
+
+def format_decimal(value):
+    # DecimalField do DRF: string com as casas decimais da coluna
+    return None if value is None else f"{value:f}"
+
+
+def format_datetime(value):
+    # DateTimeField do DRF: ISO 8601 no fuso atual, com Z para UTC
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def photos_subquery(outer_ref, column):
+    """
+    ARRAY(SELECT column ... ORDER BY position): as fotos prontas do item
+    numa coluna.
+    """
+    return ArraySubquery(
+        ItemPhoto.objects.filter(item_id=OuterRef(outer_ref), state=ItemPhoto.READY)
+        .order_by("position")
+        .values(column)
+    )
+
+
+def item_values(queryset, prefix="", extra_fields=()):
+    """
+    As colunas do ItemListSerializer em um único SELECT, com as fotos
+    agregadas por subquery. prefix="item__" lê os itens de Favorite, cujas
+    colunas próprias vêm em extra_fields.
+    """
+    annotations = list(queryset.query.annotations)
+    return queryset.prefetch_related(None).values(
+        "pk",
+        *extra_fields,
+        *annotations,
+        *[prefix + column for column in ITEM_COLUMNS],
+        photo_images=photos_subquery(prefix + "id", "image"),
+        photo_ids=photos_subquery(prefix + "id", "id"),
+        photo_variants=photos_subquery(prefix + "id", "variants"),
+    )
+
+
+def item_representation(row, prefix=""):
+    """Linha de item_values no formato do ItemListSerializer."""
+
+    def get(name):
+        return row[prefix + name]
+
+    city_id = get("city_id")
+    city = None
+    if city_id is not None:
+        city = {
+            "id": str(city_id),
+            "name": get("city__name"),
+            "state": get("city__state"),
+            "latitude": get("city__latitude"),
+            "longitude": get("city__longitude"),
+        }
+    distance = row.get("distance") if not prefix else None
+    return {
+        "id": str(get("id")),
+        "title": get("title"),
+        "user": get("user__first_name"),
+        "owner_supabase_user_id": format_uuid(
+            get("user__userprofile__supabase_user_id")
+        ),
+        "description": get("description"),
+        "category": str(get("category_id")),
+        "category_name": get("category__name"),
+        "city": city,
+        "status": get("status"),
+        "listing_state": get("listing_state"),
+        "created_at": format_datetime(get("created_at")),
+        "updated_at": format_datetime(get("updated_at")),
+        "photos": row["photo_images"],
+        "type": get("type"),
+        "price": format_decimal(get("price")),
+        "trade_interest": get("trade_interest"),
+        "photos_id": [str(photo_id) for photo_id in row["photo_ids"]],
+        "photos_srcset": [srcset(variants) for variants in row["photo_variants"]],
+        "distance_km": float(distance) if distance is not None else None,
+    }
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer com orjson quando instalado; mesma saída compacta do DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or data is None
+            or self.get_indent(accepted_media_type, renderer_context)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.encoder_class().default)
+        # Mesmo escape de U+2028/U+2029 que o JSONRenderer faz
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class FastReadMixin:
+    """
+    list() pelo caminho rápido: get_fast_rows() devolve um queryset de
+    .values() e to_fast_representation() converte cada linha. Desligado
+    com FAST_READ_PATH=False e quando há ?fields=/?omit= (esses passam pelo
+    serializer podado).
+    """
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def use_fast_read(self, request):
+        if not settings.FAST_READ_PATH:
+            return False
+        return not {"fields", "omit"} & set(request.query_params)
+
+    def get_fast_rows(self, queryset):
+        raise NotImplementedError
+
+    def to_fast_representation(self, row):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_read(request):
+            return super().list(request, *args, **kwargs)
+
+        rows = self.get_fast_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                [self.to_fast_representation(row) for row in page]
+            )
+        return Response([self.to_fast_representation(row) for row in rows])
+
+
+class FastItemReadMixin(FastReadMixin):
+    def get_fast_rows(self, queryset):
+        return item_values(queryset)
+
+    def to_fast_representation(self, row):
+        return item_representation(row)
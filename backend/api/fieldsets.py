@@ -0,0 +1,173 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+
+
+def parse_fieldset(value):
+    """
+    "id,title,item.price" -> {"id": {}, "title": {}, "item": {"price": {}}}.
+    Um nó vazio significa o campo inteiro. None quando o parâmetro não veio.
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def nested_serializer(field):
+    """O serializer aninhado de um campo, se ele aceita fieldsets."""
+    return field if isinstance(field, SparseFieldsetSerializerMixin) else None
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer que aceita fieldset= / omit= (árvores de parse_fieldset) e
+    remove os campos não pedidos, inclusive dentro de serializers aninhados.
+
+    fieldset_dependencies diz do que cada SerializerMethodField precisa no
+    queryset; campos de modelo e fontes pontilhadas são deduzidos sozinhos.
+    """
+
+    fieldset_dependencies = {}
+
+    def __init__(self, *args, fieldset=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prune_fields(fieldset, omit)
+
+    def prune_fields(self, fieldset, omit, path=""):
+        readable = {name for name, field in self.fields.items() if not field.write_only}
+        requested = set(fieldset or ()) | set(omit or ())
+        unknown = [path + name for name in sorted(requested - readable)]
+        if unknown:
+            raise ValidationError(
+                {"fields": f"Campos inválidos: {', '.join(unknown)}."}
+            )
+
+        for name in list(self.fields):
+            if fieldset is not None and name not in fieldset:
+                self.fields.pop(name)
+            elif omit and name in omit and not omit[name]:
+                self.fields.pop(name)
+
+        for name in set(fieldset or ()) | set(omit or ()):
+            sub_fieldset = (fieldset or {}).get(name) or None
+            sub_omit = (omit or {}).get(name) or None
+            if name not in self.fields or not (sub_fieldset or sub_omit):
+                continue
+            nested = nested_serializer(self.fields[name])
+            if nested is None:
+                raise ValidationError(
+                    {"fields": f"O campo {path + name} não tem subcampos."}
+                )
+            nested.prune_fields(sub_fieldset, sub_omit, path=f"{path}{name}.")
+
+    def get_fieldset_prefetch(self, lookup):
+        return Prefetch(lookup)
+
+
+def fieldset_query_plan(serializer, prefix=""):
+    """
+    Colunas (.only), select_related e prefetches de que os campos restantes
+    do serializer precisam. Retorna (only, select_related, prefetch).
+    """
+    model = serializer.Meta.model
+    only, related, prefetch = [], [], {}
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        dependencies = serializer.fieldset_dependencies.get(name)
+        if dependencies is not None:
+            only += [prefix + column for column in dependencies.get("only", ())]
+            related += [
+                prefix + path for path in dependencies.get("select_related", ())
+            ]
+            for lookup in dependencies.get("prefetch", ()):
+                prefetch.setdefault(
+                    prefix + lookup, serializer.get_fieldset_prefetch(prefix + lookup)
+                )
+            continue
+
+        if field.source == "*":
+            continue
+        source = field.source.replace(".", "__")
+        nested = nested_serializer(field)
+        if nested is not None:
+            related.append(prefix + source)
+            nested_only, nested_related, nested_prefetch = fieldset_query_plan(
+                nested, prefix=f"{prefix}{source}__"
+            )
+            only += nested_only
+            related += nested_related
+            for lookup, value in nested_prefetch.items():
+                prefetch.setdefault(lookup, value)
+        elif "__" in source:
+            # category.name -> select_related("category") + only("category__name")
+            related.append(prefix + source.rsplit("__", 1)[0])
+            only.append(prefix + source)
+        else:
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete:
+                only.append(prefix + source)
+
+    return only, related, prefetch
+
+
+def project_queryset(queryset, serializer, required_fields=()):
+    """
+    Reduz o SELECT ao que o serializer podado vai ler: .only() nas colunas,
+    e só os select_related/prefetch dos campos que ficaram.
+    """
+    only, related, prefetch = fieldset_query_plan(serializer)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if related:
+        queryset = queryset.select_related(*dict.fromkeys(related))
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch.values())
+    pk_name = queryset.model._meta.pk.name
+    return queryset.only(*dict.fromkeys([pk_name, *required_fields, *only]))
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=id,title,city.name e ?omit=description para views de leitura:
+    poda a saída do serializer e projeta o queryset com project_queryset.
+    fieldset_required_fields são colunas que a view lê mesmo fora do
+    serializer (ex.: created_at do cursor da paginação).
+    """
+
+    fields_param = "fields"
+    omit_param = "omit"
+    fieldset_required_fields = ()
+
+    def get_fieldset_kwargs(self):
+        if self.request.method not in ("GET", "HEAD"):
+            return {}
+        params = self.request.query_params
+        kwargs = {
+            "fieldset": parse_fieldset(params.get(self.fields_param)),
+            "omit": parse_fieldset(params.get(self.omit_param)),
+        }
+        return {key: value for key, value in kwargs.items() if value is not None}
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **self.get_fieldset_kwargs(), **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.get_fieldset_kwargs():
+            return queryset
+        return project_queryset(
+            queryset, self.get_serializer(), self.fieldset_required_fields
+        )
@@ -0,0 +1,305 @@
+import math
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import DecimalField, F, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import SEARCH_CONFIG, Item, UserProfile
+
+# (rótulo, mínimo inclusivo, máximo exclusivo)
+PRICE_BUCKETS = [
+    ("0-50", 0, 50),
+    ("50-200", 50, 200),
+    ("200-1000", 200, 1000),
+    ("1000+", 1000, None),
+]
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.045
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 500
+
+
+def item_ordering(queryset):
+    """
+    Ordem da paginação pelas anotações dos filtros: distância (?near=),
+    depois rank da busca, depois (-created_at, pk). O CursorPagination só
+    consulta o primeiro backend com get_ordering, então todos usam esta.
+    """
+    annotations = queryset.query.annotations
+    ordering = ()
+    if "distance" in annotations:
+        ordering += ("distance",)
+    if "rank" in annotations:
+        ordering += ("-rank",)
+    if not ordering:
+        return None
+    return ordering + ("-created_at", "pk")
+
+
+def rank_field(expression):
+    # O rank vira numeric para que o cursor da paginação compare valores exatos
+    return Cast(expression, DecimalField(max_digits=12, decimal_places=6))
+
+
+class ItemFullTextSearchFilter(BaseFilterBackend):
+    """
+    Busca full-text (português) sobre Item.search_vector, servida pelo
+    índice GIN item_search_idx e ordenada por ts_rank. Quando nenhum item
+    casa (ex.: erro de digitação), cai para similaridade de trigramas no
+    título, servida pelo índice item_title_trgm_idx.
+    """
+
+    search_param = "search"
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, "").strip()
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        if not term:
+            return queryset
+
+        query = SearchQuery(term, config=SEARCH_CONFIG, search_type="websearch")
+        matches = queryset.filter(search_vector=query)
+        if matches.exists():
+            return matches.annotate(
+                rank=rank_field(SearchRank(F("search_vector"), query))
+            )
+
+        return queryset.filter(title__trigram_word_similar=term).annotate(
+            rank=rank_field(TrigramWordSimilarity(term, "title"))
+        )
+
+    def get_ordering(self, request, queryset, view):
+        return item_ordering(queryset)
+
+
+class ItemFacetFilter(BaseFilterBackend):
+    """
+    Filtros do feed: tipo, categoria (id ou slug), cidade, estado,
+    condição, listing_state e faixa de preço. Os parâmetros de escolha
+    aceitam vários valores (?type=Sell&type=Trade).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        types = self.get_choices(params, "type", Item.TYPE_CHOICES)
+        if types:
+            queryset = queryset.filter(type__in=types)
+
+        conditions = self.get_choices(params, "condition", Item.STATUS_CHOICES)
+        if conditions:
+            queryset = queryset.filter(status__in=conditions)
+
+        states = self.get_choices(
+            params, "listing_state", Item.LISTING_STATE_CHOICES
+        )
+        if states:
+            queryset = queryset.filter(listing_state__in=states)
+
+        categories = params.getlist("category")
+        if categories:
+            ids = [value for value in categories if self.is_uuid(value)]
+            slugs = [value for value in categories if not self.is_uuid(value)]
+            queryset = queryset.filter(
+                Q(category_id__in=ids) | Q(category__slug__in=slugs)
+            )
+
+        cities = params.getlist("city")
+        if cities:
+            if not all(self.is_uuid(value) for value in cities):
+                raise ValidationError({"city": "Informe o id da cidade."})
+            queryset = queryset.filter(city_id__in=cities)
+
+        state = params.get("state")
+        if state:
+            queryset = queryset.filter(city__state=state.upper())
+
+        min_price = self.get_price(params, "min_price")
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+
+        max_price = self.get_price(params, "max_price")
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        return queryset
+
+    @staticmethod
+    def get_choices(params, name, choices):
+        values = params.getlist(name)
+        valid = [choice for choice, _ in choices]
+        invalid = [value for value in values if value not in valid]
+        if invalid:
+            raise ValidationError(
+                {name: f"Valor inválido: {', '.join(invalid)}. Use {', '.join(valid)}."}
+            )
+        return values
+
+    @staticmethod
+    def get_price(params, name):
+        value = params.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            return Decimal(value)
+        except InvalidOperation:
+            raise ValidationError({name: "Preço inválido."})
+
+    @staticmethod
+    def is_uuid(value):
+        try:
+            uuid.UUID(str(value))
+        except ValueError:
+            return False
+        return True
+
+
+class ItemProximityFilter(BaseFilterBackend):
+    """
+    ?near=lat,lon&radius_km= : itens a até radius_km da origem, do mais
+    próximo ao mais distante. Sem near, usa a cidade do perfil do usuário.
+    Um bounding box sobre city_lat_lon_idx pré-filtra as cidades e só
+    então a distância exata (haversine) é calculada.
+    """
+
+    def get_origin(self, request):
+        near = request.query_params.get("near")
+        if near:
+            try:
+                latitude, longitude = (float(value) for value in near.split(","))
+            except ValueError:
+                raise ValidationError({"near": "Use o formato near=latitude,longitude."})
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValidationError({"near": "Coordenadas fora do intervalo."})
+            return latitude, longitude
+
+        if "radius_km" not in request.query_params or not request.user.is_authenticated:
+            return None
+        city = (
+            UserProfile.objects.filter(user=request.user)
+            .values_list("city__latitude", "city__longitude")
+            .first()
+        )
+        if not city or None in city:
+            raise ValidationError(
+                {"near": "Informe near ou cadastre uma cidade no seu perfil."}
+            )
+        return city
+
+    def get_radius(self, request):
+        value = request.query_params.get("radius_km", DEFAULT_RADIUS_KM)
+        try:
+            radius = float(value)
+        except ValueError:
+            raise ValidationError({"radius_km": "Raio inválido."})
+        if not 0 < radius <= MAX_RADIUS_KM:
+            raise ValidationError(
+                {"radius_km": f"O raio deve estar entre 0 e {MAX_RADIUS_KM} km."}
+            )
+        return radius
+
+    def filter_queryset(self, request, queryset, view):
+        origin = self.get_origin(request)
+        if origin is None:
+            return queryset
+        latitude, longitude = origin
+        radius = self.get_radius(request)
+
+        lat_delta = radius / KM_PER_DEGREE
+        lon_delta = radius / (
+            KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+        )
+        queryset = queryset.filter(
+            city__latitude__range=(latitude - lat_delta, latitude + lat_delta),
+            city__longitude__range=(longitude - lon_delta, longitude + lon_delta),
+        )
+
+        lat1 = math.radians(latitude)
+        lat2 = Radians("city__latitude")
+        haversine = Power(Sin((lat2 - lat1) / 2), 2) + math.cos(lat1) * Cos(
+            lat2
+        ) * Power(Sin((Radians("city__longitude") - math.radians(longitude)) / 2), 2)
+        return queryset.annotate(
+            # numeric para que o cursor da paginação compare valores exatos
+            distance=Cast(
+                2 * EARTH_RADIUS_KM * ASin(Sqrt(haversine)),
+                DecimalField(max_digits=9, decimal_places=3),
+            )
+        ).filter(distance__lte=radius)
+
+    def get_ordering(self, request, queryset, view):
+        return item_ordering(queryset)
+
+
+def item_facets(queryset):
+    """
+    Contagens por tipo, categoria, cidade e faixa de preço do queryset já
+    filtrado, calculadas em uma única query com GROUPING SETS.
+    """
+    inner_sql, params = (
+        queryset.order_by()
+        .values("id", "type", "category_id", "city_id", "price")
+        .query.sql_with_params()
+    )
+    bucket_cases = " ".join(
+        f"WHEN f.price >= {low}"
+        + (f" AND f.price < {high}" if high is not None else "")
+        + f" THEN '{label}'"
+        for label, low, high in PRICE_BUCKETS
+    )
+    sql = f"""
+        SELECT GROUPING(f.type), GROUPING(f.category_id), GROUPING(f.city_id),
+               f.type, f.category_id, c.name, f.city_id, ct.name, ct.state,
+               CASE {bucket_cases} END AS bucket, COUNT(*)
+          FROM ({inner_sql}) f
+          JOIN category c ON c.id = f.category_id
+          LEFT JOIN city ct ON ct.id = f.city_id
+         GROUP BY GROUPING SETS (
+               (f.type), (f.category_id, c.name), (f.city_id, ct.name, ct.state), (bucket)
+         )
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    facets = {"type": [], "category": [], "city": [], "price": []}
+    for row in rows:
+        by_type, by_category, by_city = row[0:3]
+        type_, category_id, category_name, city_id, city_name, city_state = row[3:9]
+        bucket, count = row[9:11]
+        if not by_type:
+            facets["type"].append({"value": type_, "count": count})
+        elif not by_category:
+            facets["category"].append(
+                {"id": str(category_id), "name": category_name, "count": count}
+            )
+        elif not by_city:
+            if city_id is not None:
+                facets["city"].append(
+                    {
+                        "id": str(city_id),
+                        "name": city_name,
+                        "state": city_state,
+                        "count": count,
+                    }
+                )
+        elif bucket is not None:
+            facets["price"].append({"range": bucket, "count": count})
+
+    for values in facets.values():
+        values.sort(key=lambda facet: -facet["count"])
+    order = [label for label, _, _ in PRICE_BUCKETS]
+    facets["price"].sort(key=lambda facet: order.index(facet["range"]))
+    return facets
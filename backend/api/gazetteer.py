@@ -0,0 +1,48 @@
+"""
+Gazetteer offline de cidades brasileiras (nome, UF, latitude, longitude).
+
+Os dados em data/cities_br.csv vêm do GeoNames (cities1000, CC BY 4.0),
+uma linha por par nome/UF, mantendo o lugar mais populoso.
+"""
+
+import csv
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "cities_br.csv"
+
+
+def normalize(name):
+    text = unicodedata.normalize("NFKD", name or "")
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).strip().lower()
+
+
+def iter_cities():
+    """Itera (nome, UF, latitude, longitude) na ordem do arquivo."""
+    with open(GAZETTEER_PATH, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            yield (
+                row["name"],
+                row["state"],
+                float(row["latitude"]),
+                float(row["longitude"]),
+            )
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    return {
+        (normalize(name), state): (latitude, longitude)
+        for name, state, latitude, longitude in iter_cities()
+    }
+
+
+def lookup_coordinates(name, state):
+    """
+    Retorna (latitude, longitude) da cidade ou None se não estiver no gazetteer.
+    A comparação ignora acentos e maiúsculas.
+    """
+    if not name or not state:
+        return None
+    return load_gazetteer().get((normalize(name), state.strip().upper()))
@@ -0,0 +1,130 @@
+"""
+Derivadas das fotos dos itens: a imagem é decodificada uma vez, desvirada
+pela orientação EXIF e reduzida a cada tamanho de DERIVATIVE_SIZES, em WebP
+e JPEG. O trabalho é CPU puro e roda num pool de processos, fora do GIL das
+threads do worker de uploads (api/photo_uploads.py). Na requisição, as
+fotos recebidas só têm o cabeçalho lido (read_header).
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Maior lado, em pixels, de cada derivada; nunca amplia o original
+DERIVATIVE_SIZES = {"thumb": 320, "medium": 960, "full": 1920}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# Formatos (do Pillow) aceitos nos uploads
+UPLOAD_FORMATS = {"JPEG", "PNG", "WEBP"}
+
+_pool = None
+
+
+def read_header(file):
+    """
+    (formato, largura, altura) lidos só do cabeçalho: os pixels não são
+    decodificados e o arquivo não é copiado para a memória. Volta o arquivo
+    para o início. ValueError se não é uma foto aceita.
+    """
+    try:
+        # Sem load() nem verify(): o Pillow só lê os primeiros bytes
+        with Image.open(file) as image:
+            header = (image.format, image.width, image.height)
+    except (Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ValueError("Envie uma foto JPEG, PNG ou WebP válida.") from e
+    finally:
+        file.seek(0)
+    if header[0] not in UPLOAD_FORMATS:
+        raise ValueError("Envie uma foto JPEG, PNG ou WebP válida.")
+    if header[1] * header[2] > settings.PHOTO_UPLOAD_MAX_PIXELS:
+        raise ValueError(
+            f"Foto de {header[1]}x{header[2]} pixels: grande demais para processar."
+        )
+    return header
+
+
+def render_derivatives(data, sizes=DERIVATIVE_SIZES):
+    """
+    Bytes da imagem original → {tamanho: {"width", "height", formato: bytes}}.
+    Roda dentro do pool: recebe e devolve só tipos que o pickle carrega.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            # JPEG não tem alfa: fundo branco no lugar da transparência
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+            image = background
+        image.load()
+
+    derivatives = {}
+    # Do maior para o menor: cada redução parte da anterior, mais barata
+    source = image
+    for name, size in sorted(sizes.items(), key=lambda entry: -entry[1]):
+        resized = source.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        source = resized
+        entry = {"width": resized.width, "height": resized.height}
+        for extension, (pillow_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            entry[extension] = buffer.getvalue()
+        derivatives[name] = entry
+    return derivatives
+
+
+def derivative_pool():
+    """
+    Pool de processos compartilhado, criado no primeiro uso.
+    IMAGE_DERIVATIVE_WORKERS=0 processa na própria thread (testes, dev).
+    """
+    global _pool
+    workers = settings.IMAGE_DERIVATIVE_WORKERS
+    if workers <= 0:
+        return None
+    if _pool is None:
+        # spawn: o fork de um processo com threads e conexões abertas é frágil
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    return _pool
+
+
+def build_derivatives(data):
+    pool = derivative_pool()
+    if pool is None:
+        return render_derivatives(data)
+    return pool.submit(render_derivatives, data).result()
+
+
+def derivative_filename(filename, name, extension):
+    """items/<id>_foto.png → items/<id>_foto_thumb.webp"""
+    base, _ = os.path.splitext(filename)
+    return f"{base}_{name}.{extension}"
+
+
+def variant_urls(variants):
+    """Todas as URLs guardadas em ItemPhoto.variants."""
+    return [
+        entry[extension]
+        for entry in variants.values()
+        for extension in FORMATS
+        if entry.get(extension)
+    ]
+
+
+def srcset(variants):
+    """
+    {"webp": "url 320w, url 960w, ...", "jpeg": "..."} para <picture>/srcset;
+    vazio para fotos sem derivadas (enviadas antes do pipeline).
+    """
+    ordered = sorted(variants.values(), key=lambda entry: entry["width"])
+    return {
+        extension: ", ".join(f"{entry[extension]} {entry['width']}w" for entry in ordered)
+        for extension in FORMATS
+        if ordered
+    }
@@ -0,0 +1,209 @@
+"""
+Instrumentação por requisição: queries (via connection.execute_wrapper),
+tempo de serialização e de chamadas ao Storage do Supabase. Vai para o
+cabeçalho Server-Timing de toda resposta; requisições acima de
+settings.SLOW_REQUEST_MS vão para o log com as queries mais lentas.
+"""
+
+import functools
+import heapq
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_metrics", default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    SQL sem valores: literais viram ?, listas de IN viram (...). Queries que
+    só diferem nos parâmetros ficam iguais no log.
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDER_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class RequestMetrics:
+    """Acumula os tempos de uma requisição (em segundos)."""
+
+    def __init__(self, keep_slowest=5):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self.phase_time = 0.0  # soma das fases, para não contar aninhadas duas vezes
+        self.keep_slowest = keep_slowest
+        self.slowest = []  # heap de (duração, ordem, sql)
+        self.query_durations = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # Assinatura de connection.execute_wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.db_time += elapsed
+            self.query_durations.append(elapsed)
+            entry = (elapsed, self.query_count, sql)
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Soma o tempo do bloco em name, descontando as queries e as outras
+        fases medidas dentro dele.
+        """
+        start = time.perf_counter()
+        excluded_before = self.db_time + self.phase_time
+        try:
+            yield
+        finally:
+            excluded = self.db_time + self.phase_time - excluded_before
+            elapsed = time.perf_counter() - start - excluded
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self.phase_time += elapsed
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def slowest_queries(self):
+        return [
+            (round(elapsed * 1000, 2), normalize_sql(sql))
+            for elapsed, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+    def server_timing(self):
+        def metric(name, seconds, desc=None):
+            value = f"{name};dur={seconds * 1000:.2f}"
+            return f'{value};desc="{desc}"' if desc else value
+
+        return ", ".join([
+            metric("db", self.db_time, f"{self.query_count} queries"),
+            metric("serialize", self.phases.get("serialize", 0.0)),
+            metric("storage", self.phases.get("storage", 0.0)),
+            metric("total", self.total_time),
+        ])
+
+
+def timed(name):
+    """
+    Decorator: o tempo da função entra na fase name da requisição atual.
+    Fora de uma requisição instrumentada, só chama a função.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _current.get()
+            if metrics is None:
+                return func(*args, **kwargs)
+            with metrics.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def view_label(request):
+    """Nome da classe da view (ReadItemsView, ListConversationsView...)."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    view = getattr(match.func, "view_class", match.func)
+    return view.__name__
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "-"
+    return match.view_name or match._func_path
+
+
+class RequestTimingMiddleware:
+    """
+    Server-Timing: db (queries e tempo no Postgres), serialize (Python da
+    view e renderização fora do banco e do Storage, na prática os
+    serializers), storage (Supabase Storage) e total. Os mesmos números
+    vão para as métricas Prometheus (api/metrics.py).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics(getattr(settings, "SLOW_REQUEST_QUERIES", 5))
+        token = _current.set(metrics)
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            self.end_serialize(request)
+
+        response["Server-Timing"] = metrics.server_timing()
+        observe_request(
+            view_label(request), request.method, response.status_code, metrics
+        )
+        self.log_if_slow(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Da view até a resposta renderizada (ver process_template_response)
+        metrics = _current.get()
+        if metrics is not None:
+            request._serialize_phase = metrics.phase("serialize")
+            request._serialize_phase.__enter__()
+
+    def process_template_response(self, request, response):
+        # Respostas do DRF são renderizadas logo depois deste hook
+        response.add_post_render_callback(lambda _: self.end_serialize(request))
+        return response
+
+    def process_exception(self, request, exception):
+        self.end_serialize(request)
+
+    def end_serialize(self, request):
+        phase = request.__dict__.pop("_serialize_phase", None)
+        if phase is not None:
+            phase.__exit__(None, None, None)
+
+    def log_if_slow(self, request, response, metrics):
+        total_ms = metrics.total_time * 1000
+        if total_ms < getattr(settings, "SLOW_REQUEST_MS", 500):
+            return
+        logger.warning(
+            "Requisição lenta: %s %s (%s) -> %s em %.1f ms; %s queries em %.1f ms\n%s",
+            request.method,
+            request.get_full_path(),
+            view_name(request),
+            response.status_code,
+            total_ms,
+            metrics.query_count,
+            metrics.db_time * 1000,
+            "\n".join(f"  {ms} ms: {sql}" for ms, sql in metrics.slowest_queries()),
+        )
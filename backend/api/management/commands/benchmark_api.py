@@ -0,0 +1,170 @@
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.benchmarks import (
+    STUBBED_SERVICES,
+    chat_tables_exist,
+    endpoint_requests,
+    latency_summary,
+    routes,
+    sample_rows,
+    send_request,
+    stub_services,
+)
+from api.models import Favorite, Item, ItemPhoto, UserProfile
+from chat.models import Conversation, Message
+
+SAVEPOINT_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede cada rota de api/urls.py e chat/urls.py contra o banco atual "
+        "(ver seed_data): latência p50/p95/p99, queries e pico de memória. "
+        "O resultado vai para um JSON comparável entre commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default="benchmark.json",
+            help="Arquivo JSON de saída (padrão: benchmark.json).",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=30,
+            help="Requisições medidas por rota (padrão: 30).",
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=3,
+            help="Requisições descartadas antes de medir (padrão: 3).",
+        )
+        parser.add_argument(
+            "--username",
+            help="Usuário autenticado nas requisições (padrão: primeiro admin).",
+        )
+        parser.add_argument(
+            "--route", action="append", default=[],
+            help="Mede só as rotas que contêm este trecho (pode repetir).",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations deve ser pelo menos 1.")
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+        else:
+            user = User.objects.filter(is_staff=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("Usuário não encontrado. Rode seed_data antes.")
+
+        # Erros viram status 500 no relatório em vez de interromper a medição
+        self.client = APIClient(raise_request_exception=False)
+        self.user = user
+        rows = sample_rows(user)
+        selected = [
+            route for route in routes()
+            if not options["route"] or any(part in route for part in options["route"])
+        ]
+
+        endpoints = {}
+        with stub_services():
+            for route in selected:
+                if route not in endpoint_requests(rows):
+                    endpoints[route] = {"skipped": "sem dados de exemplo no banco"}
+                    continue
+                self.stdout.write(f"{route} ...")
+                endpoints[route] = self.measure(
+                    route, rows, options["iterations"], options["warmup"]
+                )
+
+        report = {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "iterations": options["iterations"],
+            "username": user.username,
+            "stubbed_services": list(STUBBED_SERVICES),
+            "dataset": self.dataset_counts(),
+            "endpoints": endpoints,
+        }
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(endpoints)} rota(s) medida(s) em {options['output']}."
+            )
+        )
+
+    def request(self, route, rows):
+        """Uma requisição dentro de uma transação desfeita: o banco não muda."""
+        with transaction.atomic():
+            response = send_request(self.client, route, rows)
+            transaction.set_rollback(True)
+        return response
+
+    def authenticate(self):
+        # Usuário recarregado a cada requisição: sem cache de relações entre elas
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def measure(self, route, rows, iterations, warmup):
+        statuses = set()
+        for _ in range(warmup):
+            self.authenticate()
+            statuses.add(self.request(route, rows).status_code)
+
+        self.authenticate()
+        with CaptureQueriesContext(connection) as queries:
+            statuses.add(self.request(route, rows).status_code)
+        # O log de queries é zerado a cada nova requisição: conta agora.
+        # Savepoints vêm só da transação que desfaz a requisição.
+        query_count = sum(
+            not query["sql"].startswith(SAVEPOINT_STATEMENTS) for query in queries
+        )
+
+        self.authenticate()
+        tracemalloc.start()
+        try:
+            statuses.add(self.request(route, rows).status_code)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        samples = []
+        for _ in range(iterations):
+            self.authenticate()
+            start = time.perf_counter()
+            response = self.request(route, rows)
+            samples.append(time.perf_counter() - start)
+            statuses.add(response.status_code)
+
+        return {
+            **latency_summary(samples),
+            "queries": query_count,
+            "peak_memory_kb": round(peak / 1024, 1),
+            "status": sorted(statuses),
+        }
+
+    def dataset_counts(self):
+        models = [User, UserProfile, Item, ItemPhoto, Favorite]
+        if chat_tables_exist():
+            models += [Conversation, Message]
+        return {model._meta.db_table: model.objects.count() for model in models}
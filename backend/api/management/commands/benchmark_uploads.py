@@ -0,0 +1,130 @@
+import io
+import json
+import math
+import os
+import platform
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.client import ClientHandler, RequestFactory
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.management.commands.benchmark_api import git_commit
+from api.models import Category, Item, ItemPhoto
+from api.photo_uploads import process_due_uploads
+
+MB = 1024 * 1024
+
+
+def noise_png(size):
+    """PNG de ruído com cerca de size bytes: o ruído não comprime."""
+    side = max(1, int(math.sqrt(size / 3)))
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def traced(function):
+    """(resultado, pico em bytes) das alocações Python durante a chamada."""
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o pico de memória (tracemalloc) do envio de uma foto de cada "
+        "tamanho: na requisição (items/<id>/photos/) e no worker, com o "
+        "Storage em memória. Os pixels decodificados pelo Pillow ficam fora "
+        "da conta. Nada fica no banco."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes-mb", type=float, nargs="+", default=[1, 4, 8],
+            help="Tamanhos das fotos, em MB (padrão: 1 4 8).",
+        )
+        parser.add_argument(
+            "--output", default="benchmark_uploads.json",
+            help="Arquivo JSON de saída (padrão: benchmark_uploads.json).",
+        )
+        parser.add_argument(
+            "--username",
+            help="Dono do item de teste (padrão: primeiro admin).",
+        )
+
+    def handle(self, *args, **options):
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+        else:
+            user = User.objects.filter(is_staff=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("Usuário não encontrado. Rode seed_data antes.")
+
+        self.handler = ClientHandler()
+        self.authorization = f"Bearer {AccessToken.for_user(user)}"
+        uploads = {}
+        # Derivadas na própria thread: o pool de processos fugiria do tracemalloc
+        with override_settings(PHOTO_STORAGE_BACKEND="memory", IMAGE_DERIVATIVE_WORKERS=0):
+            with transaction.atomic():
+                category = Category.objects.create(
+                    name="benchmark_uploads", slug="benchmark-uploads"
+                )
+                item = Item.objects.create(
+                    user=user, title="benchmark_uploads", category=category,
+                    status="used",
+                )
+                for size_mb in options["sizes_mb"]:
+                    self.stdout.write(f"{size_mb:g} MB ...")
+                    uploads[f"{size_mb:g}"] = self.measure(item, int(size_mb * MB))
+                transaction.set_rollback(True)
+
+        report = {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "file_upload_max_memory_size": settings.FILE_UPLOAD_MAX_MEMORY_SIZE,
+            "photo_upload_max_request_bytes": settings.PHOTO_UPLOAD_MAX_REQUEST_BYTES,
+            "photo_upload_concurrency": settings.PHOTO_UPLOAD_CONCURRENCY,
+            "uploads": uploads,
+        }
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(uploads)} tamanho(s) medido(s) em {options['output']}.")
+        )
+
+    def measure(self, item, size):
+        data = noise_png(size)
+        request = RequestFactory().post(
+            f"/items/{item.pk}/photos/",
+            {"photos": SimpleUploadedFile("foto.png", data, content_type="image/png")},
+            HTTP_AUTHORIZATION=self.authorization,
+        )
+        # O corpo já está no wsgi.input, fora da medição: faz o papel do socket
+        response, request_peak = traced(lambda: self.handler(request.environ))
+        states, worker_peak = traced(lambda: process_due_uploads(1))
+        # Próxima medição com o item vazio, sem bater no limite de fotos
+        ItemPhoto.objects.filter(item=item).delete()
+        return {
+            "bytes": len(data),
+            "status": response.status_code,
+            "request_peak_kb": round(request_peak / 1024, 1),
+            "request_peak_per_byte": round(request_peak / len(data), 3),
+            "worker_peak_kb": round(worker_peak / 1024, 1),
+            "worker_peak_per_byte": round(worker_peak / len(data), 3),
+            "worker_states": states,
+        }
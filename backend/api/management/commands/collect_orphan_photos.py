@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.orphan_photos import collect_orphans
+from api.storage import MAX_DELETE_KEYS
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Coleta de lixo do bucket de fotos: lista o bucket página a página e "
+        "apaga os objetos que nenhuma foto ou upload na fila usa, mais velhos "
+        "que a carência. Com --dry-run só mostra o que apagaria; com -v 2 "
+        "lista cada órfão."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Só conta e lista os órfãos, sem apagar nada.",
+        )
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="Idade mínima, em horas, de um objeto apagável (padrão: 24).",
+        )
+        parser.add_argument(
+            "--prefix", default="",
+            help="Confere só as keys com este prefixo (ex.: photos/).",
+        )
+        parser.add_argument(
+            "--page-size", type=int, default=MAX_DELETE_KEYS,
+            help=f"Keys por página da listagem (padrão e máximo: {MAX_DELETE_KEYS}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["grace_hours"] < 0:
+            raise CommandError("--grace-hours não pode ser negativo.")
+        if options["page_size"] < 1:
+            raise CommandError("--page-size deve ser positivo.")
+
+        def show(name, modified, size):
+            self.stdout.write(f"  {name}  {size} B  {modified.isoformat()}")
+
+        stats = collect_orphans(
+            grace=timedelta(hours=options["grace_hours"]),
+            prefix=options["prefix"],
+            page_size=options["page_size"],
+            dry_run=options["dry_run"],
+            on_orphan=show if options["verbosity"] >= 2 else None,
+        )
+        self.stdout.write(
+            f"{stats['referenced']} key(s) em uso no banco "
+            f"({stats['referenced_seconds']}s); "
+            f"{stats.get('listed', 0)} objeto(s) listado(s) "
+            f"({stats.get('listed_bytes', 0) / MB:.1f} MB) em "
+            f"{stats.get('pages', 0)} página(s), "
+            f"{stats.get('recent', 0)} dentro da carência."
+        )
+        self.stdout.write(
+            f"{stats.get('orphans', 0)} órfão(s), "
+            f"{stats.get('orphan_bytes', 0) / MB:.1f} MB."
+        )
+        if not options["dry_run"]:
+            self.stdout.write(
+                f"{stats.get('deleted', 0)} apagado(s), "
+                f"{stats.get('kept', 0)} voltaram a ser usados, "
+                f"{stats.get('failed', 0)} com falha."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{stats['seconds']}s, {stats['objects_per_second']} objetos/s."
+            )
+        )
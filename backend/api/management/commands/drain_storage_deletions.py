@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.metrics import start_metrics_server
+from api.storage import MAX_DELETE_KEYS
+from api.storage_deletions import DELETED, FAILED, KEPT, RETRY, drain_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        "Drenador do outbox de exclusões: apaga do Storage, em lotes, os "
+        "arquivos de fotos, itens e contas já apagados no banco. Rode quantos "
+        "processos quiser; eles dividem a fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Processa o que estiver vencido e sai (útil em cron e testes).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=MAX_DELETE_KEYS,
+            help=f"Keys por DeleteObjects (padrão e máximo: {MAX_DELETE_KEYS}).",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=5,
+            help="Segundos de espera quando a fila está vazia (padrão: 5).",
+        )
+        parser.add_argument(
+            "--metrics-port", type=int, default=settings.WORKER_METRICS_PORT,
+            help=(
+                "Porta do /metrics deste processo, com as chamadas ao Storage "
+                "(padrão: WORKER_METRICS_PORT; 0 desliga)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            start_metrics_server(options["metrics_port"])
+        while True:
+            results = drain_deletions(options["batch_size"])
+            if results:
+                self.stdout.write(
+                    f"{results.get(DELETED, 0)} apagado(s), "
+                    f"{results.get(KEPT, 0)} ainda em uso, "
+                    f"{results.get(RETRY, 0)} reagendado(s), "
+                    f"{results.get(FAILED, 0)} com falha."
+                )
+            if options["once"]:
+                if not results:
+                    break
+                continue
+            if not results:
+                time.sleep(options["poll_interval"])
+            close_old_connections()
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from api.gazetteer import iter_cities, lookup_coordinates, normalize
+from api.models import City
+
+
+class Command(BaseCommand):
+    help = (
+        "Preenche latitude/longitude das cidades a partir do gazetteer offline "
+        "(api/data/cities_br.csv). Com --create, cadastra todas as cidades do arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--create",
+            action="store_true",
+            help="Cria as cidades do gazetteer que ainda não existem no banco.",
+        )
+
+    def handle(self, *args, **options):
+        updated = []
+        missing = 0
+        for city in City.objects.all().iterator():
+            coordinates = lookup_coordinates(city.name, city.state)
+            if coordinates is None:
+                missing += 1
+                continue
+            if (city.latitude, city.longitude) != coordinates:
+                city.latitude, city.longitude = coordinates
+                updated.append(city)
+        City.objects.bulk_update(updated, ["latitude", "longitude"], batch_size=1000)
+
+        created = 0
+        if options["create"]:
+            created = self.create_missing_cities()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(updated)} cidade(s) atualizada(s), {created} criada(s), "
+                f"{missing} sem correspondência no gazetteer."
+            )
+        )
+
+    def create_missing_cities(self):
+        existing = {
+            (normalize(name), (state or "").upper())
+            for name, state in City.objects.values_list("name", "state")
+        }
+        new_cities = [
+            City(name=name, state=state, latitude=latitude, longitude=longitude)
+            for name, state, latitude, longitude in iter_cities()
+            if (normalize(name), state) not in existing
+        ]
+        City.objects.bulk_create(new_cities, batch_size=1000)
+        return len(new_cities)
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.metrics import start_metrics_server
+from api.models import ItemPhoto
+from api.photo_uploads import process_due_uploads, purge_failed_photos, wait_for_uploads
+
+# Intervalo entre as limpezas das fotos failed vencidas
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker dos uploads de fotos: envia ao Storage as fotos pending e as "
+        "marca como ready. Rode quantos processos quiser; eles dividem a fila. "
+        "De hora em hora, apaga as fotos failed mais velhas que "
+        "PHOTO_UPLOAD_FAILED_RETENTION_HOURS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Processa o que estiver vencido e sai (útil em cron e testes).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=10,
+            help=(
+                "Uploads reservados por vez, mais os demais do mesmo item "
+                "(padrão: 10)."
+            ),
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=5,
+            help="Segundos máximos de espera por novas fotos (padrão: 5).",
+        )
+        parser.add_argument(
+            "--metrics-port", type=int, default=settings.WORKER_METRICS_PORT,
+            help=(
+                "Porta do /metrics deste processo, com as chamadas ao Storage "
+                "(padrão: WORKER_METRICS_PORT; 0 desliga)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            start_metrics_server(options["metrics_port"])
+        next_purge = 0
+        while True:
+            if time.monotonic() >= next_purge:
+                purged = purge_failed_photos()
+                if purged:
+                    self.stdout.write(f"{purged} foto(s) failed apagada(s).")
+                next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+            results = process_due_uploads(options["batch_size"])
+            if results:
+                self.stdout.write(
+                    f"{results.get(ItemPhoto.READY, 0)} pronta(s), "
+                    f"{results.get(ItemPhoto.PENDING, 0)} reagendada(s), "
+                    f"{results.get(ItemPhoto.FAILED, 0)} com falha."
+                )
+            if options["once"]:
+                if not results:
+                    break
+                continue
+            if not results:
+                # Fotos novas chegam por NOTIFY; retentativas, pelo timeout
+                wait_for_uploads(options["poll_interval"])
+            close_old_connections()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.read_models import rebuild_item_cards
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero o read model item_card a partir das tabelas de item."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Quantidade de itens processados por lote (padrão: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_item_cards(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} card(s) reconstruído(s)."))
@@ -0,0 +1,309 @@
+import csv
+import io
+import random
+import uuid
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from api.benchmarks import chat_tables_exist
+from api.gazetteer import iter_cities
+from api.models import Category, City, Favorite, Item, UserProfile
+from api.read_models import rebuild_item_cards
+
+SEED_PASSWORD = "seed-password"
+
+NOUNS = [
+    "Bicicleta", "Geladeira", "Fogão", "Sofá", "Mesa", "Cadeira", "Notebook",
+    "Celular", "Livro", "Violão", "Tênis", "Jaqueta", "Furadeira", "Berço",
+    "Televisão", "Micro-ondas", "Guarda-roupa", "Patinete", "Panela", "Luminária",
+]
+ADJECTIVES = [
+    "usado", "seminovo", "antigo", "conservado", "novo", "infantil", "grande",
+    "pequeno", "dobrável", "elétrico", "de madeira", "de inox",
+]
+CATEGORY_NAMES = [
+    "Eletrodomésticos", "Móveis", "Eletrônicos", "Livros", "Esportes",
+    "Roupas", "Ferramentas", "Infantil", "Instrumentos", "Casa e Jardim",
+]
+
+
+def batched(rows, size):
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def copy_rows(table, columns, rows, batch_size):
+    """
+    COPY table (columns) FROM STDIN em lotes de batch_size. Bem mais rápido
+    que INSERT para milhões de linhas; None vira NULL.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    with connection.cursor() as cursor:
+        for batch in batched(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += len(batch)
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com dados sintéticos em volume de produção para "
+        "benchmarks (ex.: --items 1000000 --messages 10000000). Use um banco "
+        "dedicado: os dados não são removidos."
+    )
+
+    def add_arguments(self, parser):
+        counts = [
+            ("users", 1000),
+            ("categories", 10),
+            ("cities", 500),
+            ("items", 10000),
+            ("photos-per-item", 3),
+            ("favorites", 20000),
+            ("notifications", 20000),
+            ("conversations", 2000),
+            ("messages", 50000),
+        ]
+        for name, default in counts:
+            parser.add_argument(
+                f"--{name}", type=int, default=default,
+                help=f"Quantidade a gerar (padrão: {default}).",
+            )
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Linhas por lote de COPY/bulk_create (padrão: 10000).",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42,
+            help="Semente do gerador aleatório (padrão: 42).",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        # Prefixo da rodada: ids e nomes únicos mesmo rodando o comando de novo
+        self.run = uuid.uuid4().hex[:12]
+        self.now = timezone.now()
+
+        cities = self.seed_cities(options["cities"])
+        categories = self.seed_categories(options["categories"])
+        users, supabase_ids = self.seed_users(options["users"], cities)
+        items = self.seed_items(
+            options["items"], options["photos_per_item"], users, categories, cities
+        )
+        favorites = self.seed_favorites(options["favorites"], users, items)
+        notifications = self.seed_notifications(options["notifications"], users)
+
+        conversations = messages = 0
+        if chat_tables_exist():
+            conversations, messages = self.seed_chat(
+                options["conversations"], options["messages"], supabase_ids
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING("Tabelas do chat não existem; conversas puladas.")
+            )
+
+        self.stdout.write("Atualizando search_vector e item_card...")
+        Item.objects.filter(search_vector__isnull=True).update_search_vector()
+        rebuild_item_cards(batch_size=self.batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(users)} usuário(s), {len(categories)} categoria(s), "
+                f"{len(cities)} cidade(s), {items} item(ns), {favorites} favorito(s), "
+                f"{notifications} notificação(ões), {conversations} conversa(s), "
+                f"{messages} mensagem(ns). Admin: {self.username(0)} / {SEED_PASSWORD}"
+            )
+        )
+
+    def username(self, index):
+        return f"seed-{self.run}-{index}@example.com"
+
+    def uuid_for(self, kind, index):
+        # UUID derivado de (rodada, tipo, índice): não guarda milhões de ids
+        return uuid.UUID(f"{self.run}{kind:04x}{index:016x}")
+
+    def random_moment(self, days=365):
+        return self.now - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def seed_cities(self, count):
+        cities = [
+            City(name=name, state=state, latitude=latitude, longitude=longitude)
+            for name, state, latitude, longitude in islice(iter_cities(), count)
+        ]
+        City.objects.bulk_create(cities, batch_size=self.batch_size)
+        return [city.pk for city in cities]
+
+    def seed_categories(self, count):
+        categories = [
+            Category(
+                name=f"{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {self.run}-{i}",
+                slug=f"seed-{self.run}-{i}",
+            )
+            for i in range(count)
+        ]
+        Category.objects.bulk_create(categories, batch_size=self.batch_size)
+        return [category.pk for category in categories]
+
+    def seed_users(self, count, cities):
+        # Um único hash: PBKDF2 por usuário levaria horas
+        password = make_password(SEED_PASSWORD)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=self.username(i), email=self.username(i),
+                    first_name=f"Usuário {i}", password=password,
+                    is_staff=i == 0, date_joined=self.random_moment(),
+                )
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        users = [user.pk for user in users]
+        supabase_ids = [self.uuid_for(1, i) for i in range(count)]
+        UserProfile.objects.bulk_create(
+            (
+                UserProfile(
+                    user_id=user_id, supabase_user_id=supabase_id,
+                    city_id=self.rng.choice(cities) if cities else None,
+                    bio="Perfil gerado para benchmark",
+                )
+                for user_id, supabase_id in zip(users, supabase_ids)
+            ),
+            batch_size=self.batch_size,
+        )
+        return users, supabase_ids
+
+    def seed_items(self, count, photos_per_item, users, categories, cities):
+        def items():
+            for i in range(count):
+                created_at = self.random_moment()
+                type_ = self.rng.choice(Item.TYPE_CHOICES)[0]
+                yield (
+                    self.uuid_for(2, i), self.rng.choice(users),
+                    f"{self.rng.choice(NOUNS)} {self.rng.choice(ADJECTIVES)}",
+                    "Item em bom estado, retirada no local.", type_,
+                    self.rng.randrange(10, 5000) if type_ == "Sell" else None,
+                    "Aceito troca por livros" if type_ == "Trade" else None,
+                    self.rng.choice(categories),
+                    self.rng.choice(cities) if cities else None,
+                    self.rng.choice(Item.STATUS_CHOICES)[0],
+                    "active" if self.rng.random() < 0.9 else "inactive",
+                    created_at, created_at,
+                )
+
+        def photos():
+            for i in range(count):
+                item_id = self.uuid_for(2, i)
+                for position in range(1, photos_per_item + 1):
+                    yield (
+                        self.uuid_for(3, i * photos_per_item + position), item_id,
+                        f"https://picsum.photos/seed/{item_id}-{position}/800/600",
+                        position, self.now,
+                    )
+
+        total = copy_rows(
+            Item._meta.db_table,
+            ["id", "user_id", "title", "description", "type", "price",
+             "trade_interest", "category_id", "city_id", "status",
+             "listing_state", "created_at", "updated_at"],
+            items(),
+            self.batch_size,
+        )
+        copy_rows(
+            "itemphoto",
+            ["id", "item_id", "image", "position", "created_at"],
+            photos(),
+            self.batch_size,
+        )
+        return total
+
+    def seed_favorites(self, count, users, items):
+        if not items:
+            return 0
+        favorites = (
+            Favorite(
+                user_id=self.rng.choice(users),
+                item_id=self.uuid_for(2, self.rng.randrange(items)),
+            )
+            for _ in range(count)
+        )
+        before = Favorite.objects.count()
+        # Pares repetidos são ignorados pela unique (user, item)
+        for batch in batched(favorites, self.batch_size):
+            Favorite.objects.bulk_create(batch, ignore_conflicts=True)
+        return Favorite.objects.count() - before
+
+    def seed_notifications(self, count, users):
+        rows = (
+            (
+                self.rng.choice(users), "system",
+                "Notificação gerada para benchmark", self.rng.random() < 0.5,
+                self.random_moment(),
+            )
+            for _ in range(count)
+        )
+        return copy_rows(
+            "notification",
+            ["user_id", "notification_type", "message", "is_read", "created_at"],
+            rows,
+            self.batch_size,
+        )
+
+    def seed_chat(self, conversation_count, message_count, supabase_ids):
+        if len(supabase_ids) < 2 or not conversation_count:
+            return 0, 0
+        pairs = [
+            tuple(self.rng.sample(range(len(supabase_ids)), 2))
+            for _ in range(conversation_count)
+        ]
+        conversations = copy_rows(
+            "conversations",
+            ["id", "user_a_id", "user_b_id", "created_at", "last_message_at"],
+            (
+                (self.uuid_for(4, i), supabase_ids[a], supabase_ids[b],
+                 self.random_moment(), None)
+                for i, (a, b) in enumerate(pairs)
+            ),
+            self.batch_size,
+        )
+
+        def messages():
+            for i in range(message_count):
+                conversation = self.rng.randrange(conversation_count)
+                sender = supabase_ids[self.rng.choice(pairs[conversation])]
+                yield (
+                    self.uuid_for(5, i), self.uuid_for(4, conversation), sender,
+                    f"Mensagem {i}", self.random_moment(), None,
+                )
+
+        messages = copy_rows(
+            "messages",
+            ["id", "conversation_id", "sender_id", "body", "sent_at", "read_at"],
+            messages(),
+            self.batch_size,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE conversations c SET last_message_at = m.last_sent
+                  FROM (SELECT conversation_id, max(sent_at) AS last_sent
+                          FROM messages GROUP BY conversation_id) m
+                 WHERE m.conversation_id = c.id AND c.last_message_at IS NULL
+                """
+            )
+        return conversations, messages
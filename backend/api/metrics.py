@@ -0,0 +1,100 @@
+"""
+Métricas Prometheus: latência por view e status, queries por requisição e
+chamadas externas de api/services.py. Com PROMETHEUS_MULTIPROC_DIR definido
+(ver gunicorn.conf.py), cada worker grava em arquivos mmap nesse diretório e
+o /metrics soma todos os processos. Os workers de fundo (process_photo_uploads,
+drain_storage_deletions) rodam fora do gunicorn, em geral em outro container:
+cada um serve o próprio /metrics com --metrics-port (start_metrics_server).
+"""
+
+import functools
+import time
+
+from django.conf import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP.",
+    ["view", "method", "status"],
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duração de cada query SQL.",
+    ["view"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Queries SQL por requisição.",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Tempo total no banco por requisição.",
+    ["view"],
+)
+OUTBOUND_CALL_DURATION = Histogram(
+    "outbound_call_duration_seconds",
+    "Duração das chamadas ao Supabase (Auth e Storage).",
+    ["call", "outcome"],
+)
+
+
+def observe_request(view, method, status, request_metrics):
+    """Registra uma requisição medida por RequestTimingMiddleware."""
+    REQUEST_LATENCY.labels(view, method, status).observe(request_metrics.total_time)
+    DB_QUERIES_PER_REQUEST.labels(view).observe(request_metrics.query_count)
+    DB_TIME_PER_REQUEST.labels(view).observe(request_metrics.db_time)
+    histogram = DB_QUERY_DURATION.labels(view)
+    for duration in request_metrics.query_durations:
+        histogram.observe(duration)
+
+
+def track_call(func):
+    """Decorator: duração e resultado (ok/error) da chamada externa func."""
+    ok = OUTBOUND_CALL_DURATION.labels(func.__name__, "ok")
+    error = OUTBOUND_CALL_DURATION.labels(func.__name__, "error")
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = error
+        try:
+            result = func(*args, **kwargs)
+            outcome = ok
+            return result
+        finally:
+            outcome.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def metrics_registry():
+    if not settings.PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, settings.PROMETHEUS_MULTIPROC_DIR)
+    return registry
+
+
+def render_metrics():
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port):
+    """
+    Serve /metrics deste processo numa thread, na porta port (0 escolhe
+    uma livre). Retorna o servidor HTTP.
+    """
+    server, _ = start_http_server(port, registry=metrics_registry())
+    return server
@@ -0,0 +1,41 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+BACKFILL_SEARCH_VECTOR = """
+UPDATE item SET search_vector =
+    setweight(to_tsvector('portuguese', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('portuguese', coalesce(description, '')), 'B')
+    || setweight(to_tsvector('portuguese',
+        coalesce(trade_interest, '') || ' ' ||
+        coalesce((SELECT name FROM category WHERE category.id = item.category_id), '')
+    ), 'C')
+    || setweight(to_tsvector('portuguese',
+        coalesce((SELECT name || ' ' || coalesce(state, '') FROM city WHERE city.id = item.city_id), '')
+    ), 'D');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_add_performance_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, migrations.RunSQL.noop),
+        # CRÍTICO: Busca full-text
+        migrations.AddIndex(
+            model_name="item",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="item_search_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_item_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        # CRÍTICO: Busca tolerante a erros e autocomplete
+        migrations.AddIndex(
+            model_name="item",
+            index=GinIndex(
+                fields=["title"], name="item_title_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
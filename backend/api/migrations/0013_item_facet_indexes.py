@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_item_title_trigram"),
+    ]
+
+    operations = [
+        # Substituídos por índices compostos que servem filtro + ordenação do feed
+        migrations.RemoveIndex(model_name="item", name="item_type_idx"),
+        migrations.RemoveIndex(model_name="item", name="item_state_idx"),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["listing_state", "type", "-created_at"],
+                name="item_state_type_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["listing_state", "category", "-created_at"],
+                name="item_state_cat_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["listing_state", "city", "-created_at"],
+                name="item_state_city_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["listing_state", "price"], name="item_state_price_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+from api.gazetteer import lookup_coordinates
+
+
+def fill_city_coordinates(apps, schema_editor):
+    City = apps.get_model("api", "City")
+    for city in City.objects.filter(latitude__isnull=True).iterator():
+        coordinates = lookup_coordinates(city.name, city.state)
+        if coordinates:
+            city.latitude, city.longitude = coordinates
+            city.save(update_fields=["latitude", "longitude"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_item_facet_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="city",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="city",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_city_coordinates, migrations.RunPython.noop),
+        # CRÍTICO: Pré-filtro por bounding box na busca por proximidade
+        migrations.AddIndex(
+            model_name="city",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="city_lat_lon_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,128 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BUILD_ITEM_CARDS = """
+INSERT INTO item_card (
+    item_id, user_id, title, type, status, listing_state, price, owner_name,
+    owner_supabase_user_id, category_id, category_name, city_id, city_label,
+    cover_photo_url, photo_count, created_at
+)
+SELECT i.id, i.user_id, i.title, i.type, i.status, i.listing_state, i.price,
+       u.first_name, p.supabase_user_id, i.category_id, c.name, i.city_id,
+       CASE WHEN coalesce(ct.state, '') = '' THEN ct.name
+            ELSE ct.name || ' (' || ct.state || ')' END,
+       (SELECT ph.image FROM itemphoto ph WHERE ph.item_id = i.id
+         ORDER BY ph.position LIMIT 1),
+       (SELECT count(*) FROM itemphoto ph WHERE ph.item_id = i.id),
+       i.created_at
+  FROM item i
+  JOIN auth_user u ON u.id = i.user_id
+  JOIN category c ON c.id = i.category_id
+  LEFT JOIN userprofile p ON p.user_id = i.user_id
+  LEFT JOIN city ct ON ct.id = i.city_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_city_coordinates"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemCard",
+            fields=[
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="card",
+                        serialize=False,
+                        to="api.item",
+                    ),
+                ),
+                ("title", models.TextField()),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("Sell", "Venda"), ("Donation", "Doação"), ("Trade", "Troca")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("new", "Novo"), ("used", "Usado")], max_length=20
+                    ),
+                ),
+                (
+                    "listing_state",
+                    models.CharField(
+                        choices=[("active", "Ativo"), ("inactive", "Inativo")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("owner_name", models.TextField(blank=True, default="")),
+                ("owner_supabase_user_id", models.UUIDField(blank=True, null=True)),
+                ("category_name", models.TextField()),
+                ("city_label", models.TextField(blank=True, null=True)),
+                ("cover_photo_url", models.TextField(blank=True, null=True)),
+                ("photo_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="api.category",
+                    ),
+                ),
+                (
+                    "city",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="api.city",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "item_card",
+            },
+        ),
+        # CRÍTICO: Feed lido direto do read model
+        migrations.AddIndex(
+            model_name="itemcard",
+            index=models.Index(
+                fields=["-created_at", "item"], name="item_card_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="itemcard",
+            index=models.Index(
+                fields=["listing_state", "type", "-created_at"],
+                name="item_card_state_type_idx",
+            ),
+        ),
+        migrations.RunSQL(BUILD_ITEM_CARDS, migrations.RunSQL.noop),
+    ]
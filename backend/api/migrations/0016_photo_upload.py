@@ -0,0 +1,59 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_itemcard"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemphoto",
+            name="state",
+            field=models.CharField(
+                choices=[("pending", "Enviando"), ("ready", "Pronta"), ("failed", "Falhou")],
+                db_default="ready",
+                default="ready",
+                max_length=10,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PhotoUpload",
+            fields=[
+                (
+                    "photo",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="upload",
+                        serialize=False,
+                        to="api.itemphoto",
+                    ),
+                ),
+                ("filename", models.CharField(max_length=500)),
+                ("content_type", models.CharField(blank=True, default="", max_length=100)),
+                ("content", models.BinaryField()),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now, null=True),
+                ),
+                ("last_error", models.TextField(blank=True, default="")),
+            ],
+            options={
+                "db_table": "photo_upload",
+            },
+        ),
+        # CRÍTICO: Fila do worker (só o que ainda vai ser tentado)
+        migrations.AddIndex(
+            model_name="photoupload",
+            index=models.Index(
+                fields=["next_attempt_at"],
+                name="photo_upload_due_idx",
+                condition=models.Q(next_attempt_at__isnull=False),
+            ),
+        ),
+    ]
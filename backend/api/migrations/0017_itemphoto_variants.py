@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_photo_upload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemphoto",
+            name="variants",
+            field=models.JSONField(blank=True, db_default={}, default=dict),
+        ),
+    ]
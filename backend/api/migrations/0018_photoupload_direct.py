@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_itemphoto_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="photoupload",
+            name="content",
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_photoupload_direct"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemphoto",
+            name="content_hash",
+            field=models.CharField(blank=True, db_default="", default="", max_length=64),
+        ),
+        # CRÍTICO: Deduplicação e contagem de referências por conteúdo
+        migrations.AddIndex(
+            model_name="itemphoto",
+            index=models.Index(
+                fields=["content_hash"],
+                name="itemphoto_content_hash_idx",
+                condition=~models.Q(content_hash=""),
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_itemphoto_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PhotoUploadChunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("index", models.PositiveIntegerField()),
+                ("data", models.BinaryField()),
+                (
+                    "upload",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="api.photoupload",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "photo_upload_chunk",
+                "unique_together": {("upload", "index")},
+            },
+        ),
+        migrations.AddField(
+            model_name="photoupload",
+            name="size",
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        # Uploads ainda na fila: o conteúdo inteiro vira o pedaço 0
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO photo_upload_chunk (upload_id, index, data)
+                SELECT photo_id, 0, content FROM photo_upload
+                WHERE content IS NOT NULL;
+                UPDATE photo_upload SET size = length(content)
+                WHERE content IS NOT NULL;
+            """,
+            reverse_sql="""
+                UPDATE photo_upload SET content = (
+                    SELECT string_agg(data, ''::bytea ORDER BY index)
+                    FROM photo_upload_chunk
+                    WHERE upload_id = photo_upload.photo_id
+                )
+                WHERE size IS NOT NULL;
+            """,
+        ),
+        migrations.RemoveField(
+            model_name="photoupload",
+            name="content",
+        ),
+    ]
@@ -0,0 +1,36 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_photoupload_chunks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StorageDeletion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("url", models.CharField(max_length=1024)),
+                ("content_hash", models.CharField(blank=True, default="", max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+            ],
+            options={
+                "db_table": "storage_deletion",
+            },
+        ),
+        # CRÍTICO: Fila do drenador (só o que ainda vai ser tentado)
+        migrations.AddIndex(
+            model_name="storagedeletion",
+            index=models.Index(
+                fields=["next_attempt_at"],
+                name="storage_deletion_due_idx",
+                condition=models.Q(next_attempt_at__isnull=False),
+            ),
+        ),
+    ]
@@ -1,7 +1,12 @@
 import uuid
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+SEARCH_CONFIG = "portuguese"
 
 
 class Category(models.Model):
@@ -20,6 +25,8 @@ class City(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.TextField(null=False)
     state = models.TextField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
 
     class Meta:
         db_table = "city"
@@ -28,6 +35,33 @@ class City(models.Model):
         return f"{self.name} ({self.state})" if self.state else self.name
 
 
+class ItemQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        """
+        Recalcula o search_vector (título, descrição, interesse de troca,
+        categoria e cidade) dos itens do queryset em um único UPDATE.
+        """
+        category_name = Subquery(
+            Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1]
+        )
+        city = City.objects.filter(pk=OuterRef("city_id"))
+        return self.update(
+            search_vector=(
+                SearchVector("title", weight="A", config=SEARCH_CONFIG)
+                + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+                + SearchVector(
+                    "trade_interest", category_name, weight="C", config=SEARCH_CONFIG
+                )
+                + SearchVector(
+                    Subquery(city.values("name")[:1]),
+                    Subquery(city.values("state")[:1]),
+                    weight="D",
+                    config=SEARCH_CONFIG,
+                )
+            )
+        )
+
+
 class Item(models.Model):
     STATUS_CHOICES = [("new", "Novo"), ("used", "Usado")]
     LISTING_STATE_CHOICES = [("active", "Ativo"), ("inactive", "Inativo")]
@@ -54,6 +88,9 @@ class Item(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ItemQuerySet.as_manager()
 
     class Meta:
         db_table = "item"
@@ -63,11 +100,26 @@ class Item(models.Model):
 
 
 class ItemPhoto(models.Model):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    STATE_CHOICES = [(PENDING, "Enviando"), (READY, "Pronta"), (FAILED, "Falhou")]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="photos")
     image = models.CharField(max_length=500)
     url = models.TextField(null=True, blank=True)
     position = models.IntegerField(default=1)
+    # Fotos novas ficam pending até o worker enviá-las ao Storage (api.photo_uploads)
+    state = models.CharField(
+        max_length=10, choices=STATE_CHOICES, default=READY, db_default=READY
+    )
+    # Derivadas geradas pelo worker (api.images): {tamanho: {width, height, webp, jpeg}}
+    variants = models.JSONField(default=dict, blank=True, db_default={})
+    # SHA-256 do original: fotos iguais dividem o mesmo objeto no Storage
+    content_hash = models.CharField(
+        max_length=64, blank=True, default="", db_default=""
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -79,6 +131,106 @@ class ItemPhoto(models.Model):
         return self.url or ""
 
 
+class PhotoUpload(models.Model):
+    """
+    Arquivo de uma ItemPhoto pending, guardado no banco (em
+    PhotoUploadChunk) até o worker (manage.py process_photo_uploads) enviá-lo
+    ao Storage. A linha some quando a foto fica pronta; next_attempt_at nulo
+    encerra as tentativas. Fotos enviadas pelo cliente direto ao Storage (URL
+    pré-assinada) não têm size: o arquivo já está em filename e o worker só
+    gera as derivadas.
+    """
+
+    photo = models.OneToOneField(
+        ItemPhoto, on_delete=models.CASCADE, primary_key=True, related_name="upload"
+    )
+    filename = models.CharField(max_length=500)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    size = models.PositiveBigIntegerField(null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        db_table = "photo_upload"
+
+    @property
+    def stored(self):
+        """O arquivo está no banco, não no Storage."""
+        return self.size is not None
+
+
+class PhotoUploadChunk(models.Model):
+    """
+    Um pedaço de até PHOTO_UPLOAD_CHUNK_BYTES do arquivo de um PhotoUpload.
+    Em pedaços, nem a requisição que grava nem o worker que lê seguram o
+    arquivo inteiro num só parâmetro de query.
+    """
+
+    upload = models.ForeignKey(
+        PhotoUpload, on_delete=models.CASCADE, related_name="chunks"
+    )
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        db_table = "photo_upload_chunk"
+        unique_together = ("upload", "index")
+
+
+class StorageDeletion(models.Model):
+    """
+    Outbox das exclusões no Storage: a URL de um arquivo que deve sair do
+    bucket, gravada na mesma transação que apagou a ItemPhoto. O drenador
+    (manage.py drain_storage_deletions) apaga o arquivo depois do commit;
+    com content_hash, só se nenhuma foto voltou a usar o conteúdo.
+    next_attempt_at nulo encerra as tentativas.
+    """
+
+    url = models.CharField(max_length=1024)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        db_table = "storage_deletion"
+
+
+class ItemCard(models.Model):
+    """
+    Read model achatado com o que um card do feed exibe, mantido pelos
+    caminhos de escrita (ver api.read_models) para que a listagem leia
+    uma única tabela em vez de juntar item, usuário, perfil, cidade,
+    categoria e fotos a cada requisição.
+    """
+
+    item = models.OneToOneField(
+        Item, on_delete=models.CASCADE, primary_key=True, related_name="card"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    title = models.TextField()
+    type = models.CharField(max_length=20, choices=Item.TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=Item.STATUS_CHOICES)
+    listing_state = models.CharField(max_length=20, choices=Item.LISTING_STATE_CHOICES)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    owner_name = models.TextField(blank=True, default="")
+    owner_supabase_user_id = models.UUIDField(null=True, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name="+")
+    category_name = models.TextField()
+    city = models.ForeignKey(
+        City, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    city_label = models.TextField(null=True, blank=True)
+    cover_photo_url = models.TextField(null=True, blank=True)
+    photo_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "item_card"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
     photo_url = models.TextField(null=True, blank=True)
@@ -0,0 +1,177 @@
+"""
+Coleta de lixo do bucket de fotos (manage.py collect_orphan_photos): apaga
+os objetos que nenhuma foto usa, como exclusões que esgotaram as tentativas,
+uploads diretos nunca concluídos e derivadas de envios interrompidos.
+
+As keys em uso saem do banco por um cursor do lado do servidor e vão para
+um SQLite temporário em disco (ReferencedKeys). A listagem do bucket vem
+página a página, e cada página é conferida contra esse arquivo. A memória
+fica no tamanho de uma página, não do bucket.
+
+Objetos mais novos que a carência ficam: um envio pode estar entre o upload
+e a gravação da referência. Keys por conteúdo passam ainda pelo mesmo teste
+do drenador de exclusões (contents_in_use), feito na hora de apagar.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .images import variant_urls
+from .models import ItemPhoto, PhotoUpload
+from .services import delete_photo_keys, photo_key
+from .storage import MAX_DELETE_KEYS, list_files, photo_storage
+from .storage_deletions import contents_in_use
+
+logger = logging.getLogger(__name__)
+
+# Linhas por ida ao banco no cursor do servidor
+DB_CHUNK_SIZE = 2000
+# Parâmetros por consulta ao SQLite (o limite antigo é 999)
+SQLITE_MAX_VARIABLES = 500
+# Keys de photo_uploads.content_key e das derivadas (images.derivative_filename)
+CONTENT_KEY = re.compile(
+    r"photos/[0-9a-f]{2}/(?P<hash>[0-9a-f]{64})(?:_[a-z]+)?\.[a-z0-9]+"
+)
+
+
+class ReferencedKeys:
+    """Conjunto de keys num SQLite temporário, apagado no fim do with."""
+
+    def __enter__(self):
+        self._directory = tempfile.TemporaryDirectory(prefix="orphan_photos_")
+        self._db = sqlite3.connect(os.path.join(self._directory.name, "keys.db"))
+        # Arquivo descartável: sem journal nem fsync
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute("CREATE TABLE keys (key TEXT PRIMARY KEY) WITHOUT ROWID")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._db.close()
+        self._directory.cleanup()
+
+    def __len__(self):
+        return self._db.execute("SELECT count(*) FROM keys").fetchone()[0]
+
+    def add_many(self, keys):
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO keys VALUES (?)", ((key,) for key in keys)
+            )
+
+    def present(self, keys):
+        """Das keys, as que estão no conjunto."""
+        keys = list(keys)
+        found = set()
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = keys[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                key for (key,) in self._db.execute(
+                    f"SELECT key FROM keys WHERE key IN ({placeholders})", chunk
+                )
+            )
+        return found
+
+
+def referenced_keys():
+    """
+    Keys em uso: imagem e derivadas de cada ItemPhoto, pronta ou pendente,
+    e as keys dos uploads ainda na fila.
+    """
+    photos = ItemPhoto.objects.values_list("image", "url", "variants")
+    for image, url, variants in photos.iterator(chunk_size=DB_CHUNK_SIZE):
+        for value in (image, url, *variant_urls(variants or {})):
+            if value:
+                yield photo_key(value)
+    yield from PhotoUpload.objects.values_list("filename", flat=True).iterator(
+        chunk_size=DB_CHUNK_SIZE
+    )
+
+
+def content_hash_of(key):
+    """
+    O hash de uma key por conteúdo, original (photos/ab/abcd….jpg) ou
+    derivada (photos/ab/abcd…_thumb.webp), ou "".
+    """
+    match = CONTENT_KEY.fullmatch(key)
+    return match["hash"] if match else ""
+
+
+def delete_orphans(names):
+    """
+    Apaga os órfãos de uma página, menos as keys por conteúdo que alguma
+    foto passou a usar desde a leitura do banco. Retorna (apagados,
+    mantidos, {nome: erro}). Os locks de conteúdo ficam presos até o
+    DeleteObjects voltar, como no drenador.
+    """
+    hashes = {content_hash_of(name) for name in names} - {""}
+    with transaction.atomic():
+        in_use = contents_in_use(hashes)
+        kept = [name for name in names if content_hash_of(name) in in_use]
+        pending = [name for name in names if content_hash_of(name) not in in_use]
+        try:
+            failed = delete_photo_keys(pending) if pending else {}
+        except Exception as e:
+            failed = dict.fromkeys(pending, f"{type(e).__name__}: {e}")
+    return len(pending) - len(failed), len(kept), failed
+
+
+def collect_orphans(
+    grace=timedelta(hours=24),
+    prefix="",
+    page_size=MAX_DELETE_KEYS,
+    dry_run=False,
+    on_orphan=None,
+):
+    """
+    Confere o bucket (sob prefix) contra as keys em uso e apaga os órfãos
+    mais velhos que grace. Com dry_run só conta. on_orphan(nome, modificado
+    em, bytes) é chamado para cada órfão. Retorna as contagens e a vazão.
+    """
+    storage = photo_storage()
+    page_size = min(page_size, MAX_DELETE_KEYS)
+    stats = Counter()
+    start = time.perf_counter()
+    with ReferencedKeys() as referenced:
+        referenced.add_many(referenced_keys())
+        stats["referenced"] = len(referenced)
+        stats["referenced_seconds"] = round(time.perf_counter() - start, 3)
+
+        # Carência contada a partir do fim da leitura do banco
+        cutoff = timezone.now() - grace
+        for page in list_files(storage, prefix, page_size):
+            stats["pages"] += 1
+            stats["listed"] += len(page)
+            stats["listed_bytes"] += sum(size for _, _, size in page)
+            old = [entry for entry in page if entry[1] < cutoff]
+            stats["recent"] += len(page) - len(old)
+            in_use = referenced.present(name for name, _, _ in old)
+            orphans = [entry for entry in old if entry[0] not in in_use]
+            stats["orphans"] += len(orphans)
+            stats["orphan_bytes"] += sum(size for _, _, size in orphans)
+            if on_orphan is not None:
+                for orphan in orphans:
+                    on_orphan(*orphan)
+            if dry_run or not orphans:
+                continue
+            deleted, kept, failed = delete_orphans([name for name, _, _ in orphans])
+            stats["deleted"] += deleted
+            stats["kept"] += kept
+            stats["failed"] += len(failed)
+            for name, error in failed.items():
+                logger.warning("Órfão %s ficou no Storage: %s", name, error)
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 3)
+    stats["objects_per_second"] = round(stats["listed"] / elapsed, 1) if elapsed else 0
+    return dict(stats)
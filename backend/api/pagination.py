@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ItemCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) para as listagens de itens.
+    Ordena por (-created_at, pk) e usa os índices item_created_idx,
+    item_user_created_idx e item_card_created_idx, então o custo de cada
+    página não depende da profundidade da rolagem, ao contrário do OFFSET.
+    """
+
+    ordering = ("-created_at", "pk")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -1,3 +1,6 @@
+import ipaddress
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -14,3 +17,15 @@ class IsAdminOrOwner(permissions.BasePermission):
 class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_staff
+
+
+class IsInternalNetwork(permissions.BasePermission):
+    def has_permission(self, request, view):
+        try:
+            address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+        except ValueError:
+            return False
+        return any(
+            address in ipaddress.ip_network(network)
+            for network in settings.METRICS_ALLOWED_NETWORKS
+        )
@@ -0,0 +1,492 @@
+"""
+Upload de fotos fora da requisição. A criação do item (ou o envio de novas
+fotos) só grava ItemPhoto pending com o arquivo em PhotoUpload e responde;
+o worker (manage.py process_photo_uploads) envia ao Storage o original e
+as derivadas (api/images.py), troca a foto para ready e atualiza item e
+card. As fotos de um item sobem em paralelo e valem juntas: se uma falha,
+as outras são apagadas do Storage e o item todo volta para a fila com
+backoff exponencial até PHOTO_UPLOAD_MAX_ATTEMPTS; depois as fotos ficam
+failed, sem ocupar vaga no item, até purge_failed_photos apagá-las. Os arquivos ficam no banco em pedaços (PhotoUploadChunk), gravados
+um a um pela requisição; o worker só lê o arquivo que vai enviar, quando há
+vaga no pool: no máximo PHOTO_UPLOAD_CONCURRENCY arquivos na memória.
+
+Fotos também podem chegar direto ao Storage, por URL pré-assinada
+(direct_upload_key e enqueue_direct_photos): a requisição não recebe os
+bytes e o worker só baixa o arquivo para gerar as derivadas.
+
+Os objetos enviados pelo worker ficam sob uma key do conteúdo
+(content_key). Uma foto igual a outra já pronta não sobe de novo: a nova
+ItemPhoto aponta para os mesmos arquivos, que só saem do Storage com a
+última referência (services.delete_file_on_itemphoto_delete).
+"""
+
+import hashlib
+import io
+import logging
+import os
+import random
+import re
+import select
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .images import read_header, variant_urls
+from .models import ItemPhoto, PhotoUpload, PhotoUploadChunk
+from .read_models import refresh_item_cards, touch_item
+from .services import (
+    delete_item_photo_service,
+    download_item_photo,
+    lock_photo_content,
+    lock_photo_contents,
+    photo_content_in_use,
+    upload_item_photo,
+    upload_item_photo_variants,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "photo_uploads"
+
+# Tipos aceitos no upload direto e a extensão da key de cada um
+DIRECT_UPLOAD_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+DIRECT_UPLOAD_KEY = re.compile(
+    r"items/(?P<item_id>[0-9a-f-]{36})/[0-9a-f]{32}\.(jpg|png|webp)"
+)
+
+
+class SharedContentGone(Exception):
+    """O objeto reaproveitado perdeu a última referência antes do commit."""
+
+
+class InvalidPhoto(Exception):
+    """O arquivo enviado direto não é uma foto aceita: tentar de novo não adianta."""
+
+
+def notify_worker():
+    with connection.cursor() as cursor:
+        cursor.execute(f"NOTIFY {CHANNEL}")
+
+
+def content_key(content_hash, name):
+    """photos/ab/abcd….jpg: o mesmo conteúdo vai sempre para a mesma key."""
+    extension = os.path.splitext(name)[1].lower()
+    return f"photos/{content_hash[:2]}/{content_hash}{extension}"
+
+
+def upload_digest(upload):
+    """SHA-256 do arquivo: o do upload handler ou, fora dele, lido em chunks."""
+    digest = getattr(upload, "sha256", None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in upload.chunks():
+            hasher.update(chunk)
+        upload.seek(0)
+        digest = hasher.hexdigest()
+    return digest
+
+
+def enqueue_photos(item, files, start_position=1):
+    """
+    Fotos pending do item, nas posições a partir de start_position, com os
+    arquivos guardados para o worker. Chame dentro da transação que grava o
+    item: o NOTIFY só chega ao worker no commit, e os locks de conteúdo
+    fazem o drenador de exclusões ver as fotos antes de apagar os objetos.
+    """
+    digests = [upload_digest(upload) for upload in files]
+    lock_photo_contents(set(digests))
+    photos = [
+        ItemPhoto(
+            item=item,
+            image="",
+            position=position,
+            state=ItemPhoto.PENDING,
+            content_hash=digest,
+        )
+        for position, digest in enumerate(digests, start=start_position)
+    ]
+    ItemPhoto.objects.bulk_create(photos)
+    uploads = PhotoUpload.objects.bulk_create(
+        PhotoUpload(
+            photo=photo,
+            filename=content_key(photo.content_hash, upload.name),
+            content_type=getattr(upload, "content_type", "") or "",
+            size=upload.size,
+        )
+        for photo, upload in zip(photos, files)
+    )
+    store_chunks(uploads, files)
+    notify_worker()
+    return photos
+
+
+def store_chunks(uploads, files):
+    """
+    Grava os arquivos em pedaços de PHOTO_UPLOAD_CHUNK_BYTES, com um INSERT
+    a cada PHOTO_UPLOAD_CHUNK_BYTES juntados: arquivos pequenos vão juntos,
+    os grandes aos poucos, e a memória não cresce com o tamanho deles.
+    """
+    chunk_bytes = settings.PHOTO_UPLOAD_CHUNK_BYTES
+    batch, batch_bytes = [], 0
+    for upload, file in zip(uploads, files):
+        file.seek(0)
+        # read(n) em vez de chunks(): o de memória devolve o arquivo inteiro
+        for index, data in enumerate(iter(lambda: file.read(chunk_bytes), b"")):
+            batch.append(PhotoUploadChunk(upload=upload, index=index, data=data))
+            batch_bytes += len(data)
+            if batch_bytes >= chunk_bytes:
+                PhotoUploadChunk.objects.bulk_create(batch)
+                batch, batch_bytes = [], 0
+    if batch:
+        PhotoUploadChunk.objects.bulk_create(batch)
+
+
+def direct_upload_key(item_id, content_type):
+    """Key nova, sob items/<item_id>/, para um upload pré-assinado."""
+    extension = DIRECT_UPLOAD_TYPES[content_type]
+    return f"items/{item_id}/{uuid.uuid4().hex}.{extension}"
+
+
+def is_direct_upload_key(item_id, key):
+    match = DIRECT_UPLOAD_KEY.fullmatch(key)
+    return match is not None and match["item_id"] == str(item_id)
+
+
+def enqueue_direct_photos(item, objects, start_position=1):
+    """
+    Fotos pending para arquivos que o cliente já pôs no Storage (objects:
+    dicts de head_item_photo com a key). A foto já aponta para o original;
+    o worker gera as derivadas e a marca ready. Chame dentro de transação.
+    """
+    photos = [
+        ItemPhoto(
+            item=item, image=head["url"], position=position, state=ItemPhoto.PENDING
+        )
+        for position, head in enumerate(objects, start=start_position)
+    ]
+    ItemPhoto.objects.bulk_create(photos)
+    PhotoUpload.objects.bulk_create(
+        PhotoUpload(
+            photo=photo,
+            filename=head["key"],
+            content_type=head["content_type"],
+        )
+        for photo, head in zip(photos, objects)
+    )
+    notify_worker()
+    return photos
+
+
+def retry_delay(attempts):
+    """Backoff exponencial com jitter: base, 2×base, 4×base... até o teto."""
+    delay = min(
+        settings.PHOTO_UPLOAD_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.PHOTO_UPLOAD_RETRY_MAX_SECONDS,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_uploads(limit):
+    """
+    Reserva até limit uploads vencidos, mais os vencidos dos mesmos itens:
+    as fotos de um item sobem juntas (tudo ou nada). SKIP LOCKED deixa
+    vários workers dividirem a fila; a reserva empurra next_attempt_at para
+    depois do lease, então um worker que morrer no meio não trava a foto
+    para sempre.
+    """
+    now = timezone.now()
+    due = (
+        PhotoUpload.objects.select_for_update(skip_locked=True, of=("self",))
+        .select_related("photo")
+        .filter(next_attempt_at__lte=now)
+    )
+    with transaction.atomic():
+        uploads = list(due.order_by("next_attempt_at")[:limit])
+        uploads += due.filter(
+            photo__item_id__in={upload.photo.item_id for upload in uploads}
+        ).exclude(pk__in=[upload.pk for upload in uploads])
+        lease = now + timedelta(seconds=settings.PHOTO_UPLOAD_LEASE_SECONDS)
+        for upload in uploads:
+            upload.attempts += 1
+            upload.next_attempt_at = lease
+        PhotoUpload.objects.bulk_update(uploads, ["attempts", "next_attempt_at"])
+    return sorted(uploads, key=lambda upload: upload.photo.position)
+
+
+def shared_copies(uploads):
+    """
+    {content_hash: campos} das fotos prontas com o mesmo conteúdo de algum
+    upload: essas não sobem de novo.
+    """
+    hashes = {upload.photo.content_hash for upload in uploads} - {""}
+    copies = {}
+    rows = (
+        ItemPhoto.objects.filter(content_hash__in=hashes, state=ItemPhoto.READY)
+        .exclude(image="")
+        .values_list("content_hash", "image", "variants")
+    )
+    for content_hash, image, variants in rows:
+        copies.setdefault(content_hash, {
+            "image": image,
+            "variants": variants,
+            "content_hash": content_hash,
+            "shared": True,
+        })
+    return copies
+
+
+def read_content(upload):
+    """
+    Os bytes guardados do upload, lidos só quando ele vai ser enviado; None
+    se a foto foi apagada depois da reserva.
+    """
+    chunks = (
+        PhotoUploadChunk.objects.filter(upload_id=upload.pk)
+        .order_by("index")
+        .values_list("data", flat=True)
+    )
+    content = b"".join(chunks)
+    # Sem os pedaços: a foto foi apagada (em cascata) depois da reserva
+    return content if len(content) == upload.size else None
+
+
+def send_file(upload, content=None):
+    """
+    Envia o original (content, de read_content) e as derivadas ao Storage e
+    retorna os campos da foto pronta ({"image", "variants",
+    "content_hash"}). Roda nas threads do pool: nada de banco aqui.
+    """
+    content_hash = upload.photo.content_hash
+    try:
+        if not upload.stored:
+            # Enviada direto ao Storage pelo cliente: só falta ler o original
+            url = upload.photo.image
+            content = download_item_photo(upload.filename)
+            content_hash = hashlib.sha256(content).hexdigest()
+            # Não passou pelo PhotoUploadField: confere formato e pixels
+            # antes de decodificar
+            try:
+                read_header(io.BytesIO(content))
+            except ValueError as e:
+                raise InvalidPhoto(str(e)) from e
+        else:
+            url = upload_item_photo(
+                ContentFile(content, name=upload.filename), upload.filename
+            )
+    except Exception as e:
+        return None, e
+    try:
+        variants = upload_item_photo_variants(content, upload.filename)
+    except Exception as e:
+        # O original já subiu: fail_item o apaga, fora do pool
+        return {"image": url, "variants": {}, "content_hash": content_hash}, e
+    return {"image": url, "variants": variants, "content_hash": content_hash}, None
+
+
+def photo_urls(upload, fields):
+    """
+    Os arquivos que o worker enviou: nem os reaproveitados de outra foto,
+    nem o original do upload direto, que é do cliente.
+    """
+    if fields.get("shared"):
+        return []
+    urls = variant_urls(fields["variants"])
+    if upload.stored:
+        urls.insert(0, fields["image"])
+    return urls
+
+
+def delete_unreferenced(content_hash, urls):
+    """Apaga urls do Storage, a menos que uma ItemPhoto ainda use o conteúdo."""
+    urls = list(urls)
+    if not urls:
+        return
+    if not content_hash:
+        delete_files(urls)
+        return
+    with transaction.atomic():
+        lock_photo_content(content_hash)
+        if not photo_content_in_use(content_hash):
+            delete_files(urls)
+
+
+def delete_files(urls):
+    for url in urls:
+        try:
+            delete_item_photo_service(url)
+        except Exception as e:
+            logger.warning("Arquivo %s ficou no Storage: %s", url, e)
+
+
+def finish_item(item_id, sent):
+    """
+    Todas as fotos do item subiram (sent: pares upload, campos de send_file):
+    marca ready em um UPDATE e atualiza o item.
+    """
+    with transaction.atomic():
+        # Ordem fixa dos locks: dois workers no mesmo conteúdo não travam
+        hashes = {fields["content_hash"] for _, fields in sent} - {""}
+        for content_hash in sorted(hashes):
+            lock_photo_content(content_hash)
+            shared = any(
+                fields.get("shared") and fields["content_hash"] == content_hash
+                for _, fields in sent
+            )
+            if shared and not photo_content_in_use(content_hash):
+                raise SharedContentGone(content_hash)
+        pending = set(
+            ItemPhoto.objects.select_for_update()
+            .filter(pk__in=[upload.pk for upload, _ in sent], state=ItemPhoto.PENDING)
+            .values_list("pk", flat=True)
+        )
+        ready = [
+            ItemPhoto(
+                pk=upload.pk,
+                state=ItemPhoto.READY,
+                image=fields["image"],
+                variants=fields["variants"],
+                content_hash=fields["content_hash"],
+            )
+            for upload, fields in sent
+            if upload.pk in pending
+        ]
+        ItemPhoto.objects.bulk_update(
+            ready, ["image", "variants", "content_hash", "state"]
+        )
+        PhotoUpload.objects.filter(pk__in=[upload.pk for upload, _ in sent]).delete()
+        if ready:
+            touch_item(item_id)
+            refresh_item_cards([item_id])
+    # Fotos apagadas durante o envio: os arquivos ficariam órfãos
+    for upload, fields in sent:
+        if upload.pk not in pending:
+            delete_unreferenced(fields["content_hash"], photo_urls(upload, fields))
+    return {ItemPhoto.READY: len(ready)}
+
+
+def fail_item(group):
+    """
+    Algum arquivo do item falhou: desfaz os que subiram e devolve todos
+    à fila (ou marca failed, no limite de tentativas). O arquivo que não é
+    uma foto aceita (InvalidPhoto) fica failed já na primeira vez.
+    """
+    for upload, fields, _ in group:
+        if fields:
+            delete_unreferenced(fields["content_hash"], photo_urls(upload, fields))
+    first_error = next(error for _, _, error in group if error is not None)
+    states = Counter()
+    for upload, _, error in group:
+        final = isinstance(error, InvalidPhoto)
+        states[fail_upload(upload, error or first_error, final)] += 1
+    return states
+
+
+def fail_upload(upload, error, final=False):
+    upload.last_error = f"{type(error).__name__}: {error}"
+    if final or upload.attempts >= settings.PHOTO_UPLOAD_MAX_ATTEMPTS:
+        upload.next_attempt_at = None
+        with transaction.atomic():
+            upload.save(update_fields=["last_error", "next_attempt_at"])
+            ItemPhoto.objects.filter(pk=upload.pk).update(state=ItemPhoto.FAILED)
+        return ItemPhoto.FAILED
+    upload.next_attempt_at = timezone.now() + retry_delay(upload.attempts)
+    upload.save(update_fields=["last_error", "next_attempt_at"])
+    return ItemPhoto.PENDING
+
+
+def purge_failed_photos():
+    """
+    Apaga as fotos failed criadas há mais de PHOTO_UPLOAD_FAILED_RETENTION_HOURS,
+    com o arquivo guardado em PhotoUpload. Até lá o dono ainda vê o failed
+    em items/<id>/photos/status/. Retorna quantas apagou.
+    """
+    cutoff = timezone.now() - timedelta(
+        hours=settings.PHOTO_UPLOAD_FAILED_RETENTION_HOURS
+    )
+    _, deleted = ItemPhoto.objects.filter(
+        state=ItemPhoto.FAILED, created_at__lt=cutoff
+    ).delete()
+    return deleted.get(ItemPhoto._meta.label, 0)
+
+
+def send_files(uploads, copies):
+    """
+    Resultados de send_file na ordem de uploads (None para fotos apagadas
+    desde a reserva). O conteúdo de cada um só é lido do banco quando há
+    vaga no pool e é solto quando o envio termina: no máximo
+    PHOTO_UPLOAD_CONCURRENCY arquivos na memória, não o lote.
+    """
+    limit = settings.PHOTO_UPLOAD_CONCURRENCY
+    results = [None] * len(uploads)
+    with ThreadPoolExecutor(max_workers=limit) as pool:
+        running = {}
+        for index, upload in enumerate(uploads):
+            copy = copies.get(upload.photo.content_hash)
+            if copy:
+                results[index] = (copy, None)
+                continue
+            if len(running) >= limit:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+            content = None
+            if upload.stored:
+                content = read_content(upload)
+                if content is None:
+                    continue
+            running[pool.submit(send_file, upload, content)] = index
+        for future, index in running.items():
+            results[index] = future.result()
+    return results
+
+
+def process_due_uploads(limit):
+    """
+    Processa um lote da fila: os arquivos sobem em paralelo, até
+    PHOTO_UPLOAD_CONCURRENCY por vez, e cada item é concluído ou desfeito
+    por inteiro. Fotos iguais a outras já prontas não sobem. Retorna
+    {estado: quantidade}.
+    """
+    uploads = claim_uploads(limit)
+    if not uploads:
+        return {}
+    results = send_files(uploads, shared_copies(uploads))
+
+    by_item = {}
+    for upload, result in zip(uploads, results):
+        if result is None:
+            continue
+        by_item.setdefault(upload.photo.item_id, []).append((upload, *result))
+
+    states = Counter()
+    for item_id, group in by_item.items():
+        if any(error is not None for _, _, error in group):
+            states.update(fail_item(group))
+        else:
+            sent = [(upload, fields) for upload, fields, _ in group]
+            try:
+                states.update(finish_item(item_id, sent))
+            except SharedContentGone as e:
+                # Volta à fila; na próxima tentativa o conteúdo sobe de novo
+                states.update(fail_item([(*entry, e) for entry in sent]))
+    return dict(states)
+
+
+def wait_for_uploads(timeout):
+    """
+    Bloqueia até um NOTIFY de enqueue_photos ou até timeout segundos. O
+    worker roda em autocommit, então o LISTEN vale já na execução.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+    raw = connection.connection
+    if not raw.notifies:
+        select.select([raw], [], [], timeout)
+        raw.poll()
+    raw.notifies.clear()
@@ -0,0 +1,220 @@
+"""
+Profiler por amostragem: uma fração das requisições (PROFILE_SAMPLE_RATE)
+ou as que trazem o cabeçalho X-Profile de um admin rodam sob cProfile
+(CPU). Os perfis somam por view em arquivos "collapsed stack" em
+PROFILE_DIR, prontos para flamegraph:
+
+    flamegraph.pl profiles/ReadItemsView.cpu.collapsed > items.svg
+
+Com PROFILE_TRACEMALLOC, o tracemalloc liga uma vez, com o processo, e cada
+requisição perfilada grava também a diferença entre dois snapshots
+(alocações). O tracemalloc é do processo: com workers de threads a
+diferença inclui o que as requisições concorrentes alocaram. Para perfis
+de memória limpos, use workers síncronos (o padrão do gunicorn).
+
+Com a amostragem desligada o custo é uma consulta ao cabeçalho.
+"""
+
+import cProfile
+import fcntl
+import os
+import pstats
+import random
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .instrumentation import view_label
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+# Alocações feitas pelo próprio profiler
+_IGNORED_FILES = (__file__, tracemalloc.__file__)
+
+
+def is_profiler_frame(func):
+    # profile.disable() aparece como raiz sem chamador
+    return func[0] == "~" and "_lsprof.Profiler" in func[2]
+
+
+def frame_label(filename, funcname):
+    if filename == "~":  # funções embutidas: "<built-in method ...>"
+        return funcname
+    if filename.startswith(str(settings.BASE_DIR)):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{funcname}"
+
+
+def code_key(func):
+    """Chave do pstats (arquivo, linha, nome) de uma função Python."""
+    code = getattr(func, "__code__", None)
+    return code and (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def cpu_stacks(profile, root=None, min_us=1):
+    """
+    Pilhas colapsadas ("a;b;c microssegundos") a partir do grafo de
+    chamadas do cProfile. O cProfile guarda só pares chamador/chamado, então
+    o tempo próprio de cada função é repartido entre os caminhos na proporção
+    do tempo acumulado que veio de cada chamador. Chamadas recursivas ficam
+    na primeira ocorrência da função na pilha.
+
+    root é a função chamada com o profiler ligado; sem ela, as raízes são as
+    funções sem chamador. A cadeia de middlewares do Django passa várias
+    vezes pelo mesmo wrapper, que então nunca aparece sem chamador.
+    """
+    stats = pstats.Stats(profile).stats
+    children = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            children.setdefault(caller, []).append((func, cumulative))
+
+    labels = {func: frame_label(func[0], func[2]) for func in stats}
+    stacks = Counter()
+    # Um caminho e um conjunto só, mutados na descida: com o tracemalloc
+    # ligado no processo, cada alocação aqui custa a pilha inteira
+    path = []
+    visiting = set()
+
+    calls = [0]
+    import time as _t
+    t0 = _t.perf_counter()
+
+    def walk(func, share):
+        calls[0] += 1
+        if calls[0] % 200000 == 0:
+            print("DBG", calls[0], len(stacks), len(stats), tracemalloc.is_tracing(), _t.perf_counter() - t0, flush=True)
+        if share * 1e6 < min_us:
+            return
+        _, _, own, cumulative, _ = stats[func]
+        path.append(labels[func])
+        visiting.add(func)
+        fraction = share / cumulative if cumulative else 0
+        if own * fraction * 1e6 >= min_us:
+            stacks[";".join(path)] += round(own * fraction * 1e6)
+        for child, from_here in children.get(func, ()):
+            # Recursão: o tempo já está no primeiro nível do ciclo
+            if child not in visiting:
+                walk(child, from_here * fraction)
+        visiting.remove(func)
+        path.pop()
+
+    if root in stats:
+        roots = [root]
+    else:
+        roots = [
+            func for func, (_, _, _, _, callers) in stats.items()
+            if not callers and not is_profiler_frame(func)
+        ]
+    for func in roots:
+        walk(func, stats[func][3])
+    return stacks
+
+
+def allocation_stacks(snapshot, before):
+    """
+    Bytes alocados entre os snapshots e ainda vivos, por pilha de alocação.
+    Só contam os rastros que passam por este middleware: o resto do processo
+    fica de fora antes da comparação.
+    """
+    filters = [
+        tracemalloc.Filter(True, __file__, all_frames=True),
+        *(tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES),
+    ]
+    snapshot = snapshot.filter_traces(filters)
+    before = before.filter_traces(filters)
+    stacks = Counter()
+    for stat in snapshot.compare_to(before, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        frames = list(stat.traceback)
+        # Só o que está abaixo do middleware (servidor e middlewares externos fora)
+        inside = [i for i, frame in enumerate(frames) if frame.filename == __file__]
+        frames = frames[inside[-1] + 1:]
+        path = ";".join(frame_label(frame.filename, str(frame.lineno)) for frame in frames)
+        stacks[path] += stat.size_diff
+    return stacks
+
+
+def merge_collapsed(path, stacks):
+    """
+    Soma stacks ao arquivo collapsed em path. O flock serializa os workers
+    do mesmo host, que escrevem no mesmo diretório.
+    """
+    if not stacks:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        merged = Counter()
+        for line in f:
+            stack, _, value = line.rstrip("\n").rpartition(" ")
+            if stack:
+                merged[stack] += int(value)
+        merged.update(stacks)
+        f.seek(0)
+        f.truncate()
+        f.writelines(f"{stack} {value}\n" for stack, value in sorted(merged.items()))
+
+
+def is_admin_request(request):
+    # O JWT só é lido pelo DRF dentro da view; aqui validamos por conta própria
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    user = result[0] if result else getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+class SamplingProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Uma vez por processo: ligar e desligar a cada requisição apagaria
+        # os rastros das outras threads
+        if settings.PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILE_TRACEMALLOC_DEPTH)
+
+    def should_profile(self, request):
+        if PROFILE_HEADER in request.META:
+            return is_admin_request(request)
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        # Ligado por PROFILE_TRACEMALLOC ou por quem mede (ex.: benchmark_api)
+        tracing = tracemalloc.is_tracing()
+        before = tracemalloc.take_snapshot() if tracing else None
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        # Antes de montar as pilhas: o trabalho do profiler fica de fora
+        snapshot = tracemalloc.take_snapshot() if tracing else None
+
+        label = view_label(request)
+        directory = settings.PROFILE_DIR
+        merge_collapsed(
+            os.path.join(directory, f"{label}.cpu.collapsed"),
+            cpu_stacks(profile, root=code_key(self.get_response)),
+        )
+        if tracing:
+            merge_collapsed(
+                os.path.join(directory, f"{label}.alloc.collapsed"),
+                allocation_stacks(snapshot, before),
+            )
+        response["X-Profiled-As"] = label
+        return response
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Item, ItemCard, ItemPhoto, UserProfile
+
+CARD_FIELDS = [
+    "user",
+    "title",
+    "type",
+    "status",
+    "listing_state",
+    "price",
+    "owner_name",
+    "owner_supabase_user_id",
+    "category",
+    "category_name",
+    "city",
+    "city_label",
+    "cover_photo_url",
+    "photo_count",
+    "created_at",
+]
+
+
+def build_item_cards(items):
+    cover = ItemPhoto.objects.filter(
+        item=OuterRef("pk"), state=ItemPhoto.READY
+    ).order_by("position")
+    items = items.select_related("user", "city", "category").annotate(
+        photo_count=Count("photos", filter=Q(photos__state=ItemPhoto.READY)),
+        cover_photo_url=Subquery(cover.values("image")[:1]),
+    )
+    supabase_ids = dict(
+        UserProfile.objects.filter(
+            user_id__in={item.user_id for item in items}
+        ).values_list("user_id", "supabase_user_id")
+    )
+    return [
+        ItemCard(
+            item_id=item.pk,
+            user_id=item.user_id,
+            title=item.title,
+            type=item.type,
+            status=item.status,
+            listing_state=item.listing_state,
+            price=item.price,
+            owner_name=item.user.first_name,
+            owner_supabase_user_id=supabase_ids.get(item.user_id),
+            category_id=item.category_id,
+            category_name=item.category.name,
+            city_id=item.city_id,
+            city_label=str(item.city) if item.city else None,
+            cover_photo_url=item.cover_photo_url,
+            photo_count=item.photo_count,
+            created_at=item.created_at,
+        )
+        for item in items
+    ]
+
+
+def touch_item(item_id):
+    """Fotos mudaram: avança updated_at para invalidar ETag/Last-Modified do item."""
+    Item.objects.filter(pk=item_id).update(updated_at=timezone.now())
+
+
+def touch_items(items):
+    """touch_item dos itens de um queryset, num UPDATE só."""
+    items.update(updated_at=timezone.now())
+
+
+def refresh_item_cards(item_ids):
+    """
+    Regrava (upsert) os cards dos itens informados. Chamado pelos
+    caminhos de escrita de item, foto, usuário, categoria e cidade.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return 0
+    cards = build_item_cards(Item.objects.filter(pk__in=item_ids))
+    ItemCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=["item"],
+        update_fields=CARD_FIELDS,
+    )
+    return len(cards)
+
+
+@transaction.atomic
+def rebuild_item_cards(batch_size=1000):
+    """
+    Reconstrói a tabela item_card do zero, em lotes. Roda numa transação:
+    leitores continuam vendo os cards antigos até o commit.
+    """
+    ItemCard.objects.all().delete()
+    ids = Item.objects.order_by("pk").values_list("pk", flat=True)
+    total = 0
+    batch = []
+    for item_id in ids.iterator(chunk_size=batch_size):
+        batch.append(item_id)
+        if len(batch) == batch_size:
+            total += refresh_item_cards(batch)
+            batch = []
+    return total + refresh_item_cards(batch)
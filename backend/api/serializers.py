@@ -1,10 +1,65 @@
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from .models import Category, City, Favorite, Item, ItemPhoto, Notification, UserProfile
-from .services import create_supabase_user, upload_item_photo
+from .fieldsets import SparseFieldsetSerializerMixin
+from .gazetteer import lookup_coordinates
+from .images import read_header, srcset
+from .models import (
+    Category,
+    City,
+    Favorite,
+    Item,
+    ItemCard,
+    ItemPhoto,
+    Notification,
+    UserProfile,
+)
+from .photo_uploads import enqueue_photos
+from .read_models import refresh_item_cards
+from .services import create_supabase_user
+
+
+def item_photos_prefetch(lookup="photos"):
+    """
+    Prefetch das fotos já ordenado por position. É o que o ItemSerializer
+    consome: com ele, listar N itens não dispara queries por item.
+    """
+    return Prefetch(lookup, queryset=ItemPhoto.objects.order_by("position"))
+
+
+def city_coordinates(name, state):
+    coordinates = lookup_coordinates(name, state)
+    if coordinates is None:
+        return {}
+    latitude, longitude = coordinates
+    return {"latitude": latitude, "longitude": longitude}
+
+
+class PhotoUploadField(serializers.FileField):
+    """
+    Foto enviada no multipart. Ao contrário do ImageField, não decodifica a
+    imagem para validá-la: confere formato e dimensões pelo cabeçalho.
+    """
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            read_header(file)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return file
+
+
+def validate_photo_files(files):
+    """Valida os arquivos do campo "photos" da requisição, um a um."""
+    field = serializers.ListField(child=PhotoUploadField())
+    try:
+        return field.run_validation(files)
+    except serializers.ValidationError as e:
+        raise serializers.ValidationError({"photos": e.detail})
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,19 +68,23 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug"]
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = City
-        fields = ["id", "name", "state"]
+        fields = ["id", "name", "state", "latitude", "longitude"]
 
 
 class ItemPhotoSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = ItemPhoto
-        fields = ["id", "image", "url", "position", "created_at"]
-        read_only_fields = ["id", "url", "created_at"]
+        fields = ["id", "image", "url", "srcset", "position", "state", "created_at"]
+        read_only_fields = ["id", "url", "srcset", "state", "created_at"]
+
+    def get_srcset(self, obj):
+        return srcset(obj.variants)
 
     def get_url(self, obj):
         if obj.image:
@@ -49,7 +108,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = [
@@ -100,7 +159,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     profile = UserProfileSerializer(source="userprofile", required=False)
 
     class Meta:
@@ -121,6 +180,8 @@ class UserSerializer(serializers.ModelSerializer):
             instance.set_password(password)
 
         user = super().update(instance, validated_data)
+        if "first_name" in validated_data:
+            refresh_item_cards(user.items.values_list("pk", flat=True))
         if profile_data:
             profile_instance = user.userprofile
 
@@ -138,7 +199,7 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     owner_supabase_user_id = serializers.SerializerMethodField()
     category_name = serializers.CharField(source="category.name", read_only=True)
     city = CitySerializer(read_only=True)
@@ -149,9 +210,24 @@ class ItemSerializer(serializers.ModelSerializer):
     images = serializers.SerializerMethodField()
     user = serializers.CharField(source="user.first_name", read_only=True)
     uploaded_photos = serializers.ListField(
-        child=serializers.ImageField(), write_only=True, required=False
+        child=PhotoUploadField(), write_only=True, required=False
     )
     photos_id = serializers.SerializerMethodField()
+    photos_srcset = serializers.SerializerMethodField()
+    pending_photos = serializers.SerializerMethodField()
+    distance_km = serializers.SerializerMethodField()
+
+    fieldset_dependencies = {
+        "owner_supabase_user_id": {
+            "select_related": ["user__userprofile"],
+            "only": ["user__userprofile__supabase_user_id"],
+        },
+        "photos": {"prefetch": ["photos"]},
+        "images": {"prefetch": ["photos"]},
+        "photos_id": {"prefetch": ["photos"]},
+        "photos_srcset": {"prefetch": ["photos"]},
+        "pending_photos": {"prefetch": ["photos"]},
+    }
 
     class Meta:
         model = Item
@@ -177,6 +253,9 @@ class ItemSerializer(serializers.ModelSerializer):
             "trade_interest",
             "uploaded_photos",
             "photos_id",
+            "photos_srcset",
+            "pending_photos",
+            "distance_km",
         ]
         read_only_fields = [
             "user",
@@ -193,15 +272,43 @@ class ItemSerializer(serializers.ModelSerializer):
         except (AttributeError, UserProfile.DoesNotExist):
             return None
 
+    def get_fieldset_prefetch(self, lookup):
+        return item_photos_prefetch(lookup)
+
+    def get_ordered_photos(self, obj, ready=True):
+        # Sem prefetch (ex.: detalhe recém-criado), carrega uma vez e reaproveita
+        if "photos" not in getattr(obj, "_prefetched_objects_cache", {}):
+            prefetch_related_objects([obj], item_photos_prefetch())
+        return [
+            photo for photo in obj.photos.all()
+            if (photo.state == ItemPhoto.READY) == ready
+        ]
+
     def get_photos(self, obj):
-        return [photo.image for photo in obj.photos.all().order_by("position")]
+        return [photo.image for photo in self.get_ordered_photos(obj)]
 
     def get_photos_id(self, obj):
-        return [photo.id for photo in obj.photos.all().order_by("position")]
+        return [photo.id for photo in self.get_ordered_photos(obj)]
+
+    def get_photos_srcset(self, obj):
+        # Paralelo a photos: o srcset (WebP e JPEG) de cada foto
+        return [srcset(photo.variants) for photo in self.get_ordered_photos(obj)]
 
     def get_images(self, obj):
         return self.get_photos(obj)
 
+    def get_pending_photos(self, obj):
+        # Fotos ainda no worker (ou que falharam): o cliente acompanha por aqui
+        return [
+            {"id": str(photo.id), "position": photo.position, "state": photo.state}
+            for photo in self.get_ordered_photos(obj, ready=False)
+        ]
+
+    def get_distance_km(self, obj):
+        # Só existe quando a listagem foi filtrada por ?near=
+        distance = getattr(obj, "distance", None)
+        return float(distance) if distance is not None else None
+
     @transaction.atomic
     def create(self, validated_data):
         uploaded_photos = validated_data.pop("uploaded_photos", [])
@@ -209,28 +316,39 @@ class ItemSerializer(serializers.ModelSerializer):
         city_state = validated_data.pop("city_state", None)
 
         if city_name and city_state:
-            city, created = City.objects.get_or_create(name=city_name, state=city_state)
+            city, created = City.objects.get_or_create(
+                name=city_name,
+                state=city_state,
+                defaults=city_coordinates(city_name, city_state),
+            )
             validated_data["city"] = city
 
         item = Item.objects.create(**validated_data)
+        # O envio ao Storage fica com o worker: a transação fecha sem esperar S3
+        enqueue_photos(item, uploaded_photos)
 
-        for index, photo_file in enumerate(uploaded_photos, start=1):
-            try:
-                filename = f"items/{item.id}_{photo_file.name}"
-                image_url = upload_item_photo(photo_file, filename)
+        refresh_item_cards([item.pk])
+        return item
 
-                ItemPhoto.objects.create(item=item, image=image_url, position=index)
 
-            except Exception as e:
-                raise serializers.ValidationError(
-                    {"photos": f"Erro no upload para Supabase: {e}"}
-                )
+class ItemListSerializer(ItemSerializer):
+    """
+    Representação de listagem: igual ao ItemSerializer, sem o array images
+    duplicado e sem as fotos pendentes.
+    """
 
-        return item
+    images = None
+    pending_photos = None
+
+    class Meta(ItemSerializer.Meta):
+        fields = [
+            name for name in ItemSerializer.Meta.fields
+            if name not in ("images", "pending_photos")
+        ]
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    item = ItemSerializer(read_only=True)
+class FavoriteSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    item = ItemListSerializer(read_only=True)
     item_id = serializers.UUIDField(write_only=True)
 
     class Meta:
@@ -241,3 +359,28 @@ class FavoriteSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
+
+
+class ItemCardSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(source="item_id", read_only=True)
+
+    class Meta:
+        model = ItemCard
+        fields = [
+            "id",
+            "title",
+            "type",
+            "status",
+            "listing_state",
+            "price",
+            "owner_name",
+            "owner_supabase_user_id",
+            "category",
+            "category_name",
+            "city",
+            "city_label",
+            "cover_photo_url",
+            "photo_count",
+            "created_at",
+        ]
+        read_only_fields = fields
@@ -1,23 +1,82 @@
+import mimetypes
 import os
 
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from storages.backends.s3boto3 import S3Boto3Storage
 from supabase import Client, create_client
 
-from .models import ItemPhoto
+from .images import FORMATS, build_derivatives, derivative_filename, variant_urls
+from .instrumentation import timed
+from .metrics import track_call
+from .models import ItemPhoto, StorageDeletion
+from .storage import is_s3, photo_storage
 
 supabase: Client = create_client(
     os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY")
 )
 
 
+def lock_photo_content(content_hash):
+    """
+    Lock (até o fim da transação) do objeto de content_hash: serializa quem
+    apaga a última referência e quem passa a reaproveitá-lo.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", [content_hash]
+        )
+
+
+def lock_photo_contents(content_hashes):
+    """lock_photo_content de vários conteúdos numa query, em ordem fixa."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended(h, 0)) "
+            "FROM unnest(%s::text[]) AS h ORDER BY h",
+            [sorted(content_hashes)],
+        )
+
+
+def photo_content_in_use(content_hash):
+    """Alguma ItemPhoto ainda aponta para o objeto deste conteúdo?"""
+    return (
+        ItemPhoto.objects.filter(content_hash=content_hash).exclude(image="").exists()
+    )
+
+
+def photo_key(image_url):
+    """Nome do arquivo no Storage a partir da URL guardada na foto."""
+    return image_url.replace(photo_storage().url(""), "")
+
+
+def record_storage_deletions(urls, content_hash=""):
+    """
+    Põe os arquivos de urls no outbox (StorageDeletion), na transação atual:
+    saem do Storage depois do commit, pelo drenador.
+    """
+    StorageDeletion.objects.bulk_create(
+        StorageDeletion(url=url, content_hash=content_hash) for url in urls
+    )
+
+
 @receiver(post_delete, sender=ItemPhoto)
 def delete_file_on_itemphoto_delete(sender, instance, **kwargs):
+    # Nada de Storage dentro da transação: uma falha de rede não desfaz a
+    # exclusão, e apagar item ou conta não espera uma chamada por arquivo.
+    # O drenador (api/storage_deletions.py) confere se o conteúdo ficou sem
+    # referência antes de apagar o objeto compartilhado.
+    urls = variant_urls(instance.variants)
     if instance.image:
-        delete_item_photo_service(instance.image)
+        urls.insert(0, instance.image)
+    if urls:
+        record_storage_deletions(urls, instance.content_hash)
 
 
+@track_call
 def create_supabase_user(email, password, first_name="", last_name=""):
     """
     Cria um usuário no Supabase Auth e retorna o UUID.
@@ -41,9 +100,11 @@ def create_supabase_user(email, password, first_name="", last_name=""):
         raise e
 
 
+@timed("storage")
+@track_call
 def upload_item_photo(uploaded_file, filename):
     try:
-        storage = S3Boto3Storage()
+        storage = photo_storage()
         path = storage.save(filename, uploaded_file)
         print(f"orint do service {path}")
         url = storage.url(path)
@@ -54,19 +115,137 @@ def upload_item_photo(uploaded_file, filename):
         raise e
 
 
-def delete_item_photo_service(image_url):
+def upload_item_photo_variants(content, filename):
+    """
+    Gera as derivadas da foto (api/images.py, no pool de processos) e envia
+    cada uma ao Storage ao lado do original. Retorna o mapa gravado em
+    ItemPhoto.variants. Se um envio falha, apaga as que já subiram.
+    """
+    variants = {}
+    try:
+        for name, entry in build_derivatives(content).items():
+            variants[name] = {"width": entry["width"], "height": entry["height"]}
+            for extension in FORMATS:
+                path = derivative_filename(filename, name, extension)
+                variants[name][extension] = upload_item_photo(
+                    ContentFile(entry[extension], name=path), path
+                )
+    except Exception:
+        for url in variant_urls(variants):
+            try:
+                delete_item_photo_service(url)
+            except Exception:
+                pass
+        raise
+    return variants
+
+
+@track_call
+def presign_item_photo_upload(key, content_type, size):
+    """
+    POST pré-assinado ({"url", "fields"}) para o cliente enviar a foto
+    direto ao Storage, válido por PHOTO_PRESIGN_EXPIRES_SECONDS. A política
+    assinada fixa a key, o Content-Type e o tamanho declarado: o S3 recusa
+    um arquivo diferente. Só existe no backend S3 (ver
+    direct_uploads_available).
+    """
+    storage = photo_storage()
+    return storage.bucket.meta.client.generate_presigned_post(
+        storage.bucket_name,
+        key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", size, size],
+        ],
+        ExpiresIn=settings.PHOTO_PRESIGN_EXPIRES_SECONDS,
+    )
+
+
+def direct_uploads_available():
+    """Upload por URL pré-assinada: só no backend S3."""
+    return is_s3(photo_storage())
+
+
+@timed("storage")
+@track_call
+def head_item_photo(key):
+    """
+    HEAD do objeto enviado pelo cliente: {"url", "size", "content_type"},
+    ou None se ele não existe.
+    """
+    storage = photo_storage()
+    if not is_s3(storage):
+        if not storage.exists(key):
+            return None
+        return {
+            "url": storage.url(key),
+            "size": storage.size(key),
+            "content_type": mimetypes.guess_type(key)[0] or "",
+        }
     try:
-        storage = S3Boto3Storage()
+        head = storage.bucket.meta.client.head_object(
+            Bucket=storage.bucket_name, Key=key
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return {
+        "url": storage.url(key),
+        "size": head["ContentLength"],
+        "content_type": head.get("ContentType", ""),
+    }
+
 
-        base_url = storage.url("")
-        path = image_url.replace(base_url, "")
-        storage.delete(path)
+@timed("storage")
+@track_call
+def download_item_photo(key):
+    """Bytes de uma foto já no Storage (o worker gera as derivadas dela)."""
+    storage = photo_storage()
+    with storage.open(key) as f:
+        return f.read()
+
+
+@timed("storage")
+@track_call
+def delete_item_photo_service(image_url):
+    try:
+        storage = photo_storage()
+        storage.delete(photo_key(image_url))
 
     except Exception as e:
         print(f"ERRO AO DELETAR FOTO DO STORAGE: {e}")
         raise e
 
 
+def delete_photo_objects(urls):
+    """
+    Apaga os arquivos de urls do Storage (no S3, um DeleteObjects para até
+    1000) e retorna {url: erro} dos que falharam.
+    """
+    keys = {photo_key(url): url for url in urls}
+    failed = delete_photo_keys(keys)
+    return {keys[key]: error for key, error in failed.items()}
+
+
+@timed("storage")
+@track_call
+def delete_photo_keys(keys):
+    """delete_photo_objects pelos nomes no Storage: {key: erro} das falhas."""
+    storage = photo_storage()
+    if is_s3(storage):
+        return storage.delete_many(keys)
+    failed = {}
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            failed[key] = f"{type(e).__name__}: {e}"
+    return failed
+
+
+@track_call
 def delete_supabase_user(supabase_user_id):
     """
     Deleta um usuário no Supabase Auth usando a API Admin.
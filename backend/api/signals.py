@@ -1,19 +1,71 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import pre_delete
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 
-from .models import UserProfile
+from .models import Category, City, Item, UserProfile
+from .read_models import refresh_item_cards, touch_items
 from .services import delete_supabase_user
 
 
 @receiver(pre_delete, sender=User)
 def delete_supabase_user_on_django_user_delete(sender, instance, **kwargs):
     """
-    Signal para deletar o usuário do Supabase quando um usuário do Django for deletado.
+    Apaga o usuário no Supabase Auth depois do commit da exclusão do User:
+    um rollback não deixa a conta sem login no Supabase, e a chamada à API
+    Admin não segura a transação aberta.
     """
-    try:
-        profile = UserProfile.objects.filter(user=instance).first()
-        if profile and profile.supabase_user_id:
-            delete_supabase_user(profile.supabase_user_id)
-    except Exception as e:
-        print(f"ERRO NO SIGNAL DE DELEÇÃO DO USUÁRIO: {e}")
+    supabase_user_id = (
+        UserProfile.objects.filter(user=instance)
+        .values_list("supabase_user_id", flat=True)
+        .first()
+    )
+    if supabase_user_id:
+        transaction.on_commit(lambda: delete_supabase_user(supabase_user_id))
+
+
+@receiver(post_save, sender=Item)
+def update_item_search_vector(sender, instance, raw=False, **kwargs):
+    """
+    Mantém o search_vector do item atualizado a cada criação/edição.
+    """
+    if raw:
+        return
+    Item.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=City)
+def update_related_items_search_vector(sender, instance, created, raw=False, **kwargs):
+    """
+    Renomear categoria/cidade altera o texto indexado, o ETag e os cards dos
+    itens ligados a ela.
+    """
+    if created or raw:
+        return
+    lookup = "category" if sender is Category else "city"
+    items = Item.objects.filter(**{lookup: instance})
+    items.update_search_vector()
+    touch_items(items)
+    refresh_item_cards(items.values_list("pk", flat=True))
+
+
+# Campos do dono que aparecem no item (ItemSerializer.user e
+# owner_supabase_user_id)
+OWNER_FIELDS = {User: "first_name", UserProfile: "supabase_user_id"}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def touch_owner_items(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Mudar o nome ou o perfil do dono muda os itens dele: avança o updated_at
+    para o ETag/Last-Modified não continuar respondendo 304. Saves parciais
+    de outros campos (ex.: last_login) não contam.
+    """
+    if created or raw:
+        return
+    if update_fields is not None and OWNER_FIELDS[sender] not in update_fields:
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    touch_items(Item.objects.filter(user_id=user_id))
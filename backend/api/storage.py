@@ -0,0 +1,227 @@
+"""
+Storage das fotos, um por processo, escolhido por PHOTO_STORAGE_BACKEND:
+"s3" (Supabase Storage), "local" (MEDIA_ROOT) ou "memory" (testes e
+benchmarks offline). No S3 todas as threads dividem um cliente boto3 com
+pool de conexões, keep-alive, retries e timeouts de PHOTO_STORAGE_*, em vez
+de sessão, credenciais e TLS novos a cada chamada. Arquivos grandes sobem
+em multipart, em partes de tamanho fixo (transfer_config).
+"""
+
+import os
+import posixpath
+import threading
+import time
+from itertools import islice
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, InMemoryStorage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+# Limite de keys de um DeleteObjects
+MAX_DELETE_KEYS = 1000
+
+_lock = threading.Lock()
+_storage = None
+
+
+class PooledS3Storage(S3Boto3Storage):
+    """
+    S3Boto3Storage com um só cliente boto3 para o processo. O S3Boto3Storage
+    cria sessão, cliente e recurso por thread; as threads do worker de fotos
+    duram um lote, então cada lote reabria as conexões. O cliente é
+    thread-safe e o pool de conexões é dele. Recursos e Buckets do boto3 não
+    são: cada thread monta os seus sobre o cliente, sem abrir conexões.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client = None
+        self._resource_class = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def connection(self):
+        connection = getattr(self._connections, "connection", None)
+        if connection is None:
+            if self._client is None:
+                with self._client_lock:
+                    if self._client is None:
+                        resource = self._create_session().resource(
+                            "s3",
+                            region_name=self.region_name,
+                            use_ssl=self.use_ssl,
+                            endpoint_url=self.endpoint_url,
+                            config=self.client_config,
+                            verify=self.verify,
+                        )
+                        self._resource_class = type(resource)
+                        self._client = resource.meta.client
+            connection = self._resource_class(client=self._client)
+            self._connections.connection = connection
+        return connection
+
+    @property
+    def bucket(self):
+        # O S3Boto3Storage guarda um Bucket só, usado por todas as threads
+        bucket = getattr(self._connections, "bucket", None)
+        if bucket is None:
+            bucket = self.connection.Bucket(self.bucket_name)
+            self._connections.bucket = bucket
+        return bucket
+
+    def delete_many(self, names):
+        """
+        Apaga até MAX_DELETE_KEYS arquivos numa requisição DeleteObjects.
+        Retorna {nome: erro} dos que falharam; arquivo que já não existe
+        conta como apagado, como no delete().
+        """
+        keys = {self._normalize_name(clean_name(name)): name for name in names}
+        response = self.bucket.meta.client.delete_objects(
+            Bucket=self.bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        return {
+            keys[error["Key"]]: f"{error['Code']}: {error['Message']}"
+            for error in response.get("Errors", [])
+        }
+
+
+def client_config():
+    return Config(
+        s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+        max_pool_connections=settings.PHOTO_STORAGE_MAX_CONNECTIONS,
+        connect_timeout=settings.PHOTO_STORAGE_CONNECT_TIMEOUT,
+        read_timeout=settings.PHOTO_STORAGE_READ_TIMEOUT,
+        retries={
+            "mode": "standard",
+            "max_attempts": settings.PHOTO_STORAGE_MAX_ATTEMPTS,
+        },
+        tcp_keepalive=True,
+    )
+
+
+def transfer_config():
+    """
+    Multipart a partir de PHOTO_STORAGE_MULTIPART_THRESHOLD: o arquivo é lido
+    e enviado em partes, com no máximo CONCURRENCY partes na memória.
+    """
+    return TransferConfig(
+        multipart_threshold=settings.PHOTO_STORAGE_MULTIPART_THRESHOLD,
+        multipart_chunksize=settings.PHOTO_STORAGE_MULTIPART_CHUNK_SIZE,
+        max_concurrency=settings.PHOTO_STORAGE_MULTIPART_CONCURRENCY,
+    )
+
+
+def build_storage():
+    backend = settings.PHOTO_STORAGE_BACKEND
+    if backend == "s3":
+        return PooledS3Storage(
+            client_config=client_config(), transfer_config=transfer_config()
+        )
+    if backend == "local":
+        # Keys por conteúdo: salvar de novo a mesma key sobrescreve, como no S3
+        return FileSystemStorage(
+            location=settings.MEDIA_ROOT,
+            base_url=settings.MEDIA_URL,
+            allow_overwrite=True,
+        )
+    if backend == "memory":
+        return InMemoryStorage(base_url=settings.MEDIA_URL)
+    raise ValueError(f"PHOTO_STORAGE_BACKEND desconhecido: {backend!r}")
+
+
+def photo_storage():
+    """O storage das fotos deste processo, criado no primeiro uso."""
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                _storage = build_storage()
+    return _storage
+
+
+def is_s3(storage):
+    return isinstance(storage, S3Boto3Storage)
+
+
+def list_files(storage, prefix="", page_size=MAX_DELETE_KEYS):
+    """
+    Arquivos do storage cujo nome começa com prefix, em páginas de até
+    page_size tuplas (nome, modificado em, bytes). No S3 cada página é um
+    ListObjectsV2; nos outros backends os diretórios são lidos um a um.
+    """
+    if is_s3(storage):
+        root = f"{storage.location}/" if storage.location else ""
+        paginator = storage.bucket.meta.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=storage.bucket_name,
+            Prefix=root + prefix,
+            PaginationConfig={"PageSize": page_size},
+        )
+        for page in pages:
+            yield [
+                (obj["Key"][len(root):], obj["LastModified"], obj["Size"])
+                for obj in page.get("Contents", [])
+            ]
+        return
+    names = (
+        name
+        for name in _walk(storage, posixpath.dirname(prefix))
+        if name.startswith(prefix)
+    )
+    while page := list(islice(names, page_size)):
+        yield [
+            (name, storage.get_modified_time(name), storage.size(name))
+            for name in page
+        ]
+
+
+def _walk(storage, directory):
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in sorted(files):
+        yield posixpath.join(directory, name)
+    for name in sorted(directories):
+        yield from _walk(storage, posixpath.join(directory, name))
+
+
+def storage_health():
+    """
+    Sonda do storage: no S3 um HEAD no bucket (credenciais, rede e bucket);
+    no local, se MEDIA_ROOT aceita escrita. Retorna backend, ok, latência e
+    o erro, se houver.
+    """
+    storage = photo_storage()
+    start = time.perf_counter()
+    error = None
+    try:
+        if is_s3(storage):
+            storage.bucket.meta.client.head_bucket(Bucket=storage.bucket_name)
+        elif isinstance(storage, FileSystemStorage):
+            os.makedirs(storage.location, exist_ok=True)
+            if not os.access(storage.location, os.W_OK):
+                error = f"{storage.location} não aceita escrita"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "backend": settings.PHOTO_STORAGE_BACKEND,
+        "ok": error is None,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        "error": error,
+    }
+
+
+@receiver(setting_changed)
+def reset_photo_storage(setting, **kwargs):
+    # override_settings nos testes: o próximo uso recria com a configuração nova
+    global _storage
+    if setting.startswith(("AWS_", "PHOTO_STORAGE_", "MEDIA_")):
+        with _lock:
+            _storage = None
@@ -0,0 +1,101 @@
+"""
+Drenador do outbox de exclusões no Storage (StorageDeletion). Apagar uma
+foto, um item ou uma conta só grava as URLs na transação; o drenador
+(manage.py drain_storage_deletions) as apaga depois do commit, em lotes de
+até MAX_DELETE_KEYS por DeleteObjects. Falhas voltam para a fila com o
+backoff dos uploads de fotos até STORAGE_DELETION_MAX_ATTEMPTS.
+
+Objetos por conteúdo (api/photo_uploads.content_key) podem ter voltado a
+ser usados por uma foto igual desde a exclusão: esses saem do outbox sem
+sair do Storage. A conferência e o DeleteObjects correm na mesma transação,
+com os locks de conteúdo presos até o objeto sair: quem for passar a usar
+o conteúdo (enqueue_photos, finish_item) espera e envia de novo.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ItemPhoto, StorageDeletion
+from .photo_uploads import retry_delay
+from .services import delete_photo_objects, lock_photo_contents
+from .storage import MAX_DELETE_KEYS
+
+DELETED = "deleted"
+KEPT = "kept"
+RETRY = "retry"
+FAILED = "failed"
+
+
+def claim_deletions(limit):
+    """
+    Reserva até limit exclusões vencidas, como claim_uploads: SKIP LOCKED
+    para vários drenadores e um lease para o que morrer no meio.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        deletions = list(
+            StorageDeletion.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:limit]
+        )
+        lease = now + timedelta(seconds=settings.PHOTO_UPLOAD_LEASE_SECONDS)
+        for deletion in deletions:
+            deletion.attempts += 1
+            deletion.next_attempt_at = lease
+        StorageDeletion.objects.bulk_update(deletions, ["attempts", "next_attempt_at"])
+    return deletions
+
+
+def contents_in_use(content_hashes):
+    """
+    Dos conteúdos, os que alguma ItemPhoto usa, pronta ou ainda subindo
+    para a mesma key. Chame dentro de uma transação e apague os outros
+    antes do commit: os locks valem até o fim dela.
+    """
+    if not content_hashes:
+        return set()
+    lock_photo_contents(content_hashes)
+    return set(
+        ItemPhoto.objects.filter(content_hash__in=content_hashes)
+        .values_list("content_hash", flat=True)
+        .distinct()
+    )
+
+
+def drain_deletions(limit=MAX_DELETE_KEYS):
+    """
+    Apaga do Storage um lote do outbox. Retorna {resultado: quantidade}:
+    deleted, kept (conteúdo em uso), retry e failed.
+    """
+    deletions = claim_deletions(min(limit, MAX_DELETE_KEYS))
+    if not deletions:
+        return {}
+    with transaction.atomic():
+        in_use = contents_in_use({d.content_hash for d in deletions} - {""})
+        kept = [d for d in deletions if d.content_hash in in_use]
+        pending = [d for d in deletions if d.content_hash not in in_use]
+
+        urls = sorted({deletion.url for deletion in pending})
+        try:
+            failures = delete_photo_objects(urls) if urls else {}
+        except Exception as e:
+            failures = dict.fromkeys(urls, f"{type(e).__name__}: {e}")
+
+    done = kept + [d for d in pending if d.url not in failures]
+    StorageDeletion.objects.filter(pk__in=[d.pk for d in done]).delete()
+    results = Counter({DELETED: len(done) - len(kept), KEPT: len(kept)})
+    failed = [d for d in pending if d.url in failures]
+    for deletion in failed:
+        deletion.last_error = failures[deletion.url]
+        if deletion.attempts >= settings.STORAGE_DELETION_MAX_ATTEMPTS:
+            deletion.next_attempt_at = None
+            results[FAILED] += 1
+        else:
+            deletion.next_attempt_at = timezone.now() + retry_delay(deletion.attempts)
+            results[RETRY] += 1
+    StorageDeletion.objects.bulk_update(failed, ["last_error", "next_attempt_at"])
+    return {result: count for result, count in results.items() if count}
@@ -1,5 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.contrib.auth.models import User
+from api.gazetteer import lookup_coordinates
 from api.models import Category, City, Item, UserProfile, ItemPhoto, Notification
 import uuid
 
@@ -90,4 +94,19 @@ class ModelTests(TestCase):
         
         self.assertEqual(notification.user.username, "notif_test@example.com")
         self.assertEqual(notification.notification_type, "system")
-        self.assertEqual(notification.is_read, False)  # Valor default
\ No newline at end of file
+        self.assertEqual(notification.is_read, False)  # Valor default
+
+class GazetteerTests(TestCase):
+    def test_lookup_ignores_accents_and_case(self):
+        """Testa busca de coordenadas no gazetteer offline"""
+        latitude, longitude = lookup_coordinates("sao paulo", "sp")
+        self.assertAlmostEqual(latitude, -23.55, places=1)
+        self.assertAlmostEqual(longitude, -46.63, places=1)
+        self.assertIsNone(lookup_coordinates("Cidade Inexistente", "SP"))
+
+    def test_load_cities_command(self):
+        """Testa que load_cities preenche as coordenadas das cidades existentes"""
+        city = City.objects.create(name="Curitiba", state="PR")
+        call_command("load_cities", stdout=StringIO())
+        city.refresh_from_db()
+        self.assertAlmostEqual(city.latitude, -25.43, places=1)
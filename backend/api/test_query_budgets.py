@@ -0,0 +1,257 @@
+"""
+Orçamento de queries por endpoint: cada rota de api/urls.py e chat/urls.py
+roda com 1, 10 e 100 linhas de fixture. Falha se o número de queries
+cresce com as linhas (N+1) ou passa do orçamento declarado em BUDGETS.
+"""
+
+import json
+import tempfile
+import uuid
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APITestCase
+
+from api.benchmarks import routes, send_request, stub_services
+from api.models import Category, City, Favorite, Item, ItemPhoto, UserProfile
+from api.read_models import refresh_item_cards
+from chat.models import Conversation, Message
+
+ROW_COUNTS = (1, 10, 100)
+
+# rota -> máximo de queries por requisição
+BUDGETS = {
+    "users/": 1,
+    "users/delete/<int:pk>/": 11,
+    "users/profile/": 1,
+    "users/profile/update/": 7,
+    "items/": 4,
+    "items/my-items/": 2,
+    "items/cards/": 1,
+    "items/autocomplete/": 1,
+    "items/create/": 19,
+    "items/<uuid:pk>/": 3,
+    "items/update/<uuid:pk>/": 8,
+    "items/delete/<uuid:pk>/": 9,
+    "items/<uuid:item_id>/photos/": 9,
+    "items/<uuid:item_id>/photos/presign/": 2,
+    "items/<uuid:item_id>/photos/complete/": 8,
+    "items/<uuid:item_id>/photos/status/": 1,
+    "items/photos/<uuid:photo_id>/": 8,
+    "categories/": 3,
+    "categories/create/": 3,
+    "cities/": 3,
+    "search-items/": 3,
+    "favorites/": 1,
+    "favorites/add/": 8,
+    "favorites/remove/<uuid:item_id>/": 2,
+    "favorites/check/<uuid:item_id>/": 1,
+    "chat/conversations/": 3,
+    "chat/conversations/create/": 8,
+    "chat/conversations/<uuid:conversation_id>/messages/send/": 7,
+    "chat/conversations/<uuid:conversation_id>/messages/": 3,
+    "chat/conversations/<uuid:conversation_id>/read/": 6,
+}
+
+
+def create_chat_tables():
+    """As tabelas do chat são do Supabase (managed=False); o teste as cria."""
+    existing = connection.introspection.table_names()
+    with connection.schema_editor() as editor:
+        for model in (Conversation, Message):
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS auth")
+        cursor.execute("CREATE TABLE IF NOT EXISTS auth.users (id uuid PRIMARY KEY)")
+
+
+class QueryBudgetTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_chat_tables()
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cls.has_trigram = True
+        except DatabaseError:
+            cls.has_trigram = False
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="budget@example.com", password="testpass123",
+            first_name="Bia", is_staff=True
+        )
+        UserProfile.objects.create(user=self.user, supabase_user_id=uuid.uuid4())
+        self.addCleanup(stub_services().close)
+
+    def populate(self, n):
+        """n linhas de cada coisa que as listagens leem."""
+        me = self.user.userprofile.supabase_user_id
+        categories = Category.objects.bulk_create(
+            Category(name=f"Categoria {i}", slug=f"categoria-{i}") for i in range(n)
+        )
+        cities = City.objects.bulk_create(
+            City(name=f"Cidade {i}", state="SP", latitude=-23.5, longitude=-46.6)
+            for i in range(n)
+        )
+        items = Item.objects.bulk_create(
+            Item(
+                user=self.user, title=f"Bicicleta {i}", description="Aro 29",
+                category=categories[i % n], city=cities[i % n], status="used",
+                price=100 + i,
+            )
+            for i in range(n + 1)
+        )
+        ItemPhoto.objects.bulk_create(
+            ItemPhoto(item=item, image=f"https://cdn/{item.pk}-{position}.jpg",
+                      position=position)
+            for item in items
+            for position in (1, 2)
+        )
+        Item.objects.all().update_search_vector()
+        refresh_item_cards([item.pk for item in items])
+        # o último item fica fora dos favoritos para favorites/add/
+        Favorite.objects.bulk_create(
+            Favorite(user=self.user, item=item) for item in items[:n]
+        )
+
+        peers = User.objects.bulk_create(
+            User(username=f"peer{i}@example.com", first_name=f"Peer {i}")
+            for i in range(n)
+        )
+        profiles = UserProfile.objects.bulk_create(
+            UserProfile(user=peer, supabase_user_id=uuid.uuid4()) for peer in peers
+        )
+        conversations = Conversation.objects.bulk_create(
+            Conversation(
+                id=uuid.uuid4(), user_a_id=me, user_b_id=profile.supabase_user_id,
+                created_at=self.user.date_joined,
+            )
+            for profile in profiles
+        )
+        Message.objects.bulk_create(
+            Message(
+                id=uuid.uuid4(), conversation_id=conversations[0].id, sender_id=me,
+                body=f"Mensagem {i}", sent_at=self.user.date_joined,
+            )
+            for i in range(n)
+        )
+        stranger = uuid.uuid4()
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO auth.users (id) VALUES (%s)", [stranger])
+
+        return {
+            "item": items[0],
+            "spare_item": items[n],
+            "photo": items[0].photos.first(),
+            "peer": peers[0],
+            "stranger": stranger,
+            "conversation": conversations[0],
+        }
+
+    def count_queries(self, route, rows):
+        # usuário recarregado: nada de cache de relações entre requisições
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        sid = transaction.savepoint()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = send_request(self.client, route, rows)
+        finally:
+            transaction.savepoint_rollback(sid)
+        self.assertLess(
+            response.status_code, 400, f"{route}: {response.content[:300]}"
+        )
+        return len(queries)
+
+    def test_every_route_has_a_budget(self):
+        """Testa que toda rota nova declara seu orçamento de queries"""
+        self.assertEqual(sorted(routes()), sorted(BUDGETS))
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        """Testa que nenhum endpoint faz N+1 nem passa do orçamento"""
+        counts = {route: {} for route in routes()}
+        if not self.has_trigram:
+            counts.pop("items/autocomplete/")
+
+        for n in ROW_COUNTS:
+            sid = transaction.savepoint()
+            rows = self.populate(n)
+            for route in counts:
+                counts[route][n] = self.count_queries(route, rows)
+            transaction.savepoint_rollback(sid)
+
+        for route, by_rows in counts.items():
+            with self.subTest(route=route):
+                self.assertEqual(
+                    len(set(by_rows.values())), 1,
+                    f"{route}: queries crescem com as linhas {by_rows}",
+                )
+                self.assertLessEqual(
+                    max(by_rows.values()), BUDGETS[route],
+                    f"{route}: {by_rows} passa do orçamento de {BUDGETS[route]}",
+                )
+
+
+class SeedAndBenchmarkTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_chat_tables()
+
+    def test_seed_then_benchmark(self):
+        """Testa o seed_data em lotes e o relatório JSON do benchmark_api"""
+        call_command(
+            "seed_data", "--users", "4", "--categories", "2", "--cities", "3",
+            "--items", "15", "--photos-per-item", "2", "--favorites", "8",
+            "--notifications", "5", "--conversations", "3", "--messages", "9",
+            "--batch-size", "4", stdout=StringIO(),
+        )
+        self.assertEqual(Item.objects.count(), 15)
+        self.assertEqual(ItemPhoto.objects.count(), 30)
+        self.assertEqual(Message.objects.count(), 9)
+        self.assertFalse(Item.objects.filter(search_vector=None).exists())
+        self.assertFalse(Conversation.objects.filter(last_message_at=None).exists())
+
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command(
+                "benchmark_api", "--iterations", "2", "--warmup", "0",
+                "--output", output.name, stdout=StringIO(),
+            )
+            report = json.load(output)
+
+        self.assertEqual(report["dataset"]["item"], 15)
+        self.assertEqual(sorted(report["endpoints"]), sorted(routes()))
+        items = report["endpoints"]["items/"]
+        self.assertEqual(items["status"], [200])
+        self.assertEqual(items["queries"], BUDGETS["items/"])
+        self.assertLessEqual(items["p50_ms"], items["p99_ms"])
+        self.assertGreater(items["peak_memory_kb"], 0)
+
+    @override_settings(
+        FILE_UPLOAD_MAX_MEMORY_SIZE=64 * 1024, PHOTO_UPLOAD_CHUNK_BYTES=64 * 1024
+    )
+    def test_benchmark_uploads(self):
+        """Testa o relatório do benchmark_uploads e a memória da requisição limitada"""
+        User.objects.create_user(
+            username="admin@example.com", password="x", is_staff=True
+        )
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command(
+                "benchmark_uploads", "--sizes-mb", "0.5", "3",
+                "--output", output.name, stdout=StringIO(),
+            )
+            report = json.load(output)
+
+        self.assertEqual(sorted(report["uploads"]), ["0.5", "3"])
+        for measured in report["uploads"].values():
+            self.assertEqual(measured["status"], 202)
+            self.assertEqual(measured["worker_states"], {"ready": 1})
+            self.assertGreater(measured["worker_peak_kb"], 0)
+        # Em pedaços de 64 KB, a requisição não segura o arquivo inteiro
+        self.assertLess(report["uploads"]["3"]["request_peak_per_byte"], 1)
+        self.assertFalse(Item.objects.exists())
@@ -1,12 +1,79 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+import boto3
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from moto import mock_aws
+from PIL import Image
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth.models import User
-from api.models import Category, City, Item, UserProfile
+from api.instrumentation import RequestMetrics, normalize_sql
+from api.metrics import render_metrics, start_metrics_server
+from api import images
+from api.images import build_derivatives, render_derivatives, srcset
+from api.photo_uploads import (
+    claim_uploads,
+    content_key,
+    purge_failed_photos,
+    read_content,
+    shared_copies,
+)
+from api.services import (
+    create_supabase_user,
+    head_item_photo,
+    lock_photo_contents,
+    upload_item_photo,
+    upload_item_photo_variants,
+)
+from api.orphan_photos import delete_orphans
+from api.storage import PooledS3Storage, list_files, photo_storage
+from api.storage_deletions import drain_deletions
+from api.models import (
+    Category, City, Favorite, Item, ItemCard, ItemPhoto, PhotoUpload,
+    StorageDeletion, UserProfile,
+)
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
+def png_bytes(color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", (4, 4), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG_BYTES = png_bytes()
+COLORS = ("red", "green", "blue")
+
+
+def stored_url(data, name):
+    """URL que o upload_item_photo simulado devolve para o arquivo."""
+    return f"https://cdn/{content_key(hashlib.sha256(data).hexdigest(), name)}"
+
+
 class ViewTests(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -41,7 +108,7 @@ class ViewTests(APITestCase):
         url = reverse('get-items')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data['results'], list)
 
     def test_user_profile_access(self):
         """Testa acesso ao perfil do usuário"""
@@ -68,6 +135,1683 @@ class ViewTests(APITestCase):
         self.assertIn(response.status_code, [status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST])
 
 
+    @patch("api.signals.delete_supabase_user")
+    def test_delete_user_removes_supabase_user_after_commit(self, delete_supabase_user):
+        """Testa que o Supabase só é chamado depois do commit da exclusão"""
+        supabase_user_id = uuid.uuid4()
+        UserProfile.objects.create(user=self.user, supabase_user_id=supabase_user_id)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete(reverse('delete-user', args=[self.user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        delete_supabase_user.assert_not_called()
+        for callback in callbacks:
+            callback()
+        delete_supabase_user.assert_called_once_with(supabase_user_id)
+
+class ItemCursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cursor_test@example.com",
+            email="cursor_test@example.com",
+            password="testpass123"
+        )
+        category = Category.objects.create(name="Livros", slug="livros")
+        self.items = [
+            Item.objects.create(
+                user=self.user, title=f"Item {i}", category=category, status="used"
+            )
+            for i in range(5)
+        ]
+
+    def test_items_are_paginated_by_cursor(self):
+        """Testa que a listagem percorre todos os itens via cursores opacos"""
+        url = reverse('get-items')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('cursor=', response.data['next'])
+
+        seen = [item['id'] for item in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            seen.extend(item['id'] for item in response.data['results'])
+            next_url = response.data['next']
+
+        expected = [
+            str(item.id)
+            for item in sorted(self.items, key=lambda i: (-i.created_at.timestamp(), str(i.id)))
+        ]
+        self.assertEqual(seen, expected)
+
+    def test_my_items_are_paginated(self):
+        """Testa que my-items também retorna página com cursores"""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(reverse('my-items'), {'page_size': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+
+class SearchItemViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="search_test@example.com",
+            email="search_test@example.com",
+            password="testpass123"
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.category = Category.objects.create(name="Eletrodomésticos", slug="eletro")
+        self.city = City.objects.create(name="Florianópolis", state="SC")
+        self.fridge = Item.objects.create(
+            user=self.user, title="Geladeira frost free", category=self.category,
+            city=self.city, status="used"
+        )
+        self.stove = Item.objects.create(
+            user=self.user, title="Fogão 4 bocas",
+            description="Acompanha geladeiras antigas de brinde",
+            category=self.category, status="used"
+        )
+
+    def search(self, term):
+        response = self.client.get(reverse('search-items'), {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_uses_portuguese_stemming_and_rank(self):
+        """Testa que o plural casa com o singular e o título pesa mais que a descrição"""
+        self.assertEqual(self.search("geladeiras"), [str(self.fridge.id), str(self.stove.id)])
+
+    def test_search_covers_city_and_category(self):
+        """Testa busca pelo nome da cidade e da categoria"""
+        self.assertEqual(self.search("Florianópolis"), [str(self.fridge.id)])
+        self.assertEqual(len(self.search("eletrodomésticos")), 2)
+
+    def test_search_follows_category_rename(self):
+        """Testa que renomear a categoria reindexa os itens"""
+        self.category.name = "Cozinha"
+        self.category.save()
+        self.assertEqual(len(self.search("cozinha")), 2)
+
+
+class TrigramSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError:
+            raise unittest.SkipTest("pg_trgm não disponível neste PostgreSQL")
+
+        cls.user = User.objects.create_user(
+            username="trigram_test@example.com",
+            email="trigram_test@example.com",
+            password="testpass123"
+        )
+        category = Category.objects.create(name="Esportes", slug="esportes")
+        cls.bike = Item.objects.create(
+            user=cls.user, title="Bicicleta aro 29", category=category, status="used"
+        )
+        Item.objects.create(
+            user=cls.user, title="Geladeira duplex", category=category, status="used"
+        )
+
+    def test_search_tolerates_typos(self):
+        """Testa que 'bicicleta aro' com erro de digitação ainda encontra o item"""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(reverse('search-items'), {'search': 'bicicelta'})
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [str(self.bike.id)]
+        )
+
+    def test_autocomplete_returns_titles(self):
+        """Testa autocomplete por prefixo e com erro de digitação"""
+        url = reverse('items-autocomplete')
+        self.assertEqual(self.client.get(url, {'q': 'bici'}).data, ["Bicicleta aro 29"])
+        self.assertEqual(self.client.get(url, {'q': 'geladera'}).data, ["Geladeira duplex"])
+        self.assertEqual(self.client.get(url, {'q': 'g'}).data, [])
+
+
+class ItemFacetTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            username="facet_test@example.com",
+            email="facet_test@example.com",
+            password="testpass123"
+        )
+        self.books = Category.objects.create(name="Livros", slug="livros")
+        self.sports = Category.objects.create(name="Esportes", slug="esportes")
+        self.recife = City.objects.create(name="Recife", state="PE")
+        self.natal = City.objects.create(name="Natal", state="RN")
+        Item.objects.create(
+            user=user, title="Romance", category=self.books, city=self.recife,
+            status="used", type="Sell", price="30.00"
+        )
+        Item.objects.create(
+            user=user, title="Enciclopédia", category=self.books, city=self.natal,
+            status="new", type="Sell", price="250.00"
+        )
+        Item.objects.create(
+            user=user, title="Bola", category=self.sports, city=self.recife,
+            status="used", type="Donation"
+        )
+
+    def test_filters_narrow_results(self):
+        """Testa filtros por tipo, categoria, estado e faixa de preço"""
+        url = reverse('get-items')
+        response = self.client.get(url, {'type': 'Sell', 'category': 'livros', 'max_price': '100'})
+        self.assertEqual([i['title'] for i in response.data['results']], ["Romance"])
+
+        response = self.client.get(url, {'state': 'pe', 'condition': 'used'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(url, {'type': 'Rent'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facet_counts(self):
+        """Testa contagens por tipo, categoria, cidade e faixa de preço"""
+        response = self.client.get(reverse('get-items'), {'city': str(self.recife.id)})
+        facets = response.data['facets']
+        self.assertEqual(
+            {f['value']: f['count'] for f in facets['type']}, {'Sell': 1, 'Donation': 1}
+        )
+        self.assertEqual(
+            {f['name']: f['count'] for f in facets['category']}, {'Livros': 1, 'Esportes': 1}
+        )
+        self.assertEqual(facets['city'], [
+            {'id': str(self.recife.id), 'name': 'Recife', 'state': 'PE', 'count': 2}
+        ])
+        self.assertEqual(facets['price'], [{'range': '0-50', 'count': 1}])
+
+    def test_facets_only_on_first_page(self):
+        """Testa que páginas seguintes não recalculam as facetas"""
+        url = reverse('get-items')
+        first = self.client.get(url, {'page_size': 1})
+        self.assertIn('facets', first.data)
+        second = self.client.get(first.data['next'])
+        self.assertNotIn('facets', second.data)
+
+
+class ItemProximityTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="near_test@example.com",
+            email="near_test@example.com",
+            password="testpass123"
+        )
+        category = Category.objects.create(name="Casa", slug="casa")
+        recife = City.objects.create(name="Recife", state="PE", latitude=-8.05389, longitude=-34.88111)
+        olinda = City.objects.create(name="Olinda", state="PE", latitude=-8.00889, longitude=-34.85528)
+        natal = City.objects.create(name="Natal", state="RN", latitude=-5.795, longitude=-35.20944)
+        UserProfile.objects.create(user=self.user, city=recife)
+        self.olinda_item = Item.objects.create(
+            user=self.user, title="Mesa", category=category, city=olinda, status="used"
+        )
+        self.recife_item = Item.objects.create(
+            user=self.user, title="Cadeira", category=category, city=recife, status="used"
+        )
+        Item.objects.create(user=self.user, title="Sofá", category=category, city=natal, status="used")
+
+    def test_near_orders_by_distance(self):
+        """Testa que só itens no raio voltam, do mais próximo ao mais distante"""
+        response = self.client.get(
+            reverse('get-items'), {'near': '-8.0539,-34.8811', 'radius_km': '20'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [item['id'] for item in results],
+            [str(self.recife_item.id), str(self.olinda_item.id)],
+        )
+        self.assertAlmostEqual(results[1]['distance_km'], 5.7, delta=0.5)
+
+    def test_profile_city_is_default_origin(self):
+        """Testa que a cidade do perfil é usada quando near não é informado"""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(reverse('get-items'), {'radius_km': '400'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['results'][0]['id'], str(self.recife_item.id))
+
+    def test_near_on_item_cards(self):
+        """Testa ?near= no feed de cards, que não tem coluna id"""
+        call_command("rebuild_item_cards", stdout=StringIO())
+        response = self.client.get(
+            reverse('item-cards'), {'near': '-8.0539,-34.8811', 'radius_km': '20'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [card['id'] for card in response.data['results']],
+            [str(self.recife_item.id), str(self.olinda_item.id)],
+        )
+
+    def test_search_near_orders_by_distance(self):
+        """Testa ?near= na busca, sem termo e junto com um termo que casa com todos"""
+        self.client.force_authenticate(user=self.user)
+        # O mais novo fica mais longe: -created_at daria outra ordem
+        newest = Item.objects.create(
+            user=self.user, title="Banco", category=self.olinda_item.category,
+            city=self.olinda_item.city, status="used"
+        )
+        near = {'near': '-8.0539,-34.8811', 'radius_km': '20'}
+        expected = [str(self.recife_item.id), str(newest.id), str(self.olinda_item.id)]
+        for params in (near, {**near, 'search': 'casa'}):
+            response = self.client.get(reverse('search-items'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([item['id'] for item in response.data['results']], expected)
+
+    def test_invalid_origin(self):
+        """Testa validação do parâmetro near"""
+        response = self.client.get(reverse('get-items'), {'near': 'recife'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ItemCardReadModelTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="card_test@example.com",
+            email="card_test@example.com",
+            password="testpass123",
+            first_name="Ana"
+        )
+        UserProfile.objects.create(user=self.user)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.category = Category.objects.create(name="Móveis", slug="moveis")
+        self.item = Item.objects.create(
+            user=self.user, title="Estante", category=self.category, status="used",
+            price="120.00"
+        )
+        ItemPhoto.objects.create(item=self.item, image="https://cdn/2.jpg", position=2)
+        ItemPhoto.objects.create(item=self.item, image="https://cdn/1.jpg", position=1)
+        call_command("rebuild_item_cards", stdout=StringIO())
+
+    def test_cards_endpoint_reads_read_model(self):
+        """Testa que o feed de cards traz os campos achatados"""
+        response = self.client.get(reverse('item-cards'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        card = response.data['results'][0]
+        self.assertEqual(card['id'], str(self.item.id))
+        self.assertEqual(card['owner_name'], "Ana")
+        self.assertEqual(card['category_name'], "Móveis")
+        self.assertEqual(card['cover_photo_url'], "https://cdn/1.jpg")
+        self.assertEqual(card['photo_count'], 2)
+
+    def test_update_refreshes_card(self):
+        """Testa que editar o item atualiza o card"""
+        url = reverse('update-item', kwargs={'pk': self.item.id})
+        response = self.client.patch(url, {'title': 'Estante de livros'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ItemCard.objects.get(pk=self.item.pk).title, "Estante de livros")
+
+    def test_photo_delete_refreshes_card(self):
+        """Testa que remover a capa promove a próxima foto no card"""
+        cover = self.item.photos.get(position=1)
+        with patch('api.services.delete_item_photo_service'):
+            response = self.client.delete(reverse('delete-item-photo', kwargs={'photo_id': cover.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        card = ItemCard.objects.get(pk=self.item.pk)
+        self.assertEqual(card.cover_photo_url, "https://cdn/2.jpg")
+        self.assertEqual(card.photo_count, 1)
+
+    def test_category_rename_refreshes_card(self):
+        """Testa que renomear a categoria atualiza o card"""
+        self.category.name = "Casa"
+        self.category.save()
+        self.assertEqual(ItemCard.objects.get(pk=self.item.pk).category_name, "Casa")
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="etag_test@example.com",
+            email="etag_test@example.com",
+            password="testpass123"
+        )
+        self.category = Category.objects.create(name="Games", slug="games")
+        self.item = Item.objects.create(
+            user=self.user, title="Console", category=self.category, status="used"
+        )
+
+    def assertRevalidates(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        again = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again.content, b'')
+        return etag
+
+    def test_item_detail_304_until_updated(self):
+        """Testa 304 no detalhe do item e novo ETag depois da edição"""
+        url = reverse('item-detail', kwargs={'pk': self.item.id})
+        etag = self.assertRevalidates(url)
+        self.assertIn('Last-Modified', self.client.get(url))
+
+        self.item.title = "Console portátil"
+        self.item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_items_list_304_until_new_item(self):
+        """Testa 304 na listagem e invalidação quando um item entra"""
+        url = reverse('get-items')
+        etag = self.assertRevalidates(url)
+        Item.objects.create(user=self.user, title="Controle", category=self.category, status="new")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_related_rows_invalidate_item_etags(self):
+        """Testa novo ETag no detalhe e na listagem ao mudar categoria, nome ou perfil do dono"""
+        detail = reverse('item-detail', kwargs={'pk': self.item.id})
+        listing = reverse('get-items')
+        profile = UserProfile.objects.create(user=self.user, supabase_user_id=uuid.uuid4())
+
+        def rename_category():
+            self.category.name = "Jogos"
+            self.category.save()
+
+        def rename_owner():
+            self.user.first_name = "Ana"
+            self.user.save()
+
+        def change_profile():
+            profile.supabase_user_id = uuid.uuid4()
+            profile.save()
+
+        for change in (rename_category, rename_owner, change_profile):
+            etags = [self.assertRevalidates(url) for url in (detail, listing)]
+            change()
+            for url, etag in zip((detail, listing), etags):
+                with self.subTest(change=change.__name__, url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Login só grava last_login: o item não muda
+        etag = self.assertRevalidates(detail)
+        self.user.save(update_fields=["last_login"])
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_reference_data_cache_policy(self):
+        """Testa ETag e stale-while-revalidate em categorias e cidades"""
+        for name in ('list-categories', 'list-cities'):
+            url = reverse(name)
+            self.assertRevalidates(url)
+            self.assertIn('stale-while-revalidate', self.client.get(url)['Cache-Control'])
+
+
+class ItemListQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="queries_test@example.com",
+            email="queries_test@example.com",
+            password="testpass123"
+        )
+        UserProfile.objects.create(user=self.user, supabase_user_id=uuid.uuid4())
+        self.category = Category.objects.create(name="Jardim", slug="jardim")
+        self.city = City.objects.create(name="Londrina", state="PR")
+
+    def create_items(self, count):
+        for i in range(count):
+            item = Item.objects.create(
+                user=self.user, title=f"Vaso {i}", category=self.category,
+                city=self.city, status="used"
+            )
+            ItemPhoto.objects.create(item=item, image=f"https://cdn/{i}-b.jpg", position=2)
+            ItemPhoto.objects.create(item=item, image=f"https://cdn/{i}-a.jpg", position=1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_listing_uses_constant_queries(self):
+        """Testa que listar 1 ou 10 itens custa o mesmo número de queries"""
+        url = reverse('get-items')
+        self.create_items(1)
+        one, _ = self.count_queries(url)
+        self.create_items(9)
+        ten, response = self.count_queries(url)
+        self.assertEqual(one, ten)
+
+        item = response.data['results'][0]
+        self.assertNotIn('images', item)
+        self.assertEqual(len(item['photos']), 2)
+        self.assertTrue(item['photos'][0].endswith('-a.jpg'))
+        self.assertIsNotNone(item['owner_supabase_user_id'])
+
+    def test_detail_keeps_images(self):
+        """Testa que o detalhe mantém images, com fotos ordenadas por posição"""
+        self.create_items(1)
+        item = Item.objects.get()
+        response = self.client.get(reverse('item-detail', kwargs={'pk': item.id}))
+        self.assertEqual(response.data['images'], response.data['photos'])
+        self.assertTrue(response.data['photos'][0].endswith('-a.jpg'))
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="fields_test@example.com",
+            email="fields_test@example.com",
+            password="testpass123",
+            first_name="Ana"
+        )
+        UserProfile.objects.create(user=self.user, supabase_user_id=uuid.uuid4(), bio="Oi")
+        category = Category.objects.create(name="Livros", slug="livros")
+        city = City.objects.create(name="Recife", state="PE")
+        self.item = Item.objects.create(
+            user=self.user, title="Dom Casmurro", description="Edição antiga",
+            category=category, city=city, status="used", price=30
+        )
+        ItemPhoto.objects.create(item=self.item, image="https://cdn/capa.jpg", position=1)
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, name, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), params)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_trim_output_and_select(self):
+        """Testa que ?fields= reduz a resposta e o SELECT"""
+        response, queries = self.get('get-items', fields='id,title,price,city.name')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertEqual(item, {
+            'id': str(self.item.id), 'title': 'Dom Casmurro', 'price': '30.00',
+            'city': {'name': 'Recife'},
+        })
+        select = next(sql for sql in queries if '"item"."title"' in sql)
+        self.assertNotIn('"item"."description"', select)
+        self.assertNotIn('auth_user', select)
+        self.assertFalse(any('"itemphoto"' in sql for sql in queries))
+
+    def test_omit_and_photos_prefetch(self):
+        """Testa ?omit= mantendo as fotos pré-carregadas"""
+        response, queries = self.get('get-items', omit='description,trade_interest')
+        item = response.data['results'][0]
+        self.assertNotIn('description', item)
+        self.assertEqual(item['photos'], ['https://cdn/capa.jpg'])
+        self.assertEqual(item['user'], 'Ana')
+        self.assertEqual(sum('"itemphoto"' in sql for sql in queries), 1)
+
+    def test_favorites_nested_fields(self):
+        """Testa ?fields= aninhado nos favoritos"""
+        Favorite.objects.create(user=self.user, item=self.item)
+        response, queries = self.get('list-favorites', fields='id,item.title')
+        self.assertEqual(response.data[0]['item'], {'title': 'Dom Casmurro'})
+        self.assertFalse(any('"itemphoto"' in sql for sql in queries))
+
+    def test_user_profile_fields(self):
+        """Testa ?fields= nos endpoints de usuário"""
+        response, _ = self.get('user-update', fields='first_name,profile.bio')
+        self.assertEqual(response.data, {'first_name': 'Ana', 'profile': {'bio': 'Oi'}})
+        response, _ = self.get('user-profile', fields='bio')
+        self.assertEqual(response.data, {'bio': 'Oi'})
+
+    def test_unknown_field(self):
+        """Testa que campos inexistentes retornam 400"""
+        response, _ = self.get('get-items', fields='id,senha')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response, _ = self.get('get-items', fields='title.name')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastReadPathTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="fast_test@example.com",
+            email="fast_test@example.com",
+            password="testpass123",
+            first_name="João"
+        )
+        UserProfile.objects.create(user=self.user, supabase_user_id=uuid.uuid4())
+        other = User.objects.create_user(username="sem_perfil", password="testpass123")
+        category = Category.objects.create(name="Ferramentas", slug="ferramentas")
+        city = City.objects.create(
+            name="São Paulo", state="SP", latitude=-23.5505, longitude=-46.6333
+        )
+        City.objects.create(name="Sem Coordenadas")
+        drill = Item.objects.create(
+            user=self.user, title="Furadeira", description="Linha 1\u2028linha 2",
+            category=category, city=city, status="used", price="149.90"
+        )
+        ItemPhoto.objects.create(item=drill, image="https://cdn/f2.jpg", position=2)
+        ItemPhoto.objects.create(
+            item=drill, image="https://cdn/f1.jpg", position=1,
+            variants={
+                "medium": {"width": 960, "height": 720, "webp": "https://cdn/f1_m.webp",
+                           "jpeg": "https://cdn/f1_m.jpg"},
+                "thumb": {"width": 320, "height": 240, "webp": "https://cdn/f1_t.webp",
+                          "jpeg": "https://cdn/f1_t.jpg"},
+            },
+        )
+        hammer = Item.objects.create(
+            user=other, title="Martelo", category=category, status="new",
+            type="Donation", trade_interest="Serrote"
+        )
+        Favorite.objects.create(user=self.user, item=drill)
+        Favorite.objects.create(user=self.user, item=hammer)
+        self.client.force_authenticate(user=self.user)
+
+    def assertSameResponse(self, name, **params):
+        with self.settings(FAST_READ_PATH=False):
+            expected = self.client.get(reverse(name), params)
+        with self.settings(FAST_READ_PATH=True):
+            response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_items_match_serializer(self):
+        """Testa que o caminho rápido reproduz o ItemListSerializer byte a byte"""
+        response = self.assertSameResponse('get-items')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertSameResponse('get-items', page_size=1)
+        self.assertSameResponse('get-items', near='-23.55,-46.63', radius_km=10)
+        self.assertSameResponse('my-items')
+
+    def test_favorites_and_reference_data_match_serializer(self):
+        """Testa favoritos, categorias e cidades nos dois caminhos"""
+        self.assertSameResponse('list-favorites')
+        self.assertSameResponse('list-categories')
+        self.assertSameResponse('list-cities')
+
+    def test_photos_are_aggregated_in_sql(self):
+        """Testa que as fotos vêm no mesmo SELECT dos itens"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('list-favorites'))
+        self.assertEqual(len(queries), 1)
+
+
+class RequestTimingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="timing@example.com", password="testpass123"
+        )
+        category = Category.objects.create(name="Livros", slug="livros")
+        Item.objects.create(user=self.user, title="Livro", category=category, status="used")
+        self.client.force_authenticate(user=self.user)
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response["Server-Timing"].split(", "):
+            name, *params = metric.split(";")
+            metrics[name] = dict(param.split("=", 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        """Testa o Server-Timing com db, serialize, storage e total"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get-items'))
+        metrics = self.server_timing(response)
+        self.assertEqual(list(metrics), ["db", "serialize", "storage", "total"])
+        self.assertEqual(metrics["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertEqual(float(metrics["storage"]["dur"]), 0)
+        self.assertGreaterEqual(
+            float(metrics["total"]["dur"]),
+            float(metrics["db"]["dur"]) + float(metrics["serialize"]["dur"]),
+        )
+
+    def test_slow_request_is_logged_with_normalized_sql(self):
+        """Testa o log de requisição lenta com a view e o SQL sem valores"""
+        with self.settings(SLOW_REQUEST_MS=0), \
+                self.assertLogs("api.instrumentation", "WARNING") as logs:
+            self.client.get(reverse('get-items'), {"search": "Livro"})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("(get-items)", logs.output[0])
+        self.assertIn('FROM "item"', logs.output[0])
+        self.assertNotIn("%s", logs.output[0])
+
+        with self.settings(SLOW_REQUEST_MS=60_000), \
+                self.assertNoLogs("api.instrumentation", "WARNING"):
+            self.client.get(reverse('get-items'))
+
+    def test_normalize_sql_and_nested_phases(self):
+        """Testa a normalização do SQL e fases aninhadas contadas uma vez"""
+        self.assertEqual(
+            normalize_sql("SELECT *\n  FROM t WHERE id IN (%s, %s, %s) AND n = 'x''y' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND n = ? LIMIT ?",
+        )
+        metrics = RequestMetrics()
+        with metrics.phase("serialize"):
+            with metrics.phase("storage"):
+                time.sleep(0.02)
+        self.assertGreaterEqual(metrics.phases["storage"], 0.02)
+        self.assertLess(metrics.phases["serialize"], 0.02)
+
+
+class SamplingProfilerTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="admin_prof@example.com", password="testpass123", is_staff=True
+        )
+        self.user = User.objects.create_user(
+            username="user_prof@example.com", password="testpass123"
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def get_items(self, user, **headers):
+        token = RefreshToken.for_user(user).access_token
+        with self.settings(PROFILE_DIR=self.directory):
+            return self.client.get(
+                reverse('get-items'), HTTP_AUTHORIZATION=f"Bearer {token}", **headers
+            )
+
+    def read_collapsed(self, name):
+        with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+            return [line.rpartition(" ") for line in f.read().splitlines()]
+
+    @override_settings(PROFILE_TRACEMALLOC=True)
+    def test_admin_header_profiles_request_per_view(self):
+        """Testa o perfil pedido por admin, somado por view em collapsed stacks"""
+        self.addCleanup(tracemalloc.stop)
+        response = self.get_items(self.admin, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Profiled-As"], "ReadItemsView")
+
+        cpu = self.read_collapsed("ReadItemsView.cpu.collapsed")
+        self.assertTrue(any("api/views.py:" in stack for stack, _, _ in cpu))
+        self.assertTrue(all(int(value) > 0 for _, _, value in cpu))
+        self.assertTrue(self.read_collapsed("ReadItemsView.alloc.collapsed"))
+        # Ligado com o processo, não a cada requisição
+        self.assertTrue(tracemalloc.is_tracing())
+
+        # Um segundo perfil soma ao mesmo arquivo em vez de duplicar linhas
+        self.get_items(self.admin, HTTP_X_PROFILE="1")
+        stacks = [stack for stack, _, _ in self.read_collapsed("ReadItemsView.cpu.collapsed")]
+        self.assertEqual(len(stacks), len(set(stacks)))
+
+    def test_header_is_ignored_for_non_admin_and_sampling_off(self):
+        """Testa que o cabeçalho não vale para não-admin e a amostragem é opt-in"""
+        response = self.get_items(self.user, HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profiled-As", response)
+        with self.settings(PROFILE_SAMPLE_RATE=0):
+            self.assertNotIn("X-Profiled-As", self.get_items(self.admin))
+        with self.settings(PROFILE_SAMPLE_RATE=1):
+            self.assertIn("X-Profiled-As", self.get_items(self.user))
+        # Sem PROFILE_TRACEMALLOC, só CPU
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertFalse(
+            os.path.exists(os.path.join(self.directory, "ReadItemsView.alloc.collapsed"))
+        )
+
+
+class MetricsEndpointTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="admin_metrics@example.com", password="testpass123", is_staff=True
+        )
+        self.user = User.objects.create_user(
+            username="user_metrics@example.com", password="testpass123"
+        )
+
+    def get_metrics(self, user=None, remote_addr="203.0.113.9"):
+        self.client.force_authenticate(user=user)
+        return self.client.get("/metrics", REMOTE_ADDR=remote_addr)
+
+    def test_access_is_restricted_to_admins_and_internal_network(self):
+        """Testa o /metrics para admin, rede interna e usuário comum"""
+        self.assertEqual(self.get_metrics(self.user).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get_metrics().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_metrics(self.admin).status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get_metrics(remote_addr="127.0.0.1").status_code, status.HTTP_200_OK
+        )
+
+    def test_request_db_and_outbound_call_metrics(self):
+        """Testa histogramas por view/status, de queries e de chamadas externas"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse('get-items'))
+        with patch("api.services.supabase") as supabase:
+            supabase.auth.admin.create_user.side_effect = RuntimeError("fora do ar")
+            with self.assertRaises(RuntimeError):
+                create_supabase_user("x@example.com", "senha")
+
+        response = self.get_metrics(self.admin)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",status="200",'
+            'view="ReadItemsView"}', body
+        )
+        self.assertIn('db_query_duration_seconds_count{view="ReadItemsView"}', body)
+        self.assertIn('db_queries_per_request_bucket{le="1.0",view="ReadItemsView"}', body)
+        self.assertIn(
+            'outbound_call_duration_seconds_count{call="create_supabase_user",'
+            'outcome="error"}', body
+        )
+
+    def test_metrics_are_summed_across_worker_processes(self):
+        """Testa a soma dos arquivos mmap de vários processos (gunicorn)"""
+        script = (
+            "import django; django.setup()\n"
+            "from api.metrics import OUTBOUND_CALL_DURATION\n"
+            "OUTBOUND_CALL_DURATION.labels('upload_item_photo', 'ok').observe(0.2)\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory,
+                   "DJANGO_SETTINGS_MODULE": "backend.settings"}
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env,
+                    check=True,
+                )
+            with self.settings(PROMETHEUS_MULTIPROC_DIR=directory):
+                body = render_metrics()[0].decode()
+        self.assertIn(
+            'outbound_call_duration_seconds_count{call="upload_item_photo",'
+            'outcome="ok"} 2.0', body
+        )
+
+
+    def test_background_workers_serve_their_own_metrics(self):
+        """Testa o /metrics em HTTP próprio dos workers fora do gunicorn"""
+        with patch("api.management.commands.drain_storage_deletions.start_metrics_server") as start:
+            call_command(
+                "drain_storage_deletions", "--once", "--metrics-port", "9101",
+                stdout=StringIO(),
+            )
+        start.assert_called_once_with(9101)
+
+        server = start_metrics_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with patch("api.services.photo_storage"):
+            head_item_photo("photos/x.png")
+        body = requests.get(f"http://127.0.0.1:{server.server_port}/metrics").text
+        self.assertIn(
+            'outbound_call_duration_seconds_count{call="head_item_photo",outcome="ok"}',
+            body,
+        )
+
+def exif_photo_bytes(size=(2400, 1200), orientation=6):
+    """JPEG de celular: pixels deitados e a tag EXIF que manda girar."""
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new("RGB", size, "blue").save(buffer, "JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@patch("api.photo_uploads.upload_item_photo_variants", return_value={})
+@patch("api.photo_uploads.delete_item_photo_service")
+@patch("api.photo_uploads.upload_item_photo")
+class PhotoUploadWorkerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="fotos@example.com", password="testpass123", first_name="Ana"
+        )
+        self.category = Category.objects.create(name="Esportes", slug="esportes")
+        self.client.force_authenticate(user=self.user)
+
+    def create_item(self, *names):
+        # Uma cor por foto: conteúdos diferentes, keys diferentes
+        photos = [
+            SimpleUploadedFile(name, png_bytes(color), content_type="image/png")
+            for name, color in zip(names, COLORS)
+        ]
+        return self.client.post(reverse('items-create'), {
+            "title": "Skate", "category": str(self.category.id), "status": "used",
+            "photos": photos,
+        })
+
+    def run_worker(self):
+        call_command("process_photo_uploads", "--once", stdout=StringIO())
+
+    def test_item_is_created_before_photos_are_uploaded(self, upload, delete, variants):
+        """Testa que a criação responde com as fotos pending, sem falar com o Storage"""
+        response = self.create_item("a.png", "b.png")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload.assert_not_called()
+        self.assertEqual(response.data["photos"], [])
+        self.assertEqual(
+            [(p["position"], p["state"]) for p in response.data["pending_photos"]],
+            [(1, "pending"), (2, "pending")],
+        )
+        self.assertEqual(PhotoUpload.objects.count(), 2)
+
+        upload.side_effect = lambda file, filename: f"https://cdn/{filename}"
+        self.run_worker()
+        item_id = response.data["id"]
+        self.assertEqual(PhotoUpload.objects.count(), 0)
+        self.assertEqual(upload.call_args_list[0].args[0].read(), PNG_BYTES)
+
+        status_response = self.client.get(
+            reverse('item-photos-status', args=[item_id])
+        )
+        self.assertEqual(
+            [(p["position"], p["state"]) for p in status_response.data],
+            [(1, "ready"), (2, "ready")],
+        )
+        detail = self.client.get(reverse('item-detail', args=[item_id]))
+        self.assertEqual(detail.data["pending_photos"], [])
+        self.assertEqual(
+            detail.data["photos"],
+            [stored_url(png_bytes("red"), "a.png"), stored_url(png_bytes("green"), "b.png")],
+        )
+        card = ItemCard.objects.get(item_id=item_id)
+        self.assertEqual(card.photo_count, 2)
+        self.assertEqual(card.cover_photo_url, detail.data["photos"][0])
+
+    def test_failed_upload_is_retried_with_backoff_then_marked_failed(self, upload, delete, variants):
+        """Testa a retentativa com backoff e o estado failed após o limite"""
+        upload.side_effect = ConnectionError("S3 fora do ar")
+        item_id = self.create_item("a.png").data["id"]
+        self.run_worker()
+
+        pending = PhotoUpload.objects.get()
+        self.assertEqual(pending.attempts, 1)
+        self.assertIn("S3 fora do ar", pending.last_error)
+        self.assertGreater(pending.next_attempt_at, timezone.now())
+        self.assertEqual(pending.photo.state, ItemPhoto.PENDING)
+
+        # Ainda não venceu: o worker não tenta de novo
+        self.run_worker()
+        self.assertEqual(upload.call_count, 1)
+
+        with self.settings(PHOTO_UPLOAD_MAX_ATTEMPTS=2):
+            PhotoUpload.objects.update(next_attempt_at=timezone.now())
+            self.run_worker()
+        failed = PhotoUpload.objects.get()
+        self.assertIsNone(failed.next_attempt_at)
+        self.assertEqual(failed.photo.state, ItemPhoto.FAILED)
+        response = self.client.get(reverse('item-photos-status', args=[item_id]))
+        self.assertEqual(response.data[0]["state"], "failed")
+
+    def test_failed_photos_free_their_slot_and_are_purged(self, upload, delete, variants):
+        """Testa que foto failed não ocupa vaga e é apagada depois do prazo"""
+        upload.side_effect = ConnectionError("S3 fora do ar")
+        with self.settings(PHOTO_UPLOAD_MAX_ATTEMPTS=1):
+            item_id = self.create_item("a.png").data["id"]
+            self.run_worker()
+        failed = ItemPhoto.objects.get(item_id=item_id)
+        self.assertEqual(failed.state, ItemPhoto.FAILED)
+        ItemPhoto.objects.bulk_create(
+            ItemPhoto(item_id=item_id, image=f"https://cdn/{i}.png", position=i)
+            for i in range(2, 7)
+        )
+
+        response = self.client.post(
+            reverse('upload-item-photos', args=[item_id]),
+            {"photos": [SimpleUploadedFile("b.png", png_bytes(COLORS[1]), content_type="image/png")]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # Dentro do prazo a foto failed fica, para o dono ver o estado
+        ItemPhoto.objects.filter(pk=failed.pk).update(
+            created_at=timezone.now() - timedelta(hours=71)
+        )
+        self.assertEqual(purge_failed_photos(), 0)
+        ItemPhoto.objects.filter(pk=failed.pk).update(
+            created_at=timezone.now() - timedelta(hours=73)
+        )
+        upload.side_effect = lambda file, filename: f"https://cdn/{filename}"
+        self.run_worker()
+        self.assertFalse(ItemPhoto.objects.filter(pk=failed.pk).exists())
+        self.assertFalse(PhotoUpload.objects.exists())
+        self.assertEqual(
+            ItemPhoto.objects.filter(item_id=item_id, state=ItemPhoto.READY).count(), 6
+        )
+
+    def test_item_photos_upload_concurrently_and_all_or_nothing(self, upload, delete, variants):
+        """Testa envios simultâneos, posições preservadas e rollback do item"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        urls = [stored_url(png_bytes(color), "x.png") for color in COLORS]
+
+        def flaky_upload(file, filename):
+            barrier.wait()  # só passa com as três fotos subindo ao mesmo tempo
+            if f"https://cdn/{filename}" == urls[1] and not delete.called:
+                raise ConnectionError("timeout")
+            return f"https://cdn/{filename}"
+
+        upload.side_effect = flaky_upload
+        self.create_item("a.png", "b.png", "c.png")
+        self.run_worker()
+
+        # b falhou: a e c foram apagados do Storage e o item inteiro voltou à fila
+        self.assertEqual(
+            sorted(call.args[0] for call in delete.call_args_list),
+            sorted([urls[0], urls[2]]),
+        )
+        self.assertEqual(PhotoUpload.objects.filter(attempts=1).count(), 3)
+        self.assertFalse(ItemPhoto.objects.filter(state=ItemPhoto.READY).exists())
+
+        barrier.reset()
+        PhotoUpload.objects.update(next_attempt_at=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            self.run_worker()
+        self.assertEqual(
+            list(ItemPhoto.objects.order_by("position").values_list("position", "image")),
+            list(zip((1, 2, 3), urls)),
+        )
+        self.assertEqual(
+            sum(q["sql"].startswith('UPDATE "itemphoto"') for q in queries), 1
+        )
+
+    def test_photo_deleted_during_upload_does_not_leave_orphan(self, upload, delete, variants):
+        """Testa que o arquivo é apagado se a foto sumiu durante o envio"""
+        self.create_item("a.png")
+        upload.return_value = "https://cdn/orfao.png"
+
+        def read_then_delete(upload):
+            # O dono apaga a foto depois da leitura, enquanto o arquivo sobe
+            content = read_content(upload)
+            ItemPhoto.objects.all().delete()
+            return content
+
+        with patch("api.photo_uploads.read_content", side_effect=read_then_delete):
+            self.run_worker()
+        delete.assert_called_once_with("https://cdn/orfao.png")
+
+    def test_file_is_staged_in_chunks(self, upload, delete, variants):
+        """Testa o arquivo gravado em pedaços na requisição e remontado no worker"""
+        data = png_bytes(COLORS[0])
+        with self.settings(PHOTO_UPLOAD_CHUNK_BYTES=16):
+            self.create_item("a.png")
+        staged = PhotoUpload.objects.get()
+        self.assertEqual(staged.size, len(data))
+        self.assertEqual(staged.chunks.count(), -(-len(data) // 16))
+
+        received = []
+
+        def read_file(file, filename):
+            received.append(file.read())
+            return f"https://cdn/{filename}"
+
+        upload.side_effect = read_file
+        self.run_worker()
+        self.assertEqual(received, [data])
+        self.assertFalse(PhotoUpload.objects.exists())
+
+    def test_photo_deleted_after_claim_is_not_sent(self, upload, delete, variants):
+        """Testa que a foto apagada antes da leitura nem sobe"""
+        self.create_item("a.png")
+
+        def claim_then_delete(limit):
+            claimed = claim_uploads(limit)
+            ItemPhoto.objects.all().delete()
+            return claimed
+
+        with patch("api.photo_uploads.claim_uploads", side_effect=claim_then_delete):
+            self.run_worker()
+        upload.assert_not_called()
+        delete.assert_not_called()
+
+    def test_identical_photo_reuses_stored_object(self, upload, delete, variants):
+        """Testa a deduplicação por conteúdo e a referência perdida no meio"""
+        upload.side_effect = lambda file, filename: f"https://cdn/{filename}"
+        first = self.create_item("a.png").data["id"]
+        self.run_worker()
+        self.assertEqual(upload.call_count, 1)
+
+        second = self.create_item("outra.png").data["id"]
+        self.run_worker()
+        self.assertEqual(upload.call_count, 1)
+        images = dict(ItemPhoto.objects.values_list("item_id", "image"))
+        self.assertEqual(images[uuid.UUID(second)], images[uuid.UUID(first)])
+
+        # O original some entre a busca e o commit: a foto volta à fila
+        third = self.create_item("a.png").data["id"]
+
+        def copies_then_delete(uploads):
+            copies = shared_copies(uploads)
+            with patch("api.services.delete_item_photo_service"):
+                Item.objects.filter(id__in=[first, second]).delete()
+            return copies
+
+        with patch("api.photo_uploads.shared_copies", side_effect=copies_then_delete):
+            self.run_worker()
+        pending = PhotoUpload.objects.get(photo__item_id=third)
+        self.assertIn("SharedContentGone", pending.last_error)
+        self.assertEqual(pending.photo.state, ItemPhoto.PENDING)
+
+        PhotoUpload.objects.update(next_attempt_at=timezone.now())
+        self.run_worker()
+        self.assertEqual(upload.call_count, 2)
+        self.assertEqual(
+            ItemPhoto.objects.get(item_id=third).state, ItemPhoto.READY
+        )
+
+    def test_worker_uploads_derivatives_and_exposes_srcset(self, upload, delete, variants):
+        """Testa as derivadas enviadas pelo worker e o srcset nas respostas"""
+        data = exif_photo_bytes()
+        photo = SimpleUploadedFile("a.jpg", data, content_type="image/jpeg")
+        item_id = self.client.post(reverse('items-create'), {
+            "title": "Skate", "category": str(self.category.id), "status": "used",
+            "photos": [photo],
+        }).data["id"]
+
+        upload.side_effect = lambda file, filename: f"https://cdn/{filename}"
+        variants.side_effect = upload_item_photo_variants
+        with patch("api.services.upload_item_photo", side_effect=upload.side_effect) \
+                as upload_variant, self.settings(IMAGE_DERIVATIVE_WORKERS=0):
+            self.run_worker()
+
+        # 3 tamanhos × (WebP, JPEG), além do original
+        self.assertEqual(upload_variant.call_count, 6)
+        saved = ItemPhoto.objects.get().variants
+        base = stored_url(data, "a.jpg").removesuffix(".jpg")
+        # EXIF orientation 6: a foto deitada 2400×1200 vira 1200×2400
+        self.assertEqual(
+            {name: (v["width"], v["height"]) for name, v in saved.items()},
+            {"thumb": (160, 320), "medium": (480, 960), "full": (960, 1920)},
+        )
+        expected = {
+            "webp": f"{base}_thumb.webp 160w, {base}_medium.webp 480w, "
+                    f"{base}_full.webp 960w",
+            "jpeg": f"{base}_thumb.jpeg 160w, {base}_medium.jpeg 480w, "
+                    f"{base}_full.jpeg 960w",
+        }
+        detail = self.client.get(reverse('item-detail', args=[item_id]))
+        self.assertEqual(detail.data["photos"], [f"{base}.jpg"])
+        self.assertEqual(detail.data["photos_srcset"], [expected])
+        listing = self.client.get(reverse('get-items')).json()["results"]
+        self.assertEqual(listing[0]["photos_srcset"], [expected])
+        photos = self.client.get(reverse('item-photos-status', args=[item_id]))
+        self.assertEqual(photos.data[0]["srcset"], expected)
+
+    def test_failed_derivative_upload_rolls_back_the_photo(self, upload, delete, variants):
+        """Testa que a falha numa derivada apaga o original e as já enviadas"""
+        self.create_item("a.png")
+        upload.return_value = "https://cdn/a.png"
+        variants.side_effect = upload_item_photo_variants
+        sent = iter(["https://cdn/a_full.webp", ConnectionError("timeout")])
+        with patch("api.services.upload_item_photo", side_effect=sent), \
+                patch("api.services.delete_item_photo_service") as delete_variant, \
+                self.settings(IMAGE_DERIVATIVE_WORKERS=0):
+            self.run_worker()
+
+        delete_variant.assert_called_once_with("https://cdn/a_full.webp")
+        delete.assert_called_once_with("https://cdn/a.png")
+        self.assertEqual(ItemPhoto.objects.get().state, ItemPhoto.PENDING)
+        self.assertIn("timeout", PhotoUpload.objects.get().last_error)
+
+
+class ImageDerivativeTests(TestCase):
+    def test_derivatives_are_rotated_resized_and_encoded(self):
+        """Testa a orientação EXIF, os tamanhos sem ampliar e os formatos"""
+        derivatives = render_derivatives(exif_photo_bytes((600, 300), orientation=8))
+        self.assertEqual(
+            {name: (d["width"], d["height"]) for name, d in derivatives.items()},
+            {"thumb": (160, 320), "medium": (300, 600), "full": (300, 600)},
+        )
+        thumb = derivatives["thumb"]
+        self.assertEqual(thumb["webp"][8:12], b"WEBP")
+        self.assertEqual(thumb["jpeg"][:2], b"\xff\xd8")
+        with Image.open(BytesIO(thumb["jpeg"])) as image:
+            self.assertEqual(image.size, (160, 320))
+
+    def test_transparent_png_gets_white_background(self):
+        """Testa que o alfa vira fundo branco (JPEG não tem transparência)"""
+        buffer = BytesIO()
+        Image.new("RGBA", (10, 10), (0, 0, 0, 0)).save(buffer, "PNG")
+        jpeg = render_derivatives(buffer.getvalue())["thumb"]["jpeg"]
+        with Image.open(BytesIO(jpeg)) as image:
+            self.assertEqual(image.convert("RGB").getpixel((5, 5)), (255, 255, 255))
+
+    def test_derivatives_are_built_in_process_pool(self):
+        """Testa o caminho pelo pool de processos"""
+        with self.settings(IMAGE_DERIVATIVE_WORKERS=1):
+            derivatives = build_derivatives(exif_photo_bytes((800, 400)))
+            pool = images.derivative_pool()
+        self.addCleanup(setattr, images, "_pool", None)
+        self.addCleanup(pool.shutdown)
+        self.assertIsNotNone(pool)
+        self.assertEqual(derivatives["thumb"]["width"], 160)
+
+    def test_srcset_is_empty_without_variants(self):
+        """Testa fotos antigas, sem derivadas"""
+        self.assertEqual(srcset({}), {})
+
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME="giveme-test", AWS_S3_ENDPOINT_URL=None,
+    AWS_S3_CUSTOM_DOMAIN=None, AWS_ACCESS_KEY_ID="teste", AWS_SECRET_ACCESS_KEY="teste",
+    IMAGE_DERIVATIVE_WORKERS=0,
+)
+class DirectUploadTests(APITestCase):
+    """Upload por URL pré-assinada contra um S3 local (moto)."""
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client("s3", region_name=settings.AWS_S3_REGION_NAME)
+        self.s3.create_bucket(
+            Bucket="giveme-test",
+            CreateBucketConfiguration={"LocationConstraint": settings.AWS_S3_REGION_NAME},
+        )
+        self.user = User.objects.create_user(
+            username="direto@example.com", password="testpass123"
+        )
+        category = Category.objects.create(name="Esportes", slug="esportes")
+        self.item = Item.objects.create(
+            user=self.user, title="Skate", category=category, status="used"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def presign(self, *files):
+        return self.client.post(
+            reverse('presign-item-photos', args=[self.item.id]),
+            {"files": list(files)}, format="json",
+        )
+
+    def complete(self, *keys):
+        return self.client.post(
+            reverse('complete-item-photos', args=[self.item.id]),
+            {"keys": list(keys)}, format="json",
+        )
+
+    @patch("api.photo_uploads.upload_item_photo")
+    def test_photo_goes_straight_to_storage(self, upload):
+        """Testa presign, POST direto ao S3, confirmação e derivadas pelo worker"""
+        response = self.presign({"content_type": "image/png", "size": len(PNG_BYTES)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [target] = response.data["uploads"]
+        self.assertRegex(target["key"], rf"^items/{self.item.id}/[0-9a-f]{{32}}\.png$")
+        # O moto não confere a política: ela precisa fixar tipo e tamanho
+        policy = json.loads(base64.b64decode(target["fields"]["policy"]))
+        self.assertIn({"Content-Type": "image/png"}, policy["conditions"])
+        self.assertIn(
+            ["content-length-range", len(PNG_BYTES), len(PNG_BYTES)],
+            policy["conditions"],
+        )
+
+        post = requests.post(
+            target["url"], data=target["fields"], files={"file": PNG_BYTES}
+        )
+        self.assertEqual(post.status_code, 204)
+
+        response = self.complete(target["key"])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["photos"][0]["state"], "pending")
+        self.assertIsNone(PhotoUpload.objects.get().size)
+
+        call_command("process_photo_uploads", "--once", stdout=StringIO())
+        upload.assert_not_called()  # o original não passa pelo servidor
+        photo = ItemPhoto.objects.get()
+        self.assertEqual(photo.state, ItemPhoto.READY)
+        self.assertIn(target["key"], photo.image)
+        stored = {
+            obj["Key"]
+            for obj in self.s3.list_objects_v2(Bucket="giveme-test")["Contents"]
+        }
+        base = target["key"].removesuffix(".png")
+        self.assertEqual(stored, {target["key"]} | {
+            f"{base}_{name}.{extension}"
+            for name in ("thumb", "medium", "full")
+            for extension in ("webp", "jpeg")
+        })
+
+        # Confirmar de novo a mesma key não duplica a foto
+        self.assertEqual(
+            self.complete(target["key"]).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    @override_settings(PHOTO_UPLOAD_MAX_PIXELS=15)
+    @patch("api.photo_uploads.upload_item_photo_variants")
+    def test_direct_photo_over_the_pixel_limit_fails_at_once(self, variants):
+        """Testa o cabeçalho do upload direto no worker: failed, sem derivadas nem nova tentativa"""
+        key = f"items/{self.item.id}/{uuid.uuid4().hex}.png"
+        self.s3.put_object(
+            Bucket="giveme-test", Key=key, Body=PNG_BYTES, ContentType="image/png"
+        )
+        self.assertEqual(self.complete(key).status_code, status.HTTP_202_ACCEPTED)
+
+        call_command("process_photo_uploads", "--once", stdout=StringIO())
+        variants.assert_not_called()
+        self.assertEqual(ItemPhoto.objects.get().state, ItemPhoto.FAILED)
+        upload = PhotoUpload.objects.get()
+        self.assertEqual(upload.attempts, 1)
+        self.assertIsNone(upload.next_attempt_at)
+        self.assertIn("4x4 pixels", upload.last_error)
+
+    def test_complete_checks_the_object_in_storage(self):
+        """Testa o HEAD: objeto ausente, tipo errado, grande demais e key alheia"""
+        key = f"items/{self.item.id}/{uuid.uuid4().hex}.png"
+        response = self.complete(key)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("não foi enviado", response.data["error"])
+
+        # Objetos recusados saem do bucket na hora
+        self.s3.put_object(
+            Bucket="giveme-test", Key=key, Body=b"oi", ContentType="text/html"
+        )
+        self.assertIn("não é uma imagem", self.complete(key).data["error"])
+        self.assertNotIn("Contents", self.s3.list_objects_v2(Bucket="giveme-test"))
+
+        self.s3.put_object(
+            Bucket="giveme-test", Key=key, Body=PNG_BYTES, ContentType="image/png"
+        )
+        with self.settings(PHOTO_UPLOAD_MAX_BYTES=len(PNG_BYTES) - 1):
+            self.assertIn("limite", self.complete(key).data["error"])
+        self.assertNotIn("Contents", self.s3.list_objects_v2(Bucket="giveme-test"))
+
+        other_item = f"items/{uuid.uuid4()}/{uuid.uuid4().hex}.png"
+        for bad_key in (other_item, f"items/{self.item.id}/../x.png"):
+            response = self.complete(bad_key)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ItemPhoto.objects.exists())
+
+    @override_settings(
+        PHOTO_STORAGE_MULTIPART_THRESHOLD=5 * 1024 * 1024,
+        PHOTO_STORAGE_MULTIPART_CHUNK_SIZE=5 * 1024 * 1024,
+    )
+    def test_large_file_goes_up_in_multipart(self):
+        """Testa o envio em partes de tamanho fixo acima do limite do multipart"""
+        data = os.urandom(6 * 1024 * 1024)
+        upload_item_photo(ContentFile(data), "photos/grande.png")
+        head = self.s3.head_object(Bucket="giveme-test", Key="photos/grande.png")
+        self.assertEqual(head["ContentLength"], len(data))
+        # ETag de multipart: "<md5 das partes>-<número de partes>"
+        self.assertTrue(head["ETag"].endswith('-2"'))
+
+    def test_presign_validates_files_and_photo_limit(self):
+        """Testa tipo, tamanho e o limite de 6 fotos por item"""
+        response = self.presign({"content_type": "application/pdf", "size": 10})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.presign({"content_type": "image/jpeg", "size": 11 * 1024 * 1024})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        ItemPhoto.objects.bulk_create(
+            ItemPhoto(item=self.item, image=f"https://cdn/{i}.jpg", position=i)
+            for i in range(1, 6)
+        )
+        response = self.presign(*[{"content_type": "image/jpeg", "size": 10}] * 3)
+        self.assertEqual(len(response.data["uploads"]), 1)
+
+        other = User.objects.create_user(username="outro@example.com", password="x")
+        self.client.force_authenticate(user=other)
+        response = self.presign({"content_type": "image/jpeg", "size": 10})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME="giveme-test", AWS_S3_ENDPOINT_URL=None,
+    AWS_S3_CUSTOM_DOMAIN="cdn.test", AWS_ACCESS_KEY_ID="teste",
+    AWS_SECRET_ACCESS_KEY="teste", PHOTO_STORAGE_BACKEND="s3",
+)
+class S3BucketTestCase(APITestCase):
+    """Bucket num S3 local (moto), com fotos na CDN cdn.test."""
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client("s3", region_name=settings.AWS_S3_REGION_NAME)
+        self.s3.create_bucket(
+            Bucket="giveme-test",
+            CreateBucketConfiguration={"LocationConstraint": settings.AWS_S3_REGION_NAME},
+        )
+        self.user = User.objects.create_user(
+            username="apagar@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Esportes", slug="esportes")
+        self.client.force_authenticate(user=self.user)
+
+    def create_item(self, *names, content_hash=""):
+        """Item com fotos prontas, cada uma com original e uma derivada no S3."""
+        item = Item.objects.create(
+            user=self.user, title="Skate", category=self.category, status="used"
+        )
+        for position, name in enumerate(names, start=1):
+            for key in (f"photos/{name}.png", f"photos/{name}_thumb.webp"):
+                self.s3.put_object(Bucket="giveme-test", Key=key, Body=b"x")
+            ItemPhoto.objects.create(
+                item=item, position=position, content_hash=content_hash,
+                image=f"https://cdn.test/photos/{name}.png",
+                variants={"thumb": {
+                    "width": 320, "height": 320,
+                    "webp": f"https://cdn.test/photos/{name}_thumb.webp",
+                }},
+            )
+        return item
+
+    def stored_keys(self):
+        listing = self.s3.list_objects_v2(Bucket="giveme-test")
+        return sorted(entry["Key"] for entry in listing.get("Contents", []))
+
+
+class StorageDeletionTests(S3BucketTestCase):
+    """Outbox de exclusões e o drenador contra um S3 local (moto)."""
+
+    def drain(self):
+        call_command("drain_storage_deletions", "--once", stdout=StringIO())
+
+    def test_deleting_an_item_only_records_the_keys(self):
+        """Testa que a exclusão do item não fala com o Storage e o drenador apaga depois"""
+        item = self.create_item("a", "b", "c")
+        with patch("api.services.delete_photo_objects") as delete, \
+                patch("api.services.delete_item_photo_service") as delete_one:
+            response = self.client.delete(reverse('delete-item', args=[item.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        delete.assert_not_called()
+        delete_one.assert_not_called()
+        self.assertEqual(len(self.stored_keys()), 6)
+        self.assertEqual(
+            sorted(StorageDeletion.objects.values_list("url", flat=True)),
+            [f"https://cdn.test/{key}" for key in self.stored_keys()],
+        )
+
+        self.drain()
+        self.assertEqual(self.stored_keys(), [])
+        self.assertFalse(StorageDeletion.objects.exists())
+
+    def test_drainer_batches_keys_and_keeps_shared_content(self):
+        """Testa um DeleteObjects por lote e o conteúdo que outra foto ainda usa"""
+        first = self.create_item("a", "b")
+        shared = self.create_item("c", content_hash="f" * 64)
+        copy = self.create_item("c", content_hash="f" * 64)
+        first.delete()
+        shared.delete()
+
+        with patch(
+            "api.storage.PooledS3Storage.delete_many", autospec=True,
+            side_effect=PooledS3Storage.delete_many,
+        ) as delete_many:
+            self.assertEqual(drain_deletions(limit=3), {"deleted": 3})
+            results = drain_deletions()
+        self.assertEqual(results, {"deleted": 1, "kept": 2})
+        self.assertEqual(delete_many.call_count, 2)
+        self.assertEqual(
+            self.stored_keys(), ["photos/c.png", "photos/c_thumb.webp"]
+        )
+
+        copy.delete()
+        self.drain()
+        self.assertEqual(self.stored_keys(), [])
+
+    def test_content_locks_are_held_during_delete_objects(self):
+        """Testa que o DeleteObjects roda na transação que prendeu os locks de conteúdo"""
+        self.create_item("c", content_hash="f" * 64).delete()
+        locked_in = []
+        original_delete_many = PooledS3Storage.delete_many
+
+        def lock(content_hashes):
+            # Nos testes, o savepoint do atomic faz as vezes da transação
+            locked_in.append(connection.savepoint_ids[-1])
+            lock_photo_contents(content_hashes)
+
+        def delete_many(storage, names):
+            self.assertIn(locked_in[-1], connection.savepoint_ids)
+            return original_delete_many(storage, names)
+
+        with patch("api.storage_deletions.lock_photo_contents", side_effect=lock), \
+                patch("api.storage.PooledS3Storage.delete_many", autospec=True,
+                      side_effect=delete_many) as deleted:
+            self.assertEqual(drain_deletions(), {"deleted": 2})
+            self.assertEqual(delete_orphans([f"photos/ff/{'f' * 64}.png"]), (1, 0, {}))
+        self.assertEqual(deleted.call_count, 2)
+        self.assertEqual(len(locked_in), 2)
+
+    def test_failed_keys_are_retried_with_backoff(self):
+        """Testa a falha de uma key: as outras saem, ela volta à fila e desiste no limite"""
+        item = self.create_item("a")
+        item.delete()
+        failure = {"photos/a.png": "AccessDenied: negado"}
+        with patch("api.storage.PooledS3Storage.delete_many", return_value=failure):
+            self.assertEqual(drain_deletions(), {"deleted": 1, "retry": 1})
+        pending = StorageDeletion.objects.get()
+        self.assertEqual(pending.attempts, 1)
+        self.assertIn("AccessDenied", pending.last_error)
+        self.assertGreater(pending.next_attempt_at, timezone.now())
+        self.assertEqual(drain_deletions(), {})
+
+        StorageDeletion.objects.update(next_attempt_at=timezone.now())
+        with patch(
+            "api.storage.PooledS3Storage.delete_many", side_effect=ConnectionError("timeout")
+        ), self.settings(STORAGE_DELETION_MAX_ATTEMPTS=2):
+            self.assertEqual(drain_deletions(), {"failed": 1})
+        self.assertIsNone(StorageDeletion.objects.get().next_attempt_at)
+
+
+class OrphanPhotoTests(S3BucketTestCase):
+    """Coleta de lixo do bucket (collect_orphan_photos) contra o moto."""
+
+    def put(self, *keys):
+        for key in keys:
+            self.s3.put_object(Bucket="giveme-test", Key=key, Body=b"x")
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command("collect_orphan_photos", *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_old_unreferenced_objects_are_deleted(self):
+        """Testa a listagem em páginas, a carência, o dry-run e as keys na fila"""
+        item = self.create_item("a")
+        queued = ItemPhoto.objects.create(item=item, position=2, content_hash="c" * 64)
+        PhotoUpload.objects.create(photo=queued, filename=f"photos/cc/{'c' * 64}.png")
+        orphans = [f"photos/bb/{'b' * 64}.png", "items/abandonado.png"]
+        self.put(f"photos/cc/{'c' * 64}.png", *orphans)
+
+        output = self.collect("--page-size", "2")
+        self.assertIn("5 objeto(s) listado(s)", output)
+        self.assertIn("5 dentro da carência", output)
+        self.assertIn("0 órfão(s)", output)
+
+        output = self.collect("--dry-run", "--grace-hours", "0", "--page-size", "2", "-v", "2")
+        self.assertIn("em 3 página(s)", output)
+        self.assertIn("2 órfão(s)", output)
+        for key in orphans:
+            self.assertIn(key, output)
+        self.assertEqual(len(self.stored_keys()), 5)
+
+        with patch(
+            "api.storage.PooledS3Storage.delete_many", autospec=True,
+            side_effect=PooledS3Storage.delete_many,
+        ) as delete_many:
+            output = self.collect("--grace-hours", "0")
+        self.assertIn("2 apagado(s)", output)
+        self.assertEqual(delete_many.call_count, 1)
+        self.assertEqual(self.stored_keys(), [
+            "photos/a.png", "photos/a_thumb.webp", f"photos/cc/{'c' * 64}.png",
+        ])
+
+    def test_content_used_again_since_the_listing_is_kept(self):
+        """Testa que original e derivadas de um conteúdo que voltou a ter foto ficam"""
+        item = self.create_item("a")
+        key = f"photos/dd/{'d' * 64}.png"
+        thumb = f"photos/dd/{'d' * 64}_thumb.webp"
+        self.put(key, thumb, "items/abandonado.png")
+        ItemPhoto.objects.create(item=item, position=2, content_hash="d" * 64)
+        self.assertEqual(
+            delete_orphans([key, thumb, "items/abandonado.png"]), (1, 2, {})
+        )
+        self.assertIn(key, self.stored_keys())
+        self.assertIn(thumb, self.stored_keys())
+        self.assertNotIn("items/abandonado.png", self.stored_keys())
+
+    @override_settings(PHOTO_STORAGE_BACKEND="memory")
+    def test_files_are_listed_by_prefix_outside_s3(self):
+        """Testa list_files nos backends sem ListObjects: diretórios lidos um a um"""
+        storage = photo_storage()
+        for name in ("photos/aa/1.png", "photos/ab/2.png", "photos/ab/3.png", "items/4.png"):
+            storage.save(name, ContentFile(b"xy"))
+        pages = list(list_files(storage, "photos/", page_size=2))
+        self.assertEqual(
+            [[name for name, _, _ in page] for page in pages],
+            [["photos/aa/1.png", "photos/ab/2.png"], ["photos/ab/3.png"]],
+        )
+        self.assertEqual(pages[0][0][2], 2)
+        self.assertEqual(
+            [name for page in list_files(storage, "photos/ab/3") for name, _, _ in page],
+            ["photos/ab/3.png"],
+        )
+
+class PhotoStorageTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="storage@example.com", password="testpass123", is_staff=True
+        )
+        self.category = Category.objects.create(name="Esportes", slug="esportes")
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(PHOTO_STORAGE_BACKEND="s3", AWS_STORAGE_BUCKET_NAME="giveme")
+    def test_s3_client_is_shared_and_tuned(self):
+        """Testa um cliente por processo, com pool, keep-alive, retries e timeouts"""
+        storage = photo_storage()
+        self.assertIs(photo_storage(), storage)
+        connections = []
+        thread = threading.Thread(
+            target=lambda: connections.append((storage.connection, storage.bucket))
+        )
+        thread.start()
+        thread.join()
+        # Recurso e Bucket por thread, sobre o mesmo cliente
+        resource, bucket = connections[0]
+        self.assertIsNot(resource, storage.connection)
+        self.assertIsNot(bucket, storage.bucket)
+        self.assertIs(resource.meta.client, storage.connection.meta.client)
+        self.assertIs(bucket.meta.client, storage.connection.meta.client)
+
+        config = storage.connection.meta.client.meta.config
+        self.assertEqual(config.max_pool_connections, settings.PHOTO_STORAGE_MAX_CONNECTIONS)
+        self.assertEqual(config.connect_timeout, settings.PHOTO_STORAGE_CONNECT_TIMEOUT)
+        self.assertEqual(config.read_timeout, settings.PHOTO_STORAGE_READ_TIMEOUT)
+        self.assertEqual(config.retries["mode"], "standard")
+        self.assertTrue(config.tcp_keepalive)
+        self.assertEqual(config.s3["addressing_style"], "path")
+        transfer = storage.transfer_config
+        self.assertEqual(
+            transfer.multipart_threshold, settings.PHOTO_STORAGE_MULTIPART_THRESHOLD
+        )
+        self.assertEqual(
+            transfer.multipart_chunksize, settings.PHOTO_STORAGE_MULTIPART_CHUNK_SIZE
+        )
+
+    def post_item(self, data):
+        return self.client.post(reverse('items-create'), {
+            "title": "Skate", "category": str(self.category.id), "status": "used",
+            "photos": [SimpleUploadedFile("a.png", data, content_type="image/png")],
+        })
+
+    def create_item_with_photo(self, data):
+        return self.post_item(data).data["id"]
+
+    def test_local_backend_runs_the_photo_path_offline(self):
+        """Testa upload, derivadas, deduplicação e exclusão no disco, sem rede"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        digest = hashlib.sha256(PNG_BYTES).hexdigest()
+        directory = os.path.join(media_root, "photos", digest[:2])
+        with self.settings(
+            PHOTO_STORAGE_BACKEND="local", MEDIA_ROOT=media_root, MEDIA_URL="/media/",
+            IMAGE_DERIVATIVE_WORKERS=0,
+        ):
+            first = self.create_item_with_photo(PNG_BYTES)
+            call_command("process_photo_uploads", "--once", stdout=StringIO())
+            photo = ItemPhoto.objects.get(item_id=first)
+            self.assertEqual(photo.state, ItemPhoto.READY)
+            self.assertEqual(photo.image, f"/media/photos/{digest[:2]}/{digest}.png")
+            self.assertEqual(photo.content_hash, digest)
+            files = sorted(os.listdir(directory))
+            self.assertEqual(len(files), 7)  # original + 3 tamanhos × 2 formatos
+
+            # A mesma foto em outro anúncio não sobe de novo
+            second = self.create_item_with_photo(PNG_BYTES)
+            with patch("api.photo_uploads.upload_item_photo") as upload:
+                call_command("process_photo_uploads", "--once", stdout=StringIO())
+            upload.assert_not_called()
+            copy = ItemPhoto.objects.get(item_id=second)
+            self.assertEqual(copy.state, ItemPhoto.READY)
+            self.assertEqual((copy.image, copy.variants), (photo.image, photo.variants))
+
+            # Os arquivos só saem com a última referência, pelo drenador
+            self.client.delete(reverse('delete-item-photo', args=[photo.id]))
+            call_command("drain_storage_deletions", "--once", stdout=StringIO())
+            self.assertEqual(sorted(os.listdir(directory)), files)
+            response = self.client.delete(reverse('delete-item', args=[second]))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertEqual(sorted(os.listdir(directory)), files)
+            call_command("drain_storage_deletions", "--once", stdout=StringIO())
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_upload_handler_hashes_while_receiving(self):
+        """Testa o SHA-256 calculado pelos upload handlers, em memória e em disco"""
+        data = exif_photo_bytes((64, 64))
+        for max_memory in (10 * 1024 * 1024, 10):
+            with self.subTest(max_memory=max_memory), \
+                    self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=max_memory):
+                item_id = self.create_item_with_photo(data)
+                photo = ItemPhoto.objects.get(item_id=item_id)
+                self.assertEqual(photo.content_hash, hashlib.sha256(data).hexdigest())
+                self.assertEqual(read_content(photo.upload), data)
+
+    def test_photos_are_checked_by_header_only(self):
+        """Testa a validação pelo cabeçalho: sem decodificar, formato e pixels"""
+        with patch("PIL.Image.Image.load") as load:
+            response = self.post_item(PNG_BYTES)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        load.assert_not_called()
+
+        gif = BytesIO()
+        Image.new("RGB", (4, 4)).save(gif, "GIF")
+        for data in (b"nao sou uma imagem", gif.getvalue(), PNG_BYTES[:20]):
+            response = self.post_item(data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("photos", response.data)
+        with self.settings(PHOTO_UPLOAD_MAX_PIXELS=15):
+            response = self.post_item(PNG_BYTES)
+        self.assertIn("4x4", str(response.data["photos"]))
+        self.assertEqual(Item.objects.count(), 1)
+
+    def test_upload_limits_reject_the_request_while_streaming(self):
+        """Testa o 413 pelos limites por arquivo e por requisição"""
+        with self.settings(PHOTO_UPLOAD_MAX_BYTES=len(PNG_BYTES) - 1):
+            response = self.post_item(PNG_BYTES)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn("a.png", response.data["detail"])
+
+        with self.settings(PHOTO_UPLOAD_MAX_REQUEST_BYTES=len(PNG_BYTES)):
+            response = self.post_item(PNG_BYTES)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn("por requisição", response.data["detail"])
+        self.assertFalse(Item.objects.exists())
+
+    @override_settings(PHOTO_STORAGE_BACKEND="memory")
+    def test_memory_backend_has_no_presign_and_is_healthy(self):
+        """Testa o backend em memória: sem URL pré-assinada, sonda ok"""
+        item = Item.objects.create(
+            user=self.user, title="Skate", category=self.category, status="used"
+        )
+        response = self.client.post(
+            reverse('presign-item-photos', args=[item.id]),
+            {"files": [{"content_type": "image/png", "size": 10}]}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+        response = self.client.get(reverse('storage-health'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["backend"], "memory")
+        self.assertTrue(response.data["ok"])
+
+    @override_settings(
+        PHOTO_STORAGE_BACKEND="s3", AWS_STORAGE_BUCKET_NAME="sem-bucket",
+        AWS_S3_ENDPOINT_URL=None, AWS_ACCESS_KEY_ID="teste",
+        AWS_SECRET_ACCESS_KEY="teste",
+    )
+    def test_health_probe_reports_missing_bucket(self):
+        """Testa a sonda do S3 com o bucket inexistente"""
+        with mock_aws():
+            response = self.client.get(reverse('storage-health'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(response.data["ok"])
+        self.assertIn("404", response.data["error"])
+
+
 class PermissionTests(APITestCase):
     def test_unauthenticated_access(self):
         """Testa acesso sem autenticação a endpoints protegidos"""
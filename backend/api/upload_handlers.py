@@ -0,0 +1,92 @@
+"""
+Upload handlers que trabalham enquanto os chunks chegam, sem reler o
+arquivo depois. UploadLimitHandler, o primeiro da lista, recusa a
+requisição assim que ela passa dos limites de tamanho. Os outros calculam o
+SHA-256 de cada arquivo: o digest fica em file.sha256 e vira a key do objeto
+no Storage (api.photo_uploads.content_key).
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Arquivos grandes demais para uma requisição."
+    default_code = "upload_too_large"
+
+
+class UploadLimitHandler(FileUploadHandler):
+    """
+    Teto de bytes por arquivo (PHOTO_UPLOAD_MAX_BYTES) e por requisição
+    (PHOTO_UPLOAD_MAX_REQUEST_BYTES). Pelo Content-Length a requisição é
+    recusada antes de ler o corpo; sem ele, no chunk que passar do limite.
+    Não guarda nada: repassa cada chunk aos handlers seguintes.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_bytes = 0
+        if content_length > settings.PHOTO_UPLOAD_MAX_REQUEST_BYTES:
+            raise self.too_large()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file_bytes = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_bytes += len(raw_data)
+        self.request_bytes += len(raw_data)
+        if self.file_bytes > settings.PHOTO_UPLOAD_MAX_BYTES:
+            max_mb = settings.PHOTO_UPLOAD_MAX_BYTES // (1024 * 1024)
+            raise UploadTooLarge(
+                f"O arquivo {self.file_name} passa do limite de {max_mb} MB."
+            )
+        if self.request_bytes > settings.PHOTO_UPLOAD_MAX_REQUEST_BYTES:
+            raise self.too_large()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+    def too_large(self):
+        max_mb = settings.PHOTO_UPLOAD_MAX_REQUEST_BYTES // (1024 * 1024)
+        return UploadTooLarge(
+            f"Os arquivos passam do limite de {max_mb} MB por requisição. "
+            "Envie as fotos em mais de uma requisição."
+        )
+
+
+class HashingUploadMixin:
+    def new_file(self, *args, **kwargs):
+        # Antes do super(): o handler de memória interrompe os seguintes
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        chunk = super().receive_data_chunk(raw_data, start)
+        if chunk is None:
+            # Este handler ficou com o chunk; os demais não o veem
+            self.hasher.update(raw_data)
+        return chunk
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.hasher.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
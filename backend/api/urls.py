@@ -7,7 +7,11 @@ from .views import (
     UserProfileUpdateView,
     UserProfileView,
     SearchItemView,
+    autocomplete_items,
+    complete_item_photos,
     delete_item_photo,
+    item_photos_status,
+    presign_item_photos,
     upload_item_photos,
     ListFavoritesView,
     AddFavoriteView,
@@ -23,11 +27,28 @@ urlpatterns = [
     path("users/profile/update/", UserProfileUpdateView.as_view(), name="user-update"),
     path("items/", views.ReadItemsView.as_view(), name="get-items"),
     path("items/my-items/", MyItemsView.as_view(), name="my-items"),
+    path("items/cards/", views.ItemCardsView.as_view(), name="item-cards"),
+    path("items/autocomplete/", autocomplete_items, name="items-autocomplete"),
     path("items/create/", views.CreateItemView.as_view(), name="items-create"),
     path("items/<uuid:pk>/", views.ReadItemView.as_view(), name="item-detail"),
     path("items/update/<uuid:pk>/", views.UpdateItemView.as_view(), name="update-item"),
     path("items/delete/<uuid:pk>/", views.DeleteItemView.as_view(), name="delete-item"),
     path("items/<uuid:item_id>/photos/", upload_item_photos, name="upload-item-photos"),
+    path(
+        "items/<uuid:item_id>/photos/presign/",
+        presign_item_photos,
+        name="presign-item-photos",
+    ),
+    path(
+        "items/<uuid:item_id>/photos/complete/",
+        complete_item_photos,
+        name="complete-item-photos",
+    ),
+    path(
+        "items/<uuid:item_id>/photos/status/",
+        item_photos_status,
+        name="item-photos-status",
+    ),
     path("items/photos/<uuid:photo_id>/", delete_item_photo, name="delete-item-photo"),
     path("categories/", ListCategoriesView.as_view(), name="list-categories"),
     path("categories/create/", CreateCategoryView.as_view(), name="create-category"),
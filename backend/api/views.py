@@ -1,24 +1,83 @@
+import logging
 import traceback
 
-from api.permissions import IsAdmin, IsAdminOrOwner, IsOwner
+from api.permissions import IsAdmin, IsAdminOrOwner, IsInternalNetwork, IsOwner
+from django.conf import settings
 from django.contrib.auth.models import User
-from rest_framework import filters, generics, status
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Category, City, Favorite, Item, ItemPhoto, UserProfile
+from .caching import (
+    CACHE_PRIVATE,
+    ConditionalGetMixin,
+    QuerysetValidatorsMixin,
+    TableHashValidatorsMixin,
+    make_etag,
+)
+from .fast_read import (
+    FastItemReadMixin,
+    FastReadMixin,
+    format_datetime,
+    item_representation,
+    item_values,
+)
+from .fieldsets import SparseFieldsetMixin
+from .filters import (
+    ItemFacetFilter,
+    ItemFullTextSearchFilter,
+    ItemProximityFilter,
+    item_facets,
+)
+from .metrics import render_metrics
+from .models import Category, City, Favorite, Item, ItemCard, ItemPhoto, UserProfile
+from .pagination import ItemCursorPagination
+from .photo_uploads import (
+    DIRECT_UPLOAD_TYPES,
+    direct_upload_key,
+    enqueue_direct_photos,
+    enqueue_photos,
+    is_direct_upload_key,
+)
+from .read_models import refresh_item_cards, touch_item
 from .serializers import (
     CategorySerializer,
     CitySerializer,
     FavoriteSerializer,
+    ItemCardSerializer,
+    ItemListSerializer,
     ItemPhotoSerializer,
     ItemSerializer,
     UserCreateSerializer,
     UserProfileSerializer,
     UserSerializer,
+    item_photos_prefetch,
+    validate_photo_files,
 )
-from .services import upload_item_photo
+from .services import (
+    delete_photo_keys,
+    direct_uploads_available,
+    head_item_photo,
+    presign_item_photo_upload,
+)
+from .storage import storage_health
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_DEFAULT_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+MAX_ITEM_PHOTOS = 6
+
+
+def used_photo_slots(item):
+    # Fotos failed não ocupam vaga: o dono pode enviar de novo
+    return item.photos.exclude(state=ItemPhoto.FAILED).count()
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -30,8 +89,8 @@ class CreateUserView(generics.CreateAPIView):
     permission_classes = [AllowAny]
 
 
-class ListUsersView(generics.ListAPIView):
-    queryset = User.objects.all().order_by("username")
+class ListUsersView(SparseFieldsetMixin, generics.ListAPIView):
+    queryset = User.objects.select_related("userprofile").order_by("username")
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
     pagination_class = None
@@ -55,7 +114,7 @@ class CreateItemView(generics.CreateAPIView):
         return Item.objects.filter(user=user)
 
     def perform_create(self, serializer):
-        photos = self.request.FILES.getlist("photos")
+        photos = validate_photo_files(self.request.FILES.getlist("photos"))
         try:
             serializer.save(user=self.request.user, uploaded_photos=photos)
         except Exception as e:
@@ -85,57 +144,122 @@ class UpdateItemView(generics.UpdateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Item.objects.filter(user=user)
+        return (
+            Item.objects.filter(user=user)
+            .select_related("user__userprofile", "city", "category")
+            .prefetch_related(item_photos_prefetch())
+        )
+
+    def perform_update(self, serializer):
+        item = serializer.save()
+        refresh_item_cards([item.pk])
 
 
-class ReadItemView(generics.RetrieveAPIView):
+class ReadItemView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveAPIView):
     name = "Read Item"
     http_method_names = ["get"]
     description = "Endpoint for reading an item."
     serializer_class = ItemSerializer
     permission_classes = [AllowAny]
 
+    def get_conditional_validators(self, request, *args, **kwargs):
+        updated_at = (
+            Item.objects.filter(pk=kwargs["pk"])
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None, None
+        return make_etag(kwargs["pk"], updated_at.isoformat()), updated_at
+
     def get_queryset(self):
         return Item.objects.select_related(
             "user", "user__userprofile", "city", "category"
-        ).prefetch_related("photos")
+        ).prefetch_related(item_photos_prefetch())
 
 
-class ReadItemsView(generics.ListAPIView):
+class ReadItemsView(
+    QuerysetValidatorsMixin,
+    SparseFieldsetMixin,
+    FastItemReadMixin,
+    generics.ListAPIView,
+):
     name = "Read Items"
     http_method_names = ["get"]
     description = "Endpoint for reading all items."
-    serializer_class = ItemSerializer
+    serializer_class = ItemListSerializer
     permission_classes = [AllowAny]
-    pagination_class = None
+    pagination_class = ItemCursorPagination
+    fieldset_required_fields = ("created_at",)
+    filter_backends = [ItemFacetFilter, ItemProximityFilter]
+    # ?radius_km= sem near usa a cidade do perfil de quem pede
+    vary_on_authorization = True
 
     def get_queryset(self):
         return (
-            Item.objects.select_related("user", "city", "category")  # Evita N+1 queries
-            .prefetch_related("photos")  # Carrega fotos de uma vez
+            Item.objects.select_related(
+                "user", "user__userprofile", "city", "category"
+            )  # Evita N+1 queries
+            .prefetch_related(item_photos_prefetch())  # Carrega fotos de uma vez
             .order_by("-created_at")
         )
 
+    def includes_facets(self, request):
+        # Facetas só na primeira página: as seguintes reaproveitam as do cliente
+        return self.paginator.cursor_query_param not in request.query_params
+
+    def get_extra_validator_parts(self, request, queryset):
+        if self.includes_facets(request):
+            return self.aggregate_validator_parts(queryset)
+        return ()
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self.includes_facets(request):
+            response.data["facets"] = item_facets(
+                self.filter_queryset(self.get_queryset())
+            )
+        return response
+
 
-class MyItemsView(generics.ListAPIView):
+class ItemCardsView(generics.ListAPIView):
+    name = "Item Cards"
+    http_method_names = ["get"]
+    description = "Endpoint for reading the item feed from the item_card read model."
+    serializer_class = ItemCardSerializer
+    permission_classes = [AllowAny]
+    pagination_class = ItemCursorPagination
+    filter_backends = [ItemFacetFilter, ItemProximityFilter]
+    queryset = ItemCard.objects.all()
+
+
+class MyItemsView(
+    QuerysetValidatorsMixin,
+    SparseFieldsetMixin,
+    FastItemReadMixin,
+    generics.ListAPIView,
+):
     name = "My Items"
     http_method_names = ["get"]
     description = "Endpoint for reading items of authenticated user."
-    serializer_class = ItemSerializer
+    serializer_class = ItemListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = None
+    pagination_class = ItemCursorPagination
+    fieldset_required_fields = ("created_at",)
+    cache_control = CACHE_PRIVATE
+    vary_on_authorization = True
 
     def get_queryset(self):
         user = self.request.user
         return (
             Item.objects.filter(user=user)
-            .select_related("city", "category")
-            .prefetch_related("photos")
+            .select_related("user", "user__userprofile", "city", "category")
+            .prefetch_related(item_photos_prefetch())
             .order_by("-created_at")
         )
 
 
-class UserProfileView(generics.RetrieveAPIView):
+class UserProfileView(SparseFieldsetMixin, generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
@@ -147,11 +271,11 @@ class UserProfileView(generics.RetrieveAPIView):
                 {"error": "Perfil não encontrado."}, status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = UserProfileSerializer(profile)
+        serializer = UserProfileSerializer(profile, **self.get_fieldset_kwargs())
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
+class UserProfileUpdateView(SparseFieldsetMixin, generics.RetrieveUpdateAPIView):
     name = "User and Profile Update"
     http_method_names = ["get", "put", "patch"]
     serializer_class = UserSerializer
@@ -161,10 +285,17 @@ class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class ListCategoriesView(generics.ListAPIView):
+class ListCategoriesView(TableHashValidatorsMixin, FastReadMixin, generics.ListAPIView):
     queryset = Category.objects.all().order_by("name")
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    validator_fields = ("id", "name", "slug")
+
+    def get_fast_rows(self, queryset):
+        return queryset.values(*self.validator_fields)
+
+    def to_fast_representation(self, row):
+        return {**row, "id": str(row["id"])}
 
 
 class CreateCategoryView(generics.CreateAPIView):
@@ -181,18 +312,56 @@ class CreateCategoryView(generics.CreateAPIView):
         serializer.save()
 
 
-class ListCitiesView(generics.ListAPIView):
+class ListCitiesView(TableHashValidatorsMixin, FastReadMixin, generics.ListAPIView):
     queryset = City.objects.all().order_by("name")
     serializer_class = CitySerializer
     permission_classes = [AllowAny]
+    validator_fields = ("id", "name", "state", "latitude", "longitude")
 
+    def get_fast_rows(self, queryset):
+        return queryset.values(*self.validator_fields)
+
+    def to_fast_representation(self, row):
+        return {**row, "id": str(row["id"])}
+
+
+class SearchItemView(SparseFieldsetMixin, generics.ListAPIView):
+    serializer_class = ItemListSerializer
+    filter_backends = [ItemFullTextSearchFilter, ItemFacetFilter, ItemProximityFilter]
+    pagination_class = ItemCursorPagination
+    fieldset_required_fields = ("created_at",)
+
+    def get_queryset(self):
+        return Item.objects.select_related(
+            "user", "user__userprofile", "city", "category"
+        ).prefetch_related(item_photos_prefetch())
 
-class SearchItemView(generics.ListAPIView):
-    serializer_class = ItemSerializer
-    queryset = Item.objects.all().order_by("-created_at")
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["title"]
-    pagination_class = None
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def autocomplete_items(request):
+    """
+    Sugestões de títulos para a caixa de busca. Lê só a coluna title,
+    servida pelo índice de trigramas, sem passar pelo ItemSerializer.
+    """
+    term = request.query_params.get("q", "").strip()
+    if len(term) < AUTOCOMPLETE_MIN_LENGTH:
+        return Response([])
+
+    try:
+        limit = int(request.query_params.get("limit", AUTOCOMPLETE_DEFAULT_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_DEFAULT_LIMIT
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+
+    titles = (
+        Item.objects.filter(listing_state="active", title__trigram_word_similar=term)
+        .annotate(similarity=TrigramWordSimilarity(term, "title"))
+        .order_by("-similarity", "title")
+        .values_list("title", flat=True)
+        .distinct()[:limit]
+    )
+    return Response(list(titles))
 
 
 @api_view(["POST"])
@@ -213,44 +382,211 @@ def upload_item_photos(request, item_id):
             {"error": "Nenhuma foto foi enviada."}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    current_count = item.photos.count()
-    max_photos = 6
+    current_count = used_photo_slots(item)
 
-    if current_count >= max_photos:
+    if current_count >= MAX_ITEM_PHOTOS:
         return Response(
-            {"error": f"Este item já tem o máximo de {max_photos} fotos."},
+            {"error": f"Este item já tem o máximo de {MAX_ITEM_PHOTOS} fotos."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    available_slots = max_photos - current_count
-    photos_to_upload = photos[:available_slots]
+    available_slots = MAX_ITEM_PHOTOS - current_count
+    photos_to_upload = validate_photo_files(photos[:available_slots])
 
-    created_photos = []
-    for index, photo in enumerate(photos_to_upload, start=current_count + 1):
-        filename = f"items/{item.id}_{photo.name}"
-        image_url = upload_item_photo(photo, filename)
-        item_photo = ItemPhoto.objects.create(
-            item=item, image=image_url, position=index
+    # O worker envia ao Storage; acompanhe em items/<id>/photos/status/
+    with transaction.atomic():
+        created_photos = enqueue_photos(
+            item, photos_to_upload, start_position=current_count + 1
         )
-        created_photos.append(item_photo)
 
     serializer = ItemPhotoSerializer(created_photos, many=True)
 
     return Response(
         {
-            "message": f"{len(created_photos)} foto(s) adicionada(s) com sucesso.",
+            "message": f"{len(created_photos)} foto(s) em processamento.",
             "photos": serializer.data,
         },
-        status=status.HTTP_201_CREATED,
+        status=status.HTTP_202_ACCEPTED,
     )
 
 
+def direct_upload_error(file):
+    """Mensagem de erro de um arquivo do presign, ou None se ele é aceito."""
+    if not isinstance(file, dict):
+        return "Cada arquivo precisa de content_type e size."
+    if file.get("content_type") not in DIRECT_UPLOAD_TYPES:
+        accepted = ", ".join(DIRECT_UPLOAD_TYPES)
+        return f"Tipo de arquivo não suportado. Use {accepted}."
+    size = file.get("size")
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return "Informe o tamanho do arquivo em bytes."
+    if size > settings.PHOTO_UPLOAD_MAX_BYTES:
+        return (
+            f"Arquivo maior que o limite de "
+            f"{settings.PHOTO_UPLOAD_MAX_BYTES // (1024 * 1024)} MB."
+        )
+    return None
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsOwner])
+def presign_item_photos(request, item_id):
+    """
+    POSTs pré-assinados para o cliente enviar as fotos direto ao Storage,
+    sem passar pelo servidor: um formulário multipart com os fields e o
+    arquivo por último, em "file". Depois, o cliente confirma as keys em
+    complete_item_photos.
+    """
+    if not direct_uploads_available():
+        return Response(
+            {"error": "Upload direto indisponível neste storage."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    try:
+        item = Item.objects.get(id=item_id, user=request.user)
+    except Item.DoesNotExist:
+        return Response(
+            {"error": "Item não encontrado ou você não tem permissão."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    files = request.data.get("files") or []
+    if not isinstance(files, list) or not files:
+        return Response(
+            {"error": "Nenhuma foto foi enviada."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    for file in files:
+        error = direct_upload_error(file)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    available_slots = MAX_ITEM_PHOTOS - used_photo_slots(item)
+    if available_slots <= 0:
+        return Response(
+            {"error": f"Este item já tem o máximo de {MAX_ITEM_PHOTOS} fotos."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    uploads = []
+    for file in files[:available_slots]:
+        key = direct_upload_key(item.id, file["content_type"])
+        uploads.append(
+            {
+                "key": key,
+                "method": "POST",
+                **presign_item_photo_upload(key, file["content_type"], file["size"]),
+            }
+        )
+    return Response(
+        {"expires_in": settings.PHOTO_PRESIGN_EXPIRES_SECONDS, "uploads": uploads}
+    )
+
+
+def discard_direct_upload(item, key):
+    """Apaga um objeto recusado na confirmação, se nenhuma foto o usa."""
+    if item.photos.filter(image__contains=key).exists():
+        return
+    for name, error in delete_photo_keys([key]).items():
+        logger.warning("Upload recusado %s ficou no Storage: %s", name, error)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsOwner])
+def complete_item_photos(request, item_id):
+    """
+    Confirma as fotos enviadas por presign_item_photos: confere cada objeto
+    no Storage (HEAD: existe, tamanho e tipo) e cria as ItemPhoto. O worker
+    gera as derivadas; acompanhe em items/<id>/photos/status/.
+    """
+    try:
+        item = Item.objects.get(id=item_id, user=request.user)
+    except Item.DoesNotExist:
+        return Response(
+            {"error": "Item não encontrado ou você não tem permissão."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    keys = request.data.get("keys") or []
+    if not isinstance(keys, list) or not keys:
+        return Response(
+            {"error": "Nenhuma foto foi enviada."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(set(keys)) != len(keys) or not all(
+        isinstance(key, str) and is_direct_upload_key(item.id, key) for key in keys
+    ):
+        return Response(
+            {"error": "Key de upload inválida para este item."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    current_count = used_photo_slots(item)
+    if current_count + len(keys) > MAX_ITEM_PHOTOS:
+        return Response(
+            {"error": f"Este item já tem o máximo de {MAX_ITEM_PHOTOS} fotos."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    objects = []
+    for key in keys:
+        head = head_item_photo(key)
+        if head is None:
+            error = f"O arquivo {key} não foi enviado ao Storage."
+        elif head["size"] > settings.PHOTO_UPLOAD_MAX_BYTES or not head["size"]:
+            error = f"O arquivo {key} está vazio ou passa do limite de tamanho."
+        elif head["content_type"] not in DIRECT_UPLOAD_TYPES:
+            error = f"O arquivo {key} não é uma imagem suportada."
+        else:
+            objects.append({**head, "key": key})
+            continue
+        if head is not None:
+            discard_direct_upload(item, key)
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    already_confirmed = Q()
+    for key in keys:
+        already_confirmed |= Q(image__contains=key)
+    with transaction.atomic():
+        if item.photos.filter(already_confirmed).exists():
+            return Response(
+                {"error": "Foto já confirmada."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        created_photos = enqueue_direct_photos(
+            item, objects, start_position=current_count + 1
+        )
+
+    return Response(
+        {
+            "message": f"{len(created_photos)} foto(s) em processamento.",
+            "photos": ItemPhotoSerializer(created_photos, many=True).data,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def item_photos_status(request, item_id):
+    """Estado de cada foto do item (pending, ready ou failed), para polling."""
+    photos = ItemPhoto.objects.filter(
+        item_id=item_id, item__user=request.user
+    ).order_by("position")
+    if not photos:
+        if not Item.objects.filter(id=item_id, user=request.user).exists():
+            return Response(
+                {"error": "Item não encontrado ou você não tem permissão."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+    return Response(ItemPhotoSerializer(photos, many=True).data)
+
+
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated, IsOwner])
 def delete_item_photo(request, photo_id):
     try:
         photo = ItemPhoto.objects.get(id=photo_id, item__user=request.user)
         photo.delete()
+        touch_item(photo.item_id)
+        refresh_item_cards([photo.item_id])
         return Response(
             {"message": "Foto deletada com sucesso."}, status=status.HTTP_204_NO_CONTENT
         )
@@ -261,7 +597,7 @@ def delete_item_photo(request, photo_id):
         )
 
 
-class ListFavoritesView(generics.ListAPIView):
+class ListFavoritesView(SparseFieldsetMixin, FastReadMixin, generics.ListAPIView):
     serializer_class = FavoriteSerializer
     permission_classes = [AllowAny]
     pagination_class = None
@@ -271,12 +607,28 @@ class ListFavoritesView(generics.ListAPIView):
         if user.is_authenticated:
             return (
                 Favorite.objects.filter(user=user)
-                .select_related("item", "item__user", "item__city", "item__category")
-                .prefetch_related("item__photos")
+                .select_related(
+                    "item",
+                    "item__user",
+                    "item__user__userprofile",
+                    "item__city",
+                    "item__category",
+                )
+                .prefetch_related(item_photos_prefetch("item__photos"))
                 .order_by("-created_at")
             )
         return Favorite.objects.none()
 
+    def get_fast_rows(self, queryset):
+        return item_values(queryset, prefix="item__", extra_fields=("id", "created_at"))
+
+    def to_fast_representation(self, row):
+        return {
+            "id": str(row["id"]),
+            "item": item_representation(row, prefix="item__"),
+            "created_at": format_datetime(row["created_at"]),
+        }
+
 
 class AddFavoriteView(generics.CreateAPIView):
     serializer_class = FavoriteSerializer
@@ -321,3 +673,22 @@ class RemoveFavoriteView(generics.DestroyAPIView):
 def check_favorite(request, item_id):
     is_favorited = Favorite.objects.filter(user=request.user, item_id=item_id).exists()
     return Response({"is_favorited": is_favorited})
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin | IsInternalNetwork])
+def metrics(request):
+    """Métricas no formato texto do Prometheus, somadas entre os workers."""
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin | IsInternalNetwork])
+def storage_health_check(request):
+    """Sonda do storage das fotos: 200 se responde, 503 se não."""
+    health = storage_health()
+    return Response(
+        health,
+        status=status.HTTP_200_OK if health["ok"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
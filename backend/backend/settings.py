@@ -37,6 +37,64 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 20,  # Limita queries grandes
 }
 
+# Listagens de leitura montadas de .values(), sem ModelSerializer (api/fast_read.py)
+FAST_READ_PATH = os.getenv("FAST_READ_PATH", "True") == "True"
+
+# Requisições acima disso vão para o log com as queries mais lentas
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_QUERIES = 5
+
+# Profiler (api/profiling.py): fração das requisições perfiladas, além das
+# que um admin marca com o cabeçalho X-Profile
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+# Alocações no perfil: liga o tracemalloc no processo inteiro, do início ao
+# fim (custa memória e CPU em toda requisição, perfilada ou não)
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "False") == "True"
+PROFILE_TRACEMALLOC_DEPTH = 64
+
+# /metrics (api/metrics.py): admins ou estas redes. Em produção os workers do
+# gunicorn compartilham PROMETHEUS_MULTIPROC_DIR (ver gunicorn.conf.py)
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    "METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128"
+).split(",")
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Porta do /metrics próprio dos workers de fundo (--metrics-port); 0 desliga
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+# Worker de fotos (api/photo_uploads.py): envios simultâneos, tentativas,
+# backoff e lease
+PHOTO_UPLOAD_CONCURRENCY = int(os.getenv("PHOTO_UPLOAD_CONCURRENCY", "4"))
+PHOTO_UPLOAD_MAX_ATTEMPTS = 5
+PHOTO_UPLOAD_RETRY_BASE_SECONDS = 5
+PHOTO_UPLOAD_RETRY_MAX_SECONDS = 300
+PHOTO_UPLOAD_LEASE_SECONDS = 300
+# Fotos failed (e o arquivo guardado delas) são apagadas depois deste prazo
+PHOTO_UPLOAD_FAILED_RETENTION_HOURS = 72
+# Exclusões no Storage (api/storage_deletions.py): mesmo backoff e lease,
+# mais tentativas, porque nada espera por elas
+STORAGE_DELETION_MAX_ATTEMPTS = 8
+# Chat em tempo real (chat/realtime.py): "postgres" entrega os eventos a
+# todos os processos por LISTEN/NOTIFY; "memory", só ao próprio processo
+CHAT_REALTIME_BACKEND = os.getenv("CHAT_REALTIME_BACKEND", "postgres")
+# Eventos à espera de uma conexão lenta antes de ela ser fechada
+CHAT_REALTIME_QUEUE_SIZE = 256
+# Processos que geram as derivadas das fotos (api/images.py); 0 = sem pool
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", "2"))
+# Limites de cada foto enviada, aqui ou direto ao Storage por URL
+# pré-assinada (items/<id>/photos/presign/): bytes e pixels do cabeçalho
+PHOTO_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+PHOTO_UPLOAD_MAX_PIXELS = 40_000_000
+# Teto de bytes de arquivos por requisição (api/upload_handlers.py); acima
+# de FILE_UPLOAD_MAX_MEMORY_SIZE cada arquivo vai para disco, não memória
+PHOTO_UPLOAD_MAX_REQUEST_BYTES = int(
+    os.getenv("PHOTO_UPLOAD_MAX_REQUEST_BYTES", str(32 * 1024 * 1024))
+)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2_621_440
+# Pedaços em que os arquivos ficam no banco até o worker (PhotoUploadChunk)
+PHOTO_UPLOAD_CHUNK_BYTES = 1024 * 1024
+PHOTO_PRESIGN_EXPIRES_SECONDS = 900
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -50,6 +108,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
@@ -59,6 +118,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro: o "total" do Server-Timing cobre os demais middlewares
+    "api.instrumentation.RequestTimingMiddleware",
+    "api.profiling.SamplingProfilerMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -151,9 +213,40 @@ if AWS_S3_CUSTOM_DOMAIN:
     MEDIA_URL = "https://" + AWS_S3_CUSTOM_DOMAIN + "/"
 else:
     MEDIA_URL = "/media/"
+MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Storage das fotos (api/storage.py): "s3", "local" (MEDIA_ROOT) ou "memory".
+# No S3, um cliente por processo com este pool, timeouts e retries
+PHOTO_STORAGE_BACKEND = os.getenv("PHOTO_STORAGE_BACKEND", "s3")
+PHOTO_STORAGE_MAX_CONNECTIONS = int(os.getenv("PHOTO_STORAGE_MAX_CONNECTIONS", "20"))
+PHOTO_STORAGE_CONNECT_TIMEOUT = 3
+PHOTO_STORAGE_READ_TIMEOUT = 15
+PHOTO_STORAGE_MAX_ATTEMPTS = 4
+# Arquivos a partir do limite sobem em multipart, em partes deste tamanho
+# (mínimo do S3: 5 MiB) e poucas por vez: o worker já envia fotos em paralelo
+PHOTO_STORAGE_MULTIPART_THRESHOLD = 5 * 1024 * 1024
+PHOTO_STORAGE_MULTIPART_CHUNK_SIZE = 5 * 1024 * 1024
+PHOTO_STORAGE_MULTIPART_CONCURRENCY = 2
+
+# Limites de tamanho e SHA-256 de cada upload conferidos enquanto os chunks
+# chegam (api/upload_handlers.py)
+FILE_UPLOAD_HANDLERS = [
+    "api.upload_handlers.UploadLimitHandler",
+    "api.upload_handlers.HashingMemoryFileUploadHandler",
+    "api.upload_handlers.HashingTemporaryFileUploadHandler",
+]
     
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "api.instrumentation": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True
 
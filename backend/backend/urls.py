@@ -1,4 +1,4 @@
-from api.views import CreateUserView
+from api.views import CreateUserView, metrics, storage_health_check
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -15,6 +15,8 @@ urlpatterns = [
     path("api-auth/", include("rest_framework.urls")),
     path("", include("api.urls")),  
     path("chat/", include("chat.urls")),
+    path("metrics", metrics, name="metrics"),
+    path("health/storage", storage_health_check, name="storage-health"),
 ]
 
 if settings.DEBUG:
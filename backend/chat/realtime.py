@@ -0,0 +1,164 @@
+"""
+Entrega em tempo real dos eventos do chat (chat/websocket.py). Cada processo
+ASGI tem um Hub com as filas das conexões abertas, por supabase_user_id.
+publish() entra na transação atual: os eventos só saem no commit.
+
+- "postgres": NOTIFY no canal chat_events. O Postgres entrega no commit a
+  todo processo em LISTEN, e cada processo tem um listener numa thread.
+- "memory": transaction.on_commit direto para o Hub deste processo. Basta
+  com um processo só (testes e runserver).
+
+Eventos publicados enquanto um listener reconecta se perdem; o cliente
+recupera pelo HTTP (ListMessagesView) ao ver a conexão cair.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "chat_events"
+# O payload de um NOTIFY vai até 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+# Espera do listener por um NOTIFY antes de conferir a conexão de novo
+POLL_SECONDS = 30
+RECONNECT_SECONDS = 2
+
+# Posto na fila de uma conexão que não acompanhou os eventos
+OVERFLOW = object()
+
+
+class Hub:
+    """Filas das conexões abertas neste processo, por usuário."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def subscribe(self, user_id):
+        """Fila dos eventos de user_id para uma conexão do loop atual."""
+        queue = asyncio.Queue(maxsize=settings.CHAT_REALTIME_QUEUE_SIZE)
+        with self._lock:
+            self._queues.setdefault(str(user_id), {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            queues = self._queues.get(str(user_id), {})
+            queues.pop(queue, None)
+            if not queues:
+                self._queues.pop(str(user_id), None)
+
+    def deliver(self, user_ids, events):
+        """Põe events nas filas de user_ids. Pode ser chamado de qualquer thread."""
+        with self._lock:
+            targets = [
+                (queue, loop)
+                for user_id in {str(user_id) for user_id in user_ids}
+                for queue, loop in self._queues.get(user_id, {}).items()
+            ]
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(_put, queue, events)
+            except RuntimeError:
+                # Loop já fechado: a conexão está saindo
+                pass
+
+
+def _put(queue, events):
+    for event in events:
+        if queue.full():
+            # Conexão lenta: em vez de acumular, ela fecha e o cliente recarrega
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(OVERFLOW)
+            return
+        queue.put_nowait(event)
+
+
+hub = Hub()
+
+
+def encode(events):
+    """Eventos em JSON, com datas e UUIDs como no resto da API."""
+    return json.loads(json.dumps(events, cls=DjangoJSONEncoder))
+
+
+def publish(user_ids, events):
+    """Entrega events às conexões de user_ids quando a transação fizer commit."""
+    message = {"to": sorted({str(user_id) for user_id in user_ids}), "events": encode(events)}
+    if settings.CHAT_REALTIME_BACKEND == "memory":
+        transaction.on_commit(lambda: hub.deliver(message["to"], message["events"]))
+        return
+    payload = json.dumps(message)
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        message["events"] = [without_body(event) for event in message["events"]]
+        payload = json.dumps(message)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+
+def without_body(event):
+    # Mensagem grande não cabe no NOTIFY: o cliente busca o texto pelo HTTP
+    if "message" not in event:
+        return event
+    return {**event, "message": {**event["message"], "body": None, "truncated": True}}
+
+
+def dispatch(payload):
+    message = json.loads(payload)
+    hub.deliver(message["to"], message["events"])
+
+
+class Listener(threading.Thread):
+    """LISTEN chat_events numa conexão própria, repassando cada NOTIFY ao Hub."""
+
+    def __init__(self):
+        super().__init__(name="chat-listener", daemon=True)
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception:
+                logger.exception("Listener do chat caiu; reconectando")
+                time.sleep(RECONNECT_SECONDS)
+
+    def listen(self):
+        db = psycopg2.connect(**connections["default"].get_connection_params())
+        try:
+            db.autocommit = True
+            with db.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            while True:
+                if not select.select([db], [], [], POLL_SECONDS)[0]:
+                    continue
+                db.poll()
+                while db.notifies:
+                    dispatch(db.notifies.pop(0).payload)
+        finally:
+            db.close()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def start_listener():
+    """Sobe, no primeiro uso, o listener deste processo (backend postgres)."""
+    global _listener
+    if settings.CHAT_REALTIME_BACKEND != "postgres" or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = Listener()
+            _listener.start()
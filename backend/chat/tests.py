@@ -1,3 +1,162 @@
-from django.test import TestCase
+import json
+import uuid
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import UserProfile
+from api.test_query_budgets import create_chat_tables
+from backend.asgi import application
+from chat import realtime
+from chat.models import Conversation, Message
+from chat.websocket import CLOSE_FORBIDDEN, CLOSE_UNAUTHORIZED
+
+
+@override_settings(CHAT_REALTIME_BACKEND="memory")
+class ChatWebSocketTests(APITestCase):
+    """WebSocket do chat (chat/websocket.py) falando direto com o ASGI."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_chat_tables()
+
+    def setUp(self):
+        # Fora de uma requisição, a conexão dos testes não pode ser fechada
+        patcher = patch("chat.websocket.close_old_connections")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ana = self.create_user("ana@example.com")
+        self.bruno = self.create_user("bruno@example.com")
+        self.conversation = Conversation.objects.create(
+            id=uuid.uuid4(), created_at=timezone.now(),
+            user_a_id=self.ana.userprofile.supabase_user_id,
+            user_b_id=self.bruno.userprofile.supabase_user_id,
+        )
+
+    def create_user(self, username):
+        user = User.objects.create_user(username=username, password="testpass123")
+        UserProfile.objects.create(user=user, supabase_user_id=uuid.uuid4())
+        return user
+
+    async def connect(self, token):
+        socket = ApplicationCommunicator(application, {
+            "type": "websocket", "path": "/ws/chat/", "headers": [],
+            "query_string": f"token={token}".encode(),
+        })
+        await socket.send_input({"type": "websocket.connect"})
+        return socket, await socket.receive_output(timeout=5)
+
+    async def connect_as(self, user):
+        socket, message = await self.connect(AccessToken.for_user(user))
+        self.assertEqual(message["type"], "websocket.accept")
+        return socket
+
+    async def receive(self, socket):
+        message = await socket.receive_output(timeout=5)
+        self.assertEqual(message["type"], "websocket.send")
+        return json.loads(message["text"])
+
+    async def disconnect(self, *sockets):
+        for socket in sockets:
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait(timeout=5)
+
+    def send_message(self, user, body):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f"/chat/conversations/{self.conversation.pk}/messages/send/",
+                {"body": body},
+            )
+
+    async def test_connections_without_a_valid_token_are_closed(self):
+        """Testa o fechamento sem token, com token inválido e sem supabase_user_id"""
+        for token in ("", "nao-e-um-jwt"):
+            _, message = await self.connect(token)
+            self.assertEqual(message, {"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+
+        stranger = await sync_to_async(User.objects.create_user)(
+            username="sem-perfil@example.com", password="testpass123"
+        )
+        _, message = await self.connect(AccessToken.for_user(stranger))
+        self.assertEqual(message, {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+
+    async def test_sent_message_reaches_both_participants(self):
+        """Testa message.created e conversation.updated para quem envia e quem recebe"""
+        ana = await self.connect_as(self.ana)
+        bruno = await self.connect_as(self.bruno)
+
+        response = await sync_to_async(self.send_message)(self.ana, "Oi, Bruno!")
+        self.assertEqual(response.status_code, 201)
+        for socket in (ana, bruno):
+            created = await self.receive(socket)
+            self.assertEqual(created["type"], "message.created")
+            self.assertEqual(created["message"]["id"], response.data["id"])
+            self.assertEqual(created["message"]["body"], "Oi, Bruno!")
+            self.assertIsNone(created["message"]["read_at"])
+            updated = await self.receive(socket)
+            self.assertEqual(updated["type"], "conversation.updated")
+            self.assertEqual(updated["conversation"]["id"], str(self.conversation.pk))
+        self.assertTrue(await ana.receive_nothing())
+        await self.disconnect(ana, bruno)
+
+    async def test_reading_over_the_socket_notifies_both(self):
+        """Testa o {"type": "read"} do cliente: marca as mensagens e avisa os dois"""
+        await sync_to_async(self.send_message)(self.ana, "Tudo bem?")
+        ana = await self.connect_as(self.ana)
+        bruno = await self.connect_as(self.bruno)
+
+        with patch("chat.realtime.transaction.on_commit", side_effect=lambda f: f()):
+            await bruno.send_input({"type": "websocket.receive", "text": json.dumps({
+                "type": "read", "conversation_id": str(self.conversation.pk),
+            })})
+            for socket in (ana, bruno):
+                event = await self.receive(socket)
+                self.assertEqual(event["type"], "messages.read")
+                self.assertEqual(
+                    event["reader_id"], str(self.bruno.userprofile.supabase_user_id)
+                )
+        read_at = await sync_to_async(
+            lambda: Message.objects.get(conversation_id=self.conversation.pk).read_at
+        )()
+        self.assertIsNotNone(read_at)
+
+        await ana.send_input({"type": "websocket.receive", "text": json.dumps({
+            "type": "read", "conversation_id": str(uuid.uuid4()),
+        })})
+        self.assertEqual(
+            await self.receive(ana),
+            {"type": "error", "detail": "Conversa não encontrada."},
+        )
+        await self.disconnect(ana, bruno)
+
+    @override_settings(CHAT_REALTIME_BACKEND="postgres")
+    def test_postgres_backend_notifies_inside_the_transaction(self):
+        """Testa o NOTIFY na transação do envio e a entrega do payload ao Hub"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send_message(self.ana, "Oi!")
+        self.assertEqual(response.status_code, 201)
+        notify = [q["sql"] for q in queries if "pg_notify" in q["sql"]]
+        self.assertEqual(len(notify), 1)
+
+        with patch("chat.realtime.connection") as db:
+            realtime.publish([self.ana.userprofile.supabase_user_id], [
+                {"type": "message.created", "message": {"body": "x" * 10000}}
+            ])
+        cursor = db.cursor.return_value.__enter__.return_value
+        channel, payload = cursor.execute.call_args.args[1]
+        self.assertEqual(channel, realtime.CHANNEL)
+        self.assertLess(len(payload), realtime.MAX_PAYLOAD_BYTES)
+        with patch.object(realtime.hub, "deliver") as deliver:
+            realtime.dispatch(payload)
+        user_ids, events = deliver.call_args.args
+        self.assertEqual(user_ids, [str(self.ana.userprofile.supabase_user_id)])
+        self.assertEqual(events[0]["message"], {"body": None, "truncated": True})
@@ -1,9 +1,16 @@
 from django.urls import path
-from .views import CreateConversationView, SendMessageView, ListMessagesView, ListConversationsView
+from .views import (
+    CreateConversationView,
+    ListConversationsView,
+    ListMessagesView,
+    MarkReadView,
+    SendMessageView,
+)
 
 urlpatterns = [
     path("conversations/", ListConversationsView.as_view()),
     path("conversations/create/", CreateConversationView.as_view()),
     path("conversations/<uuid:conversation_id>/messages/send/", SendMessageView.as_view()),
     path("conversations/<uuid:conversation_id>/messages/", ListMessagesView.as_view()),
+    path("conversations/<uuid:conversation_id>/read/", MarkReadView.as_view()),
 ]
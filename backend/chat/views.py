@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import Conversation, Message
+from .realtime import publish
 
 
 def my_supa_uuid(request):
@@ -24,6 +25,52 @@ def is_participant(conv, me):
     return str(conv.user_a_id) == str(me) or str(conv.user_b_id) == str(me)
 
 
+def get_conversation(conversation_id, me):
+    """A conversa, se existir e me participar dela."""
+    try:
+        conv = Conversation.objects.get(pk=conversation_id)
+    except Conversation.DoesNotExist:
+        raise NotFound("Conversa não encontrada.")
+
+    if not is_participant(conv, me):
+        raise PermissionDenied("Você não participa desta conversa.")
+    return conv
+
+
+def participants(conv):
+    return [conv.user_a_id, conv.user_b_id]
+
+
+def mark_read(conv, me):
+    """
+    Marca como lidas as mensagens que me recebeu em conv e, no commit, avisa
+    os dois participantes. Retorna quantas foram marcadas.
+    """
+    now = timezone.now()
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            update messages set read_at = %s
+             where conversation_id = %s and sender_id <> %s and read_at is null
+        """,
+            [now, str(conv.id), str(me)],
+        )
+        count = cur.rowcount
+    if count:
+        publish(
+            participants(conv),
+            [
+                {
+                    "type": "messages.read",
+                    "conversation_id": str(conv.id),
+                    "reader_id": str(me),
+                    "read_at": now,
+                }
+            ],
+        )
+    return count
+
+
 class CreateConversationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -71,6 +118,20 @@ class CreateConversationView(APIView):
                     [conv_id, a, b],
                 )
             c = Conversation.objects.get(pk=conv_id)
+            publish(
+                participants(c),
+                [
+                    {
+                        "type": "conversation.created",
+                        "conversation": {
+                            "id": str(c.id),
+                            "user_a_id": str(c.user_a_id),
+                            "user_b_id": str(c.user_b_id),
+                            "created_at": c.created_at,
+                        },
+                    }
+                ],
+            )
 
         return Response(
             {
@@ -88,13 +149,7 @@ class SendMessageView(APIView):
     @transaction.atomic
     def post(self, request, conversation_id):
         me = my_supa_uuid(request)
-        try:
-            conv = Conversation.objects.get(pk=conversation_id)
-        except Conversation.DoesNotExist:
-            raise NotFound("Conversa não encontrada.")
-
-        if not is_participant(conv, me):
-            raise PermissionDenied("Você não participa desta conversa.")
+        conv = get_conversation(conversation_id, me)
 
         body = (request.data.get("body") or "").strip()
         if not body:
@@ -116,16 +171,25 @@ class SendMessageView(APIView):
                 [now, str(conv.id)],
             )
 
-        return Response(
-            {
-                "id": msg_id,
-                "conversation_id": str(conv.id),
-                "sender_id": str(me),
-                "body": body,
-                "sent_at": now,
-            },
-            status=201,
+        message = {
+            "id": msg_id,
+            "conversation_id": str(conv.id),
+            "sender_id": str(me),
+            "body": body,
+            "sent_at": now,
+        }
+        # Entregue aos dois participantes pelo WebSocket, no commit
+        publish(
+            participants(conv),
+            [
+                {"type": "message.created", "message": {**message, "read_at": None}},
+                {
+                    "type": "conversation.updated",
+                    "conversation": {"id": str(conv.id), "last_message_at": now},
+                },
+            ],
         )
+        return Response(message, status=201)
 
 
 class ListMessagesView(APIView):
@@ -133,13 +197,7 @@ class ListMessagesView(APIView):
 
     def get(self, request, conversation_id):
         me = my_supa_uuid(request)
-        try:
-            conv = Conversation.objects.get(pk=conversation_id)
-        except Conversation.DoesNotExist:
-            raise NotFound("Conversa não encontrada.")
-
-        if not is_participant(conv, me):
-            raise PermissionDenied("Você não participa desta conversa.")
+        conv = get_conversation(conversation_id, me)
 
         rows = Message.objects.filter(conversation_id=conversation_id).order_by(
             "-sent_at"
@@ -158,6 +216,16 @@ class ListMessagesView(APIView):
         )
 
 
+class MarkReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request, conversation_id):
+        me = my_supa_uuid(request)
+        conv = get_conversation(conversation_id, me)
+        return Response({"read": mark_read(conv, me)})
+
+
 class ListConversationsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -176,21 +244,21 @@ class ListConversationsView(APIView):
             )
         )
 
+        def other_user(conv):
+            return conv.user_b_id if str(conv.user_a_id) == str(me) else conv.user_a_id
+
+        # Nomes dos outros participantes em uma única query
+        names = {
+            str(supabase_user_id): first_name or username
+            for supabase_user_id, first_name, username in UserProfile.objects.filter(
+                supabase_user_id__in=[other_user(conv) for conv in conversations]
+            ).values_list("supabase_user_id", "user__first_name", "user__username")
+        }
+
         result = []
         for conv in conversations:
-            # Determinar o outro usuário
-            other_user_id = (
-                conv.user_b_id if str(conv.user_a_id) == str(me) else conv.user_a_id
-            )
-
-            # Buscar nome do outro usuário
-            try:
-                profile = UserProfile.objects.select_related("user").get(
-                    supabase_user_id=other_user_id
-                )
-                other_user_name = profile.user.first_name or profile.user.username
-            except UserProfile.DoesNotExist:
-                other_user_name = "Usuário"
+            other_user_id = other_user(conv)
+            other_user_name = names.get(str(other_user_id), "Usuário")
 
             result.append(
                 {
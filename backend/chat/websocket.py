@@ -0,0 +1,165 @@
+"""
+WebSocket do chat em /ws/chat/, servido pelo backend/asgi.py.
+
+O cliente autentica uma vez, no handshake, com o access token JWT em
+?token=… (navegadores não mandam Authorization num WebSocket). Depois recebe,
+em JSON, os eventos que chat/realtime.py publica para ele até o token
+expirar (fecha com 4401):
+
+- message.created e conversation.updated, a cada mensagem enviada;
+- conversation.created, a cada conversa nova;
+- messages.read, quando um dos dois lê a conversa.
+
+O cliente pode mandar {"type": "read", "conversation_id": …} para marcar como
+lidas as mensagens que recebeu, como em conversations/<id>/read/.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from api.models import UserProfile
+
+from .realtime import OVERFLOW, hub, start_listener
+from .views import get_conversation, mark_read
+
+PATH = "/ws/chat/"
+
+# Códigos de fechamento: token ausente, inválido ou expirado; perfil sem
+# supabase_user_id; conexão que não acompanhou os eventos; rota inexistente
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_TOO_SLOW = 4408
+CLOSE_NOT_FOUND = 4404
+
+
+def database_sync_to_async(function):
+    """sync_to_async que devolve a conexão ao banco no fim, como uma requisição."""
+
+    def call(*args):
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call)
+
+
+def token_from(scope):
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    if token:
+        return token[0]
+    for name, value in scope.get("headers", []):
+        if name == b"authorization" and value.startswith(b"Bearer "):
+            return value[len(b"Bearer "):].decode()
+    return None
+
+
+@database_sync_to_async
+def authenticate(raw_token):
+    """(supabase_user_id, expiração) do dono do token; None se não der."""
+    auth = JWTAuthentication()
+    try:
+        token = auth.get_validated_token(raw_token)
+        user = auth.get_user(token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    me = (
+        UserProfile.objects.filter(user=user)
+        .values_list("supabase_user_id", flat=True)
+        .first()
+    )
+    return me, datetime.fromtimestamp(token["exp"], tz=timezone.utc)
+
+
+@database_sync_to_async
+def read_conversation(conversation_id, me):
+    with transaction.atomic():
+        return mark_read(get_conversation(conversation_id, me), me)
+
+
+async def send_json(send, data):
+    await send({"type": "websocket.send", "text": json.dumps(data)})
+
+
+async def handle_frame(me, message, send):
+    """Um frame do cliente: por enquanto, só {"type": "read"}."""
+    try:
+        data = json.loads(message.get("text") or "")
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or data.get("type") != "read":
+        await send_json(send, {"type": "error", "detail": "Mensagem inválida."})
+        return
+    try:
+        await read_conversation(data.get("conversation_id"), me)
+    except APIException as e:
+        await send_json(send, {"type": "error", "detail": e.detail})
+    except ValidationError:
+        # conversation_id que nem é UUID
+        await send_json(send, {"type": "error", "detail": "Conversa não encontrada."})
+
+
+async def serve(me, queue, receive, send):
+    """Repassa a fila ao cliente e atende os frames dele, até desconectar."""
+    incoming = asyncio.ensure_future(receive())
+    outgoing = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if outgoing in done:
+                event = outgoing.result()
+                if event is OVERFLOW:
+                    await send({"type": "websocket.close", "code": CLOSE_TOO_SLOW})
+                    return
+                await send_json(send, event)
+                outgoing = asyncio.ensure_future(queue.get())
+            if incoming in done:
+                message = incoming.result()
+                if message["type"] == "websocket.disconnect":
+                    return
+                await handle_frame(me, message, send)
+                incoming = asyncio.ensure_future(receive())
+    finally:
+        incoming.cancel()
+        outgoing.cancel()
+
+
+async def chat_websocket(scope, receive, send):
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    if scope["path"] != PATH:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+
+    raw_token = token_from(scope)
+    identity = await authenticate(raw_token) if raw_token else None
+    if identity is None:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+    me, expires_at = identity
+    if me is None:
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    start_listener()
+    queue = hub.subscribe(me)
+    try:
+        await send({"type": "websocket.accept"})
+        remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+        await asyncio.wait_for(serve(me, queue, receive, send), max(remaining, 0))
+    except asyncio.TimeoutError:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+    finally:
+        hub.unsubscribe(me, queue)
@@ -0,0 +1,22 @@
+# Lido automaticamente pelo gunicorn (roda a partir de backend/).
+import os
+import shutil
+import tempfile
+
+# Métricas Prometheus somadas entre workers (api/metrics.py): precisa estar no
+# ambiente antes de os workers importarem o prometheus_client
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "giveme-metrics")
+)
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior somariam valores antigos
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
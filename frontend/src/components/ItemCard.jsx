@@ -30,12 +30,14 @@ const ItemCard = memo(({ item, isFavorited, onToggleFavorite }) => {
     return () => observer.disconnect();
   }, []);
 
+  const photos = item.photos || item.images;
+
   useEffect(() => {
-    if (isVisible && item.images?.[0]) {
-      const cover = fullUrl(item.images[0]);
+    if (isVisible && photos?.[0]) {
+      const cover = fullUrl(photos[0]);
       setImageSrc(cover);
     }
-  }, [isVisible, item.images]);
+  }, [isVisible, photos]);
 
   const slugOrId = item.slug || item.id;
 